@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Idle cost of the headless daemon against the GUI: resident memory
+# and wakeups (context switches of all threads) over an idle period,
+# once startup is finished. Apps are started by bench_startup.py,
+# so every run gets a fresh HOME.
+# Needs dbus, PyGObject and GStreamer, the GUI run needs a display too.
+# Run: python3 bench/bench_daemon.py [idle seconds]
+
+import glob
+import os
+import subprocess
+import sys
+import time
+
+STARTUP = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       "bench_startup.py")
+
+def status(pid, field):
+    """ Return numeric field of /proc/<pid>/status """
+    with open("/proc/{0}/status".format(pid), "r") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def switches(pid):
+    """ Context switches of all threads so far """
+    total = 0
+    for path in glob.glob("/proc/{0}/task/*/status".format(pid)):
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith(("voluntary_ctxt_switches:",
+                                    "nonvoluntary_ctxt_switches:")):
+                    total += int(line.split()[1])
+    return total
+
+def measure(mode, idle):
+    """ Return RSS in KiB and wakeups per second of idle app """
+    proc = subprocess.Popen([ sys.executable, STARTUP, mode ],
+                            stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    try:
+        # Profile report ends with total
+        for line in proc.stdout:
+            if line.startswith("total"):
+                break
+        else:
+            sys.exit("{0} startup failed".format(mode))
+        # Let the first schedule load settle
+        time.sleep(2)
+        before = switches(proc.pid)
+        time.sleep(idle)
+        wakeups = (switches(proc.pid) - before) / idle
+        rss = status(proc.pid, "VmRSS")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return rss, wakeups
+
+def main():
+    try:
+        import dbus
+        import gi
+        gi.require_version("Gst", "1.0")
+        from gi.repository import Gst
+    except (ImportError, ValueError) as e:
+        sys.exit("dbus, PyGObject and GStreamer are needed: " + str(e))
+    idle = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    modes = [ "headless" ]
+    if os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY"):
+        modes.append("gui")
+    for mode in modes:
+        rss, wakeups = measure(mode, idle)
+        print("{0:<9} {1:8d} KiB  {2:7.1f} wakeups/s".format(
+              mode, rss, wakeups))
+
+if __name__ == "__main__":
+    main()
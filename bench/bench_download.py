@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Cold cover refresh against a local server with injected latency:
+# one new session per cover, one after another, like it used to be,
+# against the pooled parallel downloader.
+# Run: python3 bench/bench_download.py [covers] [latency ms]
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+import requests
+
+import localserver
+from silver.downloader import Downloader
+from silver.downloader import create_session
+from silver.netpolicy import send_request
+
+BODY = b"x" * 32 * 1024
+
+class Handler(BaseHTTPRequestHandler):
+    """ Keep-alive server, new connections and requests are slow """
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    connections = 0
+
+    def setup(self):
+        # Handshake round trips
+        Handler.connections += 1
+        time.sleep(self.latency)
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+def sequential(urls):
+    for url in urls:
+        with requests.Session() as session:
+            assert session.get(url, timeout=10).content == BODY
+
+def pooled(urls):
+    session = create_session()
+    try:
+        def get(url):
+            return send_request(session, "GET", url).content
+        results = Downloader().run(get, urls)
+        assert all(x == BODY for x in results.values())
+    finally:
+        session.close()
+
+def main():
+    covers = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    if len(sys.argv) > 2:
+        Handler.latency = int(sys.argv[2]) / 1000
+    with localserver.serve(Handler) as base:
+        urls = [ "{0}/cover{1}.jpg".format(base, i) for i in range(covers) ]
+        # Program pages repeat, downloader fetches each url once
+        urls += urls[:covers // 4]
+        results = []
+        for name, func in (("sequential", sequential), ("pooled", pooled)):
+            Handler.connections = 0
+            start = time.perf_counter()
+            func(urls)
+            elapsed = time.perf_counter() - start
+            results.append(elapsed)
+            print("{0:10s} {1:7.2f} s  {2:3d} connections".format(
+                                    name, elapsed, Handler.connections))
+    print("speedup    {0:7.1f}x".format(results[0] / results[1]))
+
+if __name__ == "__main__":
+    main()
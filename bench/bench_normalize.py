@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Schedule normalization time on dense weeks of overlapping programs.
+# Run: python3 bench/bench_normalize.py [programs per day ...]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+from silver.program import Program
+from silver.schednorm import normalize_week
+
+def make_week(programs):
+    """ Return week of randomly placed overlapping programs """
+    rnd = random.Random(1)
+    week = []
+    for wd in range(7):
+        day = []
+        for i in range(programs):
+            start = rnd.randrange(0, 86400, 900)
+            end = start + rnd.randrange(900, 4 * 3600, 900)
+            merged = end > 86400
+            day.append(Program(wd, "Title {0}".format(rnd.randrange(20)),
+                               "url", start=float(start),
+                               end=float(end - 86400 if merged else end),
+                               is_main=True, is_merged=merged))
+        week.append(day)
+    return week
+
+def main():
+    sizes = [ int(x) for x in sys.argv[1:] ] or [ 50, 500, 3000 ]
+    for size in sizes:
+        week = make_week(size)
+        start = time.perf_counter()
+        normalize_week(week)
+        elapsed = time.perf_counter() - start
+        print("{0:6d} programs/day  {1:8.3f} s".format(size, elapsed))
+
+if __name__ == "__main__":
+    main()
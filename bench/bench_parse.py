@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Schedule page parsing time by number of table rows:
+# the table parser alone and with program records built from rows.
+# Run: python3 bench/bench_parse.py [rows ...]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+from silver.schedparser import ProgramListParser
+from silver.schedule import CHUNK_SIZE
+from silver.schedule import SilverSchedule
+
+ROW = '<tr><td><a href="/programms/p{0}/"><img src="/i/{0}.png?1" ' \
+      'alt=""></a></td><td><div><a href="/programms/p{0}/">' \
+      'Title&nbsp;{0}</a></div></td><td><ul><li><a><span>Ivan Ivanov' \
+      '</span></a></li></ul></td><td><div><p>Пн: 10:00 - 11:00,<br>' \
+      'Вт: 12:00 - 13:00<br></p></div></td></tr>\n'
+
+def make_page(rows):
+    """ Return page with a program list of rows entries """
+    return '<html><body><div class="x"></div><!-- c -->' \
+           '<div class="program-list big"><table><tbody>' + \
+           "".join(ROW.format(i) for i in range(rows)) + \
+           '</tbody></table></div><table><tbody><tr><td>no</td></tr>' \
+           '</tbody></table></body></html>'
+
+def parse(page, build=None):
+    """ Feed page by chunks like the downloader does, return rows.
+        build(row) is called for every row as soon as it's parsed """
+    parser = ProgramListParser()
+    rows = []
+    for i in range(0, len(page), CHUNK_SIZE):
+        parser.feed(page[i:i + CHUNK_SIZE])
+        for row in parser.rows():
+            if build:
+                build(row)
+            rows.append(row)
+        if parser.done:
+            break
+    return rows
+
+def parse_programs(page):
+    """ Parse page into week schedule like the schedule loader does """
+    sched = SilverSchedule.__new__(SilverSchedule)
+    week = [ [] for x in range(7) ]
+    parse(page, lambda row : sched._sched_parse_program(week, row))
+    return week
+
+def main():
+    sizes = [ int(x) for x in sys.argv[1:] ] or [ 100, 1000, 5000, 20000 ]
+    for size in sizes:
+        page = make_page(size)
+        start = time.perf_counter()
+        rows = parse(page)
+        parsed = time.perf_counter() - start
+        assert len(rows) == size
+        start = time.perf_counter()
+        week = parse_programs(page)
+        built = time.perf_counter() - start
+        # Every row airs on Monday and Tuesday
+        assert len(week[0]) == len(week[1]) == size
+        print("{0:6d} rows  parse {1:7.3f} s  {2:6.1f} us/row  "
+              "with records {3:7.3f} s  {4:6.1f} us/row".format(
+              size, parsed, parsed / size * 1e6,
+              built, built / size * 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Schedule icons memory and rebuild time: every row decoding and
+# scaling its own icon, like it used to be, against the shared
+# pixbuf cache with thumbnails on disk (cold and warm).
+# Every mode runs in its own process, RSS is measured there.
+# Needs PyGObject with GdkPixbuf and Gtk.
+# Run: python3 bench/bench_pixbuf.py [rows] [distinct icons]
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+
+SIZE = 80
+
+def rss():
+    """ Resident set size in KiB """
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def make_icons(img_dir, count):
+    """ Save count distinct 300x200 jpegs, return their paths """
+    from gi.repository import GdkPixbuf
+    paths = []
+    for i in range(count):
+        pb = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, 300, 200)
+        pb.fill((i * 0x01020300 + 0x203040ff) & 0xffffffff)
+        path = os.path.join(img_dir, "{0:040x}.jpg".format(i))
+        pb.savev(path, "jpeg", [], [])
+        paths.append(path)
+    return paths
+
+def run(mode, rows, icons):
+    silverenv.setup()
+    import gi
+    gi.require_version("Gtk", "3.0")
+    gi.require_version("GdkPixbuf", "2.0")
+    from gi.repository import GdkPixbuf
+    tmp = os.environ["HOME"]
+    img_dir = os.path.join(tmp, "img")
+    thumb_dir = os.path.join(tmp, "thumbs")
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(thumb_dir, exist_ok=True)
+    paths = make_icons(img_dir, icons)
+    # Music icon is on most of the rows
+    rows = [ paths[0] if i % 3 else paths[i % icons] for i in range(rows) ]
+
+    if mode == "rows":
+        def build():
+            return [ GdkPixbuf.Pixbuf.new_from_file(x).scale_simple(
+                            SIZE, SIZE, GdkPixbuf.InterpType.BILINEAR)
+                     for x in rows ]
+    else:
+        from silver.gui.pixbufcache import PixbufCache
+        cache = PixbufCache(thumb_dir)
+        if mode == "warm":
+            # Thumbnails made by a previous run
+            PixbufCache(thumb_dir).get(paths[0], SIZE)
+            for x in paths:
+                PixbufCache(thumb_dir).get(x, SIZE)
+        def build():
+            return [ cache.get(x, SIZE) for x in rows ]
+
+    before = rss()
+    start = time.perf_counter()
+    model = build()
+    elapsed = time.perf_counter() - start
+    print("{0:5s} {1:5d} rows  {2:8.1f} ms  {3:7d} KiB".format(
+          mode, len(model), elapsed * 1e3, rss() - before))
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] in ("rows", "cold", "warm"):
+        run(args[0], int(args[1]), int(args[2]))
+        return
+    try:
+        import gi
+        gi.require_version("GdkPixbuf", "2.0")
+        from gi.repository import GdkPixbuf
+    except (ImportError, ValueError) as e:
+        sys.exit("GdkPixbuf is needed: " + str(e))
+    rows = args[0] if args else "336"
+    icons = args[1] if len(args) > 1 else "40"
+    for mode in ("rows", "cold", "warm"):
+        # Every run gets a fresh temporary HOME from silverenv
+        subprocess.check_call([ sys.executable, os.path.abspath(__file__),
+                                mode, rows, icons ])
+
+if __name__ == "__main__":
+    main()
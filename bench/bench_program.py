@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Memory of a multi-week schedule loaded from JSON: 14-key dicts
+# of the old dump against Program records with interned strings.
+# Run: python3 bench/bench_program.py [weeks]
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+from silver.program import SCHED_WEEKDAY_LIST
+from silver.program import Program
+from silver.program import str_time
+
+def make_dump(weeks):
+    """ Return JSON of weeks * 7 days of 48 programs in the old format """
+    days = []
+    for day in range(weeks * 7):
+        wd = day % 7
+        events = []
+        for i in range(48):
+            n = (day * 48 + i) % 30
+            start, end = i * 1800.0, i * 1800.0 + 1800
+            events.append({
+                    "weekday"   : SCHED_WEEKDAY_LIST[wd],
+                    "is_main"   : i % 2 == 0,
+                    "is_merged" : False,
+                    "time"      : str_time(start, end),
+                    "title"     : "Title {0}".format(n),
+                    "url"       : "http://silver.ru/programms/p{0}/".format(n),
+                    "host"      : [ "Ivan Ivanov", "Host {0}".format(n % 7) ],
+                    "icon"      : "/img/{0:040d}.png".format(n),
+                    "cover"     : "/img/{0:040d}.jpg".format(n),
+                    "start"     : start,
+                    "end"       : end,
+                    "position"  : i,
+                    "record"    : False,
+                    "play"      : False })
+        days.append(events)
+    return json.dumps(days)
+
+def measure(func):
+    """ Return (result, bytes allocated and kept, seconds) """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+def main():
+    weeks = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    dump = make_dump(weeks)
+    dicts, dict_size, dict_time = measure(lambda : json.loads(dump))
+    programs, prog_size, prog_time = measure(
+            lambda : [ [ Program.from_dict(x) for x in day ]
+                       for day in json.loads(dump) ])
+    events = sum(len(x) for x in programs)
+    assert programs[1][3].time == dicts[1][3]["time"]
+    print("{0} weeks, {1} events".format(weeks, events))
+    print("dicts    {0:8.2f} MiB  {1:5.0f} B/event  {2:6.1f} ms".format(
+          dict_size / 2 ** 20, dict_size / events, dict_time * 1e3))
+    print("Program  {0:8.2f} MiB  {1:5.0f} B/event  {2:6.1f} ms".format(
+          prog_size / 2 ** 20, prog_size / events, prog_time * 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Remote command latency: "silver-rain toggle" sent to a running
+# instance through the light client path, against the same command
+# with silver.application and its Gtk/GStreamer stack imported first,
+# like main.py used to do at module level.
+# The running instance is a stand-in exporting the real D-Bus service.
+# Needs dbus-python, PyGObject and a session bus
+# (dbus-run-session python3 bench/bench_remote.py).
+# Run: python3 bench/bench_remote.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+
+class Window():
+    """ Running app stand-in, commands do nothing """
+    def present(self):
+        pass
+
+    def play(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def seek(self, delay):
+        pass
+
+    def toggle_playback(self):
+        pass
+
+    def toggle_record(self):
+        pass
+
+    def volume_step(self, step):
+        pass
+
+    def get_status(self):
+        return { "delay" : 0, "volume" : 100 }
+
+def serve():
+    """ Own the bus name, serve commands until killed """
+    silverenv.setup()
+    from gi.repository import GLib
+    from silver.main import SilverService
+    service = SilverService(Window())
+    print("ready", flush=True)
+    GLib.MainLoop().run()
+
+def client(full):
+    """ Send command like the silver-rain script does """
+    silverenv.setup()
+    if full:
+        import silver.application
+    from silver.main import exec_main
+    sys.argv = [ "silver-rain", "toggle" ]
+    exec_main()
+
+def measure(mode, runs):
+    """ Return median command time in ms """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([ sys.executable, os.path.abspath(__file__),
+                                mode ])
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def main():
+    args = sys.argv[1:]
+    if args == [ "serve" ]:
+        serve()
+        return
+    if args in ([ "light" ], [ "full" ]):
+        client(args[0] == "full")
+        return
+    try:
+        import dbus
+        import gi
+        from gi.repository import GLib
+    except ImportError as e:
+        sys.exit("dbus-python and PyGObject are needed: " + str(e))
+    if not os.getenv("DBUS_SESSION_BUS_ADDRESS"):
+        sys.exit("No session bus, run it with dbus-run-session")
+    runs = int(args[0]) if args else 10
+    server = subprocess.Popen([ sys.executable, os.path.abspath(__file__),
+                                "serve" ], stdout=subprocess.PIPE,
+                              universal_newlines=True)
+    try:
+        if server.stdout.readline().strip() != "ready":
+            sys.exit("Stand-in service didn't start")
+        light = measure("light", runs)
+        full = measure("full", runs)
+    finally:
+        server.terminate()
+        server.wait()
+    print("light client         {0:7.1f} ms".format(light))
+    print("application imported {0:7.1f} ms".format(full))
+    print("speedup              {0:7.1f}x".format(full / light))
+
+if __name__ == "__main__":
+    main()
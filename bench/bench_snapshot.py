@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Saved schedule load time, binary snapshot against JSON dump.
+# Run: python3 bench/bench_snapshot.py [repeats]
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+from silver.program import Program
+from silver.snapshot import read_snapshot, write_snapshot
+
+def make_week():
+    """ Return week of 48 half-hour programs a day """
+    return [ [ Program(wd, "Title {0}".format(i % 30),
+                       "http://silver.ru/programms/p{0}/".format(i % 30),
+                       ("Ivan Ivanov", "Petr Petrov"),
+                       "/img/{0:040d}.png".format(i % 30), "",
+                       start=i * 1800.0, end=i * 1800.0 + 1800,
+                       is_main=i % 2 == 0, record=i == 3)
+               for i in range(48) ] for wd in range(7) ]
+
+def timeit(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e3
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    week = make_week()
+    tmp = tempfile.mkdtemp()
+    snap = os.path.join(tmp, "sched.snap")
+    dump = os.path.join(tmp, "sched.dump")
+    write_snapshot(snap, week)
+    with open(dump, "w") as f:
+        json.dump([ [ x.to_dict() for x in day ] for day in week ], f)
+
+    loaded = read_snapshot(snap).week()
+    assert all(a.to_dict() == b.to_dict()
+               for wd in range(7) for a, b in zip(loaded[wd], week[wd]))
+
+    def snap_today():
+        w = read_snapshot(snap).week()
+        w[0]
+    def snap_full():
+        list(read_snapshot(snap).week())
+    def json_full():
+        with open(dump, "r") as f:
+            [ [ Program.from_dict(x) for x in day ] for day in json.load(f) ]
+
+    print("size: snapshot {0} B, json {1} B".format(os.path.getsize(snap),
+                                                    os.path.getsize(dump)))
+    print("snapshot, one day  {0:7.3f} ms".format(timeit(snap_today, repeats)))
+    print("snapshot, week     {0:7.3f} ms".format(timeit(snap_full, repeats)))
+    print("json, week         {0:7.3f} ms".format(timeit(json_full, repeats)))
+
+if __name__ == "__main__":
+    main()
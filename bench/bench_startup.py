@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Startup phases reported by --profile-startup, median of a few runs,
+# plus wall time from process start until the report is printed.
+# Every run is a new process with a fresh HOME, so the schedule isn't
+# saved yet and configuration is written from defaults.
+# GUI runs need a display, both need dbus, PyGObject and GStreamer,
+# and no other instance running on the session bus.
+# Run: python3 bench/bench_startup.py [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+
+def app(headless):
+    """ Start the app like the silver-rain script does """
+    silverenv.setup()
+    from silver.main import exec_main
+    sys.argv = [ "silver-rain", "--profile-startup" ]
+    if headless:
+        sys.argv.append("--headless")
+    exec_main()
+
+def measure(mode):
+    """ Run app once, return [(phase, ms)] """
+    start = time.perf_counter()
+    proc = subprocess.Popen([ sys.executable, os.path.abspath(__file__),
+                              mode ], stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    phases = []
+    try:
+        for line in proc.stdout:
+            phase, _, value = line.rstrip().rpartition(" ")
+            if value != "ms":
+                continue
+            phase, value = phase.rsplit(None, 1)
+            phases.append((phase, float(value)))
+            if phase == "total":
+                phases.append(("process", (time.perf_counter() - start)
+                               * 1000))
+                break
+    finally:
+        # Report is the last thing before the main loop
+        proc.terminate()
+        proc.wait()
+    if not phases:
+        sys.exit("{0} startup failed".format(mode))
+    return phases
+
+def main():
+    if sys.argv[1:] in ([ "gui" ], [ "headless" ]):
+        app(sys.argv[1] == "headless")
+        return
+    try:
+        import dbus
+        import gi
+        gi.require_version("Gst", "1.0")
+        from gi.repository import Gst
+    except (ImportError, ValueError) as e:
+        sys.exit("dbus, PyGObject and GStreamer are needed: " + str(e))
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modes = [ "headless" ]
+    if os.getenv("DISPLAY") or os.getenv("WAYLAND_DISPLAY"):
+        modes.append("gui")
+    for mode in modes:
+        results = [ measure(mode) for _ in range(runs) ]
+        print("{0}, median of {1} runs".format(mode, runs))
+        for i, (phase, _) in enumerate(results[0]):
+            value = statistics.median(x[i][1] for x in results)
+            print("  {0:<16} {1:8.1f} ms".format(phase, value))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Time to first schedule rows at startup: cold, nothing saved yet,
+# the page and icons come from a local stand-in of the site,
+# against warm, the saved snapshot is read.
+# Phases are fetch_schedule, apply_update and model fill.
+# Run: python3 bench/bench_startup_schedule.py [programs] [latency ms]
+
+from http.server import BaseHTTPRequestHandler
+import os
+import shutil
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+import localserver
+import silver.config as config
+import silver.schedule as schedule
+from bench_parse import make_page
+from silver.globals import CACHE_DIR
+from silver.globals import IMG_DIR
+from silver.globals import SCHED_FILE
+from silver.globals import THUMB_DIR
+from silver.schedule import SilverSchedule
+from treestore import TreeStore
+
+def make_png():
+    """ Return 1x1 PNG """
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + \
+               struct.pack(">I", zlib.crc32(kind + data))
+    return b"\x89PNG\r\n\x1a\n" + \
+           chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)) + \
+           chunk(b"IDAT", zlib.compress(b"\x00\x00\x00\x00")) + \
+           chunk(b"IEND", b"")
+
+class Handler(BaseHTTPRequestHandler):
+    """ Schedule page and program icons """
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    page = b""
+    png = make_png()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/programms/"):
+            body, ctype = self.page, "text/html; charset=utf-8"
+        elif self.path.startswith("/i/"):
+            body, ctype = self.png, "image/png"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def clean():
+    """ Forget everything saved """
+    for path in (CACHE_DIR, IMG_DIR, THUMB_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    if os.path.exists(SCHED_FILE):
+        os.remove(SCHED_FILE)
+    config.setup()
+
+def first_rows():
+    """ Load schedule like the app does, return phase timings """
+    times = []
+    start = time.perf_counter()
+    sched = SilverSchedule()
+    update = sched.fetch_schedule()
+    times.append(time.perf_counter() - start)
+    sched.apply_update(update)
+    times.append(time.perf_counter() - start)
+    store = TreeStore()
+    sched.fill_tree_store(store)
+    times.append(time.perf_counter() - start)
+    assert store.get_iter_first()
+    return times
+
+def report(name, times):
+    fetch, apply, fill = (sum(x) / len(x) for x in zip(*times))
+    print("{0:<5} fetch {1:7.1f} ms  apply {2:6.1f} ms  "
+          "first rows {3:7.1f} ms".format(name, fetch * 1e3,
+          (apply - fetch) * 1e3, fill * 1e3))
+
+def main():
+    programs = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    Handler.latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    Handler.page = make_page(programs).encode("utf-8")
+    repeats = 5
+    with localserver.serve(Handler) as url:
+        schedule.SCHED_URL = url + "/programms/"
+        schedule.SILVER_RAIN_URL = url
+        cold, warm = [], []
+        for _ in range(repeats):
+            clean()
+            cold.append(first_rows())
+            # Snapshot is written by apply_update
+            warm.append(first_rows())
+    print("{0} programs, {1:.0f} ms latency".format(programs,
+                                                  Handler.latency * 1e3))
+    report("cold", cold)
+    report("warm", warm)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Upstream traffic of playing and recording at the same time:
+# player and recorder sharing one StreamSource, against each one
+# with its own source, like it used to be. The stream comes from
+# a local Icecast stand-in sending silent 128 kbit/s MP3 in real time,
+# it counts bytes and connections.
+# Needs PyGObject, GStreamer with good and ugly plugins, and an
+# audio output for the player.
+# Run: python3 bench/bench_tee.py [seconds]
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+import localserver
+
+# MPEG-1 Layer III, 128 kbit/s, 44100 Hz, no padding: 417 bytes,
+# 1152 samples each. Empty side info decodes to silence.
+FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+FRAME_TIME = 1152 / 44100
+
+class Handler(BaseHTTPRequestHandler):
+    """ Endless MP3 stream """
+    lock = threading.Lock()
+    served = 0
+    connections = 0
+
+    def do_GET(self):
+        with Handler.lock:
+            Handler.connections += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.end_headers()
+        next_frame = time.monotonic()
+        try:
+            while True:
+                self.wfile.write(FRAME)
+                with Handler.lock:
+                    Handler.served += len(FRAME)
+                next_frame += FRAME_TIME
+                time.sleep(max(0, next_frame - time.monotonic()))
+        except OSError:
+            # Client is gone
+            pass
+
+    def log_message(self, *args):
+        pass
+
+def run(shared, seconds):
+    """ Play and record for seconds, return (bytes, connections) """
+    from gi.repository import GLib
+    from silver.player import SilverPlayer
+    from silver.player import SilverRecorder
+    from silver.stream import StreamSource
+
+    loop = GLib.MainLoop()
+    errors = []
+
+    def error(type, msg):
+        errors.append("{0}: {1}".format(type, msg))
+        loop.quit()
+
+    Handler.served = Handler.connections = 0
+    with localserver.serve(Handler) as url:
+        url += "/silver128.mp3"
+        sources = [ StreamSource() ]
+        if not shared:
+            sources.append(StreamSource())
+        for source in sources:
+            source.set_location(url)
+        player = SilverPlayer(sources[0], error)
+        recorder = SilverRecorder(sources[-1], error)
+        player.start(url)
+        recorder.start("bench")
+        GLib.timeout_add(int(seconds * 1000), loop.quit)
+        loop.run()
+        recorder.clean()
+        player.clean()
+        for source in sources:
+            source.clean()
+    if errors:
+        sys.exit(errors[0])
+    return Handler.served, Handler.connections
+
+def main():
+    try:
+        import gi
+        gi.require_version("Gst", "1.0")
+        from gi.repository import Gst
+    except (ImportError, ValueError) as e:
+        sys.exit("PyGObject and GStreamer are needed: " + str(e))
+    import silver.config as config
+    from silver.globals import CONFIG_FILE
+    Gst.init(None)
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    config.setup()
+    config.adaptive_bitrate = False
+    config.timeshift = 0
+    config.recs_dir = tempfile.mkdtemp(prefix="silver-recs-")
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = {}
+    for shared in (True, False):
+        results[shared] = run(shared, seconds)
+        served, connections = results[shared]
+        print("{0:<8} {1:2d} connections  {2:8d} bytes  {3:6.1f} KiB/s".format(
+              "shared" if shared else "separate", connections, served,
+              served / seconds / 1024))
+    print("upstream bytes shared/separate: {0:.2f}".format(
+          results[True][0] / results[False][0]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Schedule model build time and memory for 7-day and 28-day schedules.
+# Rows hold data columns only, icons and colors are computed when
+# drawn, so building the model doesn't decode a single image.
+# 28 days are four weeks of programs in a single week schedule.
+# Run: python3 bench/bench_tree.py [repeats]
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "tests"))
+import silverenv
+silverenv.setup()
+
+from silver.program import Program
+from silver.schedule import SilverSchedule
+from treestore import TreeStore
+
+def make_schedule(days):
+    """ Return schedule of days * 24 hour long programs,
+        every one with two secondary programs """
+    weeks = days // 7
+    week = [ [] for wd in range(7) ]
+    for wd in range(7):
+        for n in range(weeks):
+            for h in range(24):
+                title = "Title {0}".format((wd * 24 + h) % 40)
+                start = float(h * 3600)
+                week[wd].append(Program(wd, title, "url", ("Host",),
+                                        "/img/{0}.png".format(h % 12),
+                                        start=start, end=start + 3600,
+                                        is_main=True))
+                for c in range(2):
+                    week[wd].append(Program(wd, title + " news", "url",
+                                            start=start, end=start + 600))
+    sched = SilverSchedule.__new__(SilverSchedule)
+    sched._sched_week = week
+    sched._updated = set()
+    return sched
+
+def build(sched):
+    store = TreeStore()
+    sched.fill_tree_store(store)
+    return store
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for days in (7, 28):
+        sched = make_schedule(days)
+        rows = sum(len(x) for x in sched._sched_week)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            build(sched)
+        elapsed = (time.perf_counter() - start) / repeats
+        tracemalloc.start()
+        store = build(sched)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("{0:2d} days  {1:5d} rows  {2:7.2f} ms  {3:7.1f} KiB".format(
+              days, rows, elapsed * 1e3, size / 1024))
+
+if __name__ == "__main__":
+    main()
@@ -19,34 +19,54 @@ Boston, MA 02110-1301 USA
 """
 
 from gi.repository import GObject, Gtk
+from datetime import datetime
 import logging
-import threading
+import time
 
 import silver.config as config
 from silver.gui.about import About
 from silver.gui.controlpanel import ControlPanel
+from silver.gui.css import css_load
 from silver.gui.dialog import show_dialog
 from silver.gui.menubar import Menubar
 from silver.gui.messenger import Messenger
 from silver.gui.notifications import Notifications
+from silver.gui.palette import reload_palette
 from silver.gui.preferences import Preferences
 from silver.gui.schedtree import SchedTree
 from silver.gui.selection import Selection
 from silver.gui.statusicon import StatusIcon
 from silver.gui.window import MainWindow
+from silver.mirrors import MirrorProbe
+from silver.msktz import MSK
 from silver.player import SilverPlayer
-from silver.player import SilverRecorder
+from silver.recordings import PLAN_AHEAD
+from silver.recordings import RecordingManager
+from silver.refresh import RefreshPolicy
 from silver.schedule import SilverSchedule
+from silver.stream import RECONNECTING
+from silver.stream import STREAMING
+from silver.stream import StreamSource
+from silver.tasks import TaskRunner
 from silver.timer import Timer
 
 class SilverApp():
     """ Application """
     def __init__(self):
         # Initialize GStreamer
-        self._player = SilverPlayer(self._on_player_error)
-        self._recorder = SilverRecorder(self._on_recorder_error)
+        self._stream = StreamSource(self._on_stream_state)
+        self._player = SilverPlayer(self._stream, self._on_player_error)
+        self._recorder = RecordingManager(self._stream,
+                                          self._on_recorder_error,
+                                          self._on_recorder_idle,
+                                          self._on_recorder_busy)
         # Schedule
         self._schedule = SilverSchedule()
+        self._sched_tree = None
+        # Background tasks
+        self._tasks = TaskRunner()
+        self._refresh = RefreshPolicy(self.refresh_schedule)
+        self._mirrors = MirrorProbe(self._tasks)
         # On event timer
         self._t_event = Timer(self.update_now_playing)
         # Menubar
@@ -68,6 +88,8 @@ class SilverApp():
         self._status_icon = StatusIcon(self)
         # Update schedule
         self.update_schedule()
+        # Rank stream mirrors
+        self._mirrors.start()
         # Autoplay
         if config.autoplay:
             self.play()
@@ -76,6 +98,7 @@ class SilverApp():
         self._t_event.cancel()
         self._player.clean()
         self._recorder.clean()
+        self._stream.clean()
 
     def present(self):
         self._window.present()
@@ -98,6 +121,32 @@ class SilverApp():
         else:
             self.hide()
 
+    def toggle_playback(self):
+        """ Start/stop player, pause it in time-shift mode """
+        if self._player.playing and not self._player.paused:
+            self.pause()
+        else:
+            self.play()
+
+    def toggle_record(self):
+        """ Start/stop recorder """
+        if self._recorder.playing:
+            self.stop_record()
+        else:
+            self.record()
+
+    def get_status(self):
+        """ Return current state """
+        return { "title"     : self._schedule.get_event_title(),
+                 "host"      : self._schedule.get_event_host(),
+                 "time"      : self._schedule.get_event_time(),
+                 "playing"   : self._player.playing,
+                 "paused"    : self._player.paused,
+                 "delay"     : int(self._player.delay),
+                 "recording" : self._recorder.playing,
+                 "volume"    : self._player.volume,
+                 "muted"     : self._player.muted }
+
     def about(self):
         """ Open about dialog """
         dialog = About(self._window)
@@ -122,7 +171,8 @@ class SilverApp():
         if "APPEARANCE" in apply:
             # Update schedule
             self._dt = self._selection.update()
-            self._sched_tree.update_model()
+            css_load()
+            self._sched_tree.set_palette(reload_palette())
             self._sched_tree.mark_current()
             cover = self._schedule.get_event_cover()
             self._window.set_background(cover)
@@ -165,6 +215,24 @@ class SilverApp():
         # Show notification
         self._notifications.show_stopped()
 
+    def pause(self):
+        """ Update interface, pause player.
+            Stream keeps buffering in time-shift mode,
+            otherwise it's the same as stop. """
+        if not config.timeshift:
+            self.stop()
+            return
+        # Update interface
+        self._menubar.update_playback_menu(False)
+        self._panel.update_playback_button(False)
+        self._status_icon.update_playback_menu(False)
+        # Pause player
+        self._player.pause()
+
+    def seek(self, delay):
+        """ Play delay seconds behind live """
+        self._player.seek(delay)
+
     def set_volume(self, value):
         """ Set player volume """
         if value == 0:
@@ -208,62 +276,81 @@ class SilverApp():
         self._status_icon.update_mute_menu(False)
 
     def record(self):
-        """ Update interface, start recorder """
+        """ Start recorder, interface is updated once it's started """
         # Get name
         name = self._schedule.get_event_title()
-        # Start recorder
-        self._recorder.start(name)
-        # Update interface
-        self._menubar.update_recorder_menu(True)
-        self._status_icon.update_recorder_menu(True)
+        # Stops on its own after the event,
+        # runs until stopped if the schedule isn't known
+        period = self._schedule.get_event_period()
+        self._recorder.start(name, period[1] if period else None)
+
+    def plan_recordings(self):
+        """ Record programs flagged for recording """
+        now = datetime.now(MSK())
+        self._recorder.plan(self._schedule.get_recordings(now,
+                                                          now + PLAN_AHEAD))
 
     def stop_record(self):
-        """ Update interface, stop recorder """
-        # Stop recorder
+        """ Stop all recordings """
+        # Interface is updated once the last one is stopped
         self._recorder.stop()
-        # Update interface
-        self._menubar.update_recorder_menu(False)
-        self._status_icon.update_recorder_menu(False)
 
     def refilter(self, weekday):
         """ Refilter schedule """
         self._sched_tree.refilter(weekday)
 
-    def update_schedule(self, refresh=False):
+    def refresh_schedule(self):
+        """ Refresh schedule in background, keep showing the old one """
+        self.update_schedule(refresh=True, background=True)
+
+    def update_schedule(self, refresh=False, background=False):
         """ Initialize schedule, create treeview and start timers
-            This might take a while, so run in thread """
-        def init_sched():
-            # Initialize schedule
-            if not self._schedule.update_schedule(refresh):
-                GObject.idle_add(error)
-            else:
-                if not refresh:
-                    # Initialize TreeView
-                    self._sched_tree = SchedTree(self._schedule)
-                    self._window.set_widget(self._sched_tree)
-                else:
-                    # Update TreeView
-                    self._sched_tree.update_model()
-                GObject.idle_add(cleanup)
-
-        def cleanup():
-            t.join()
-            # Draw sched tree if just created
-            if not refresh:
+            This might take a while, so load it in background.
+            Saved schedule is shown first, refresh is planned by
+            RefreshPolicy, so a stale one is refreshed right away. """
+        def fetch(task):
+            return self._schedule.fetch_schedule(refresh, task)
+
+        def done(update):
+            """ Generator, each step runs in its own main loop slice """
+            if not update:
+                error()
+                return
+            self._schedule.apply_update(update, save=False)
+            yield
+            shown = self._sched_tree
+            if not self._sched_tree:
+                # Initialize TreeView
+                self._sched_tree = SchedTree(self._schedule,
+                                             self.plan_recordings)
+                self._window.set_widget(self._sched_tree)
                 self._sched_tree.show()
+                logging.debug("Schedule shown in {0:.3f}s{1}".format(
+                              time.monotonic() - start,
+                              "" if update.refreshed else " (saved)"))
+            else:
+                # Update changed rows only
+                self._sched_tree.update_rows()
+            yield
+            created = self._schedule.get_schedule_created()
+            self._refresh.schedule(created)
+            self._panel.status_set_schedule_age(time.time() - created)
             # Update status icon tooltip
             title = self._schedule.get_event_title()
             host = self._schedule.get_event_host()
-            time = self._schedule.get_event_time()
+            event_time = self._schedule.get_event_time()
             img = self._schedule.get_event_icon()
-            self._status_icon.update_event(title, host, time, img)
+            self._status_icon.update_event(title, host, event_time, img)
             # Reset status
             self._panel.status_set_playing()
             self._panel.status_set_text(title)
-            # Start timer
+            # Start timers
             self._t_event.start(self._schedule.get_event_end())
-            # Show agenda for today
-            self._dt = self._selection.update()
+            self.plan_recordings()
+            # Show agenda for today, background refresh keeps
+            # the weekday being viewed
+            if not (background and shown):
+                self._dt = self._selection.update()
             # Update treeview
             self._sched_tree.mark_current()
             # Set background
@@ -271,11 +358,18 @@ class SilverApp():
                 cover = self._schedule.get_event_cover()
                 self._window.set_background(cover)
                 # Update covers
-                if not cover or refresh:
+                if not cover or update.refreshed:
                     self.update_schedule_covers()
-
-        def error():
-            t.join()
+            if update.refreshed:
+                yield
+                self._schedule.save_schedule()
+
+        def error(e=None):
+            # Try again later
+            self._refresh.failed()
+            if background:
+                logging.error("Couldn't refresh schedule")
+                return
             # Show error status
             self._panel.status_set_playing()
             self._panel.status_set_text(_("Couldn't update schedule"))
@@ -290,45 +384,47 @@ class SilverApp():
             img = self._schedule.get_event_icon()
             self._status_icon.update_event(title, host, time, img)
 
-        # Show updating status
-        self._panel.status_set_updating()
-        t = threading.Thread(target=init_sched)
-        t.start()
+        start = time.monotonic()
+        if not background:
+            # Show updating status
+            self._panel.status_set_updating()
+        # New refresh supersedes the running one
+        self._tasks.run("schedule", fetch, done, error=error)
 
     def update_schedule_covers(self):
         """ Update program covers """
-        def update_covers():
-            self._schedule.update_covers()
-            GObject.idle_add(cleanup)
+        def fetch(task):
+            return self._schedule.fetch_covers(urls, task)
 
-        def cleanup():
-            t.join()
+        def done(covers):
+            self._schedule.apply_covers(covers)
             # Set background
             self._window.set_background(self._schedule.get_event_cover())
-            # Reset status
+            reset_status()
+
+        def reset_status(e=None):
             self._panel.status_set_playing()
             title = self._schedule.get_event_title()
             self._panel.status_set_text(title)
 
+        urls = self._schedule.get_program_urls()
         self._panel.status_set_downloading_covers()
-        t = threading.Thread(target=update_covers)
-        t.start()
+        self._tasks.run("covers", fetch, done,
+                        progress=self._panel.status_set_downloading_covers,
+                        error=reset_status)
 
     def update_now_playing(self):
         """ Update label, mark current event, show notifications """
-        # Stop recorder
-        if self._recorder.playing:
-            self.stop_record()
         # Update event
+        # Previous recording goes on till its own end, so nothing is lost
         self._schedule.update_event()
-        # Check if should be recorded
-        if self._schedule.get_record_status():
-            self.record()
+        # Start timer first, so a failed recording doesn't stop it
+        self._t_event.start(self._schedule.get_event_end())
+        # Recordings starting soon
+        self.plan_recordings()
         # Check if should start player
         if self._schedule.get_play_status():
             self.play()
-        # Display current agenda
-        self._dt = self._selection.update(dt=self._dt)
         # Reset TreeView line
         self._sched_tree.reset_marked()
         # Update treeview
@@ -346,22 +442,38 @@ class SilverApp():
         self._panel.status_set_text(title)
         # Show notification
         self._notifications.show_playing(title, host, img)
-        # Start timer
-        self._t_event.start(self._schedule.get_event_end())
 
     def quit(self):
         """ Exit """
         Gtk.main_quit()
 
+    def _on_stream_state(self, state, lost):
+        """ Stream connection callback """
+        if state == RECONNECTING:
+            self._notifications.show_reconnecting()
+            self._mirrors.failed()
+        elif state == STREAMING:
+            self._recorder.mark_gap(lost)
+            self._notifications.show_reconnected(lost)
+
     def _on_player_error(self, type, msg):
         """ Player error callback """
         self._gstreamer_error_show(type, msg)
         self.stop()
 
     def _on_recorder_error(self, type, msg):
-        """ Recorder error callback """
+        """ Recorder error callback, failed recording is already stopped """
         self._gstreamer_error_show(type, msg)
-        self.stop_record()
+
+    def _on_recorder_busy(self):
+        """ Recording started """
+        self._menubar.update_recorder_menu(True)
+        self._status_icon.update_recorder_menu(True)
+
+    def _on_recorder_idle(self):
+        """ Nothing is being recorded """
+        self._menubar.update_recorder_menu(False)
+        self._status_icon.update_recorder_menu(False)
 
     def _gstreamer_error_show(self, type, msg):
         """ Show error dialog """
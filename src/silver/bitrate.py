@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from collections import deque
+from urllib.parse import urlsplit
+import time
+
+from silver.globals import STREAM_BITRATE
+
+__all__ = ["BitrateMonitor", "DOWN", "UP", "bitrate_of", "stream_variant"]
+
+DOWN    = "down"
+UP      = "up"
+
+# Buffer fill in percent treated as underrun
+UNDERRUN            = 10
+# Switch down after UNDERRUNS underruns within UNDERRUN_WINDOW seconds
+UNDERRUNS           = 3
+UNDERRUN_WINDOW     = 60
+# or if data comes slower than SLOW * bitrate for SLOW_TIME seconds
+SLOW                = 0.9
+SLOW_TIME           = 20
+# Try higher bitrate after UP_TIME seconds without underruns,
+# wait twice as long after every failed try
+UP_TIME             = 120
+UP_TIME_MAX         = 3600
+
+def bitrate_of(url):
+    """ Return stream bitrate in bytes per second, 0 if unknown """
+    return STREAM_BITRATE.get(url, 0) * 1000 // 8
+
+def stream_variant(url, direction):
+    """ Return url of the next lower (DOWN) or higher (UP) bitrate
+        stream on the same server, None if there's none """
+    host = urlsplit(url).netloc
+    kbps = STREAM_BITRATE.get(url)
+    if kbps is None:
+        return None
+    found = [ (rate, x) for x, rate in STREAM_BITRATE.items()
+              if urlsplit(x).netloc == host and
+                 (rate < kbps if direction == DOWN else rate > kbps) ]
+    if not found:
+        return None
+    return (max(found) if direction == DOWN else min(found))[1]
+
+class BitrateMonitor():
+    """ Decide when to change stream bitrate
+
+        Fed with buffer fill and incoming data rate from GStreamer
+        buffering messages. Repeated underruns or data coming slower
+        than the stream plays mean the connection can't keep up.
+        Whether it could take more is only known by trying, so
+        switching up is probed after a quiet period which grows
+        every time the probe fails. """
+    def __init__(self):
+        self._up_time = UP_TIME
+        self._switched_up = None
+        self.reset()
+
+    def reset(self):
+        """ Forget measurements, on stream change """
+        self._underruns = deque()
+        self._underrun = False
+        self._slow_since = None
+        self._quiet_since = time.monotonic()
+
+    def update(self, percent, rate, bitrate, higher=True):
+        """ Take buffer fill percent and rate in bytes per second
+            of the stream playing at bitrate bytes per second,
+            higher is False if there's no better stream.
+            Return DOWN, UP or None. """
+        now = time.monotonic()
+        if percent < UNDERRUN:
+            if not self._underrun:
+                self._underruns.append(now)
+            self._underrun = True
+            self._quiet_since = now
+        else:
+            self._underrun = False
+        while self._underruns and now - self._underruns[0] > UNDERRUN_WINDOW:
+            self._underruns.popleft()
+
+        if rate and bitrate and rate < bitrate * SLOW:
+            if self._slow_since is None:
+                self._slow_since = now
+        else:
+            self._slow_since = None
+
+        if len(self._underruns) >= UNDERRUNS or \
+                (self._slow_since and now - self._slow_since >= SLOW_TIME):
+            if self._switched_up and now - self._switched_up < UP_TIME:
+                # Higher bitrate didn't work out
+                self._up_time = min(self._up_time * 2, UP_TIME_MAX)
+            self._switched_up = None
+            self.reset()
+            return DOWN
+        if higher and now - self._quiet_since >= self._up_time:
+            self._switched_up = now
+            self.reset()
+            return UP
+        return None
@@ -18,30 +18,49 @@ Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301 USA
 """
 
-from gi.repository import Gtk
 import configparser
 import os
 import re
+import sys
 
 from silver.globals import CONFIG_FILE
 from silver.globals import STREAM_URL_LIST
 
 def font_probe():
     """ Get system default font family """
+    if "gi.repository.Gtk" not in sys.modules:
+        # Headless, don't load Gtk just for that
+        return "Sans"
+    from gi.repository import Gtk
     t = Gtk.Label("")
     s = t.get_style()
     font = s.font_desc.get_family()
     return font
 
+class _lazy():
+    """ Class attribute computed on first access.
+        Probing fonts needs Gtk, which isn't loaded
+        just to read configuration. """
+    def __init__(self, func):
+        self._func = func
+
+    def __get__(self, obj, cls):
+        value = self._func(cls)
+        setattr(cls, self._func.__name__, value)
+        return value
+
 class Default():
     """ Default configuration """
     autoplay            = False
     start_hidden        = False
     recs_dir            = os.getenv("HOME") + "/Recordings"
     recs_prefix         = "%m-%d-%y-%H:%M-"
+    recs_padding        = 60
     use_css             = True
     css_path            = ""
     stream_url          = STREAM_URL_LIST[0]
+    adaptive_bitrate    = True
+    mirror_select       = True
     background_image    = True
     bg_colors           = ["#FFFFFF", "#F2F2F2"]
     bg_alpha            = [0.87, 0.87]
@@ -49,17 +68,38 @@ class Default():
     selected_bg_color   = "#FF4545"
     selected_alpha      = 0.95
     selected_font_color = "white"
-    font_family         = font_probe()
     font_size           = "11"
-    font                = "{0} {1}".format(font_family, font_size)
-    selected_font       = "{0} Bold {1}".format(font_family, font_size)
     language            = 0
     message_sender      = ""
+    img_store_size      = 64
+    sched_max_age       = 24
+    sched_refresh_hour  = 6
+    timeshift           = 0
     proxy_required      = False
     proxy_uri           = ""
     proxy_id            = ""
     proxy_pw            = ""
 
+    @_lazy
+    def font_family(cls):
+        return font_probe()
+
+    @_lazy
+    def font(cls):
+        return "{0} {1}".format(cls.font_family, cls.font_size)
+
+    @_lazy
+    def selected_font(cls):
+        return "{0} Bold {1}".format(cls.font_family, cls.font_size)
+
+def get_font():
+    """ Return font set by user or the default one """
+    return font or Default.font
+
+def get_selected_font():
+    """ Return selection font set by user or the default one """
+    return selected_font or Default.selected_font
+
 def _init():
     """ Declare set of globals
         initialized with default configuration """
@@ -71,12 +111,18 @@ def _init():
     recs_dir = Default.recs_dir
     global recs_prefix
     recs_prefix = Default.recs_prefix
+    global recs_padding
+    recs_padding = Default.recs_padding
     global use_css
     use_css = Default.use_css
     global css_path
     css_path = Default.css_path
     global stream_url
     stream_url = Default.stream_url
+    global adaptive_bitrate
+    adaptive_bitrate = Default.adaptive_bitrate
+    global mirror_select
+    mirror_select = Default.mirror_select
     global background_image
     background_image = Default.background_image
     global bg_colors
@@ -91,14 +137,25 @@ def _init():
     selected_alpha = Default.selected_alpha
     global selected_font_color
     selected_font_color = Default.selected_font_color
+    # Empty fonts aren't set by user, defaults are probed on first use.
+    # They aren't saved, so configuration written without Gtk
+    # doesn't pin the fallback font
     global font
-    font = Default.font
+    font = ""
     global selected_font
-    selected_font = Default.selected_font
+    selected_font = ""
     global language
     language = Default.language
     global message_sender
     message_sender = Default.message_sender
+    global img_store_size
+    img_store_size = Default.img_store_size
+    global sched_max_age
+    sched_max_age = Default.sched_max_age
+    global sched_refresh_hour
+    sched_refresh_hour = Default.sched_refresh_hour
+    global timeshift
+    timeshift = Default.timeshift
     global proxy_required
     proxy_required = Default.proxy_required
     global proxy_uri
@@ -125,12 +182,31 @@ def _load():
     global recs_prefix
     recs_prefix = cfg.get("GENERAL", "recordsprefix",
                     fallback=Default.recs_prefix)
+    global recs_padding
+    recs_padding = cfg.getint("GENERAL", "recordspadding",
+                    fallback=Default.recs_padding)
     global language
     language = int(cfg.get("GENERAL", "language",
                     fallback=Default.language))
     global message_sender
     message_sender = cfg.get("GENERAL", "messagesender",
                     fallback=Default.message_sender)
+    global img_store_size
+    img_store_size = cfg.getint("GENERAL", "imagestoresize",
+                    fallback=Default.img_store_size)
+    global sched_max_age
+    sched_max_age = cfg.getint("GENERAL", "schedulemaxage",
+                    fallback=Default.sched_max_age)
+    # Refreshing all the time won't help anybody
+    sched_max_age = max(1, sched_max_age)
+    global sched_refresh_hour
+    sched_refresh_hour = cfg.getint("GENERAL", "schedulerefreshhour",
+                    fallback=Default.sched_refresh_hour)
+    if not -1 <= sched_refresh_hour <= 23:
+        sched_refresh_hour = Default.sched_refresh_hour
+    global timeshift
+    timeshift = cfg.getint("GENERAL", "timeshiftminutes",
+                    fallback=Default.timeshift)
     # Appearance
     global use_css
     use_css = cfg.getboolean("APPEARANCE", "usecss",
@@ -162,14 +238,20 @@ def _load():
                     fallback=Default.selected_font_color)
     global font
     font = cfg.get("APPEARANCE", "Font",
-                    fallback=Default.font)
+                    fallback="")
     global selected_font
     selected_font = cfg.get("APPEARANCE", "selectedfont",
-                    fallback=Default.selected_font)
+                    fallback="")
     # Network
     global stream_url
     stream_url = cfg.get("NETWORK", "streamurl",
                     fallback=Default.stream_url)
+    global adaptive_bitrate
+    adaptive_bitrate = cfg.getboolean("NETWORK", "adaptivebitrate",
+                    fallback=Default.adaptive_bitrate)
+    global mirror_select
+    mirror_select = cfg.getboolean("NETWORK", "selectmirror",
+                    fallback=Default.mirror_select)
     global proxy_required
     proxy_required = cfg.getboolean("NETWORK", "proxyrequired",
                     fallback=Default.proxy_required)
@@ -188,11 +270,16 @@ def save():
     cfg = configparser.ConfigParser()
     cfg["GENERAL"] = {
             "autoplay"          : autoplay,
+            "imagestoresize"    : img_store_size,
             "language"          : language,
             "messagesender"     : message_sender,
             "recordsdirectory"  : recs_dir,
+            "recordspadding"    : recs_padding,
             "recordsprefix"     : re.sub("%", "%%", recs_prefix),
+            "schedulemaxage"    : sched_max_age,
+            "schedulerefreshhour" : sched_refresh_hour,
             "starthidden"       : start_hidden,
+            "timeshiftminutes"  : timeshift,
             }
     cfg["APPEARANCE"] = {
             "backgroundimage"   : background_image,
@@ -208,10 +295,12 @@ def save():
             "usecss"            : use_css,
             }
     cfg["NETWORK"] = {
+            "adaptivebitrate"   : adaptive_bitrate,
             "proxyid"           : proxy_id,
             "proxypw"           : proxy_pw,
             "proxyrequired"     : proxy_required,
             "proxyuri"          : proxy_uri,
+            "selectmirror"      : mirror_select,
             "streamurl"         : stream_url,
             }
     with open(CONFIG_FILE, "w") as configfile:
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from datetime import datetime
+import logging
+
+from silver.mirrors import MirrorProbe
+from silver.msktz import MSK
+from silver.recordings import PLAN_AHEAD
+from silver.recordings import RecordingManager
+from silver.refresh import RefreshPolicy
+from silver.schedule import SilverSchedule
+from silver.stream import STREAMING
+from silver.stream import StreamSource
+from silver.tasks import TaskRunner
+from silver.timer import Timer
+
+class SilverDaemon():
+    """ Headless application
+
+        Keeps schedule up to date and records flagged programs.
+        No GTK is loaded, everything runs on a GLib main loop.
+        Provides the same remote API as SilverApp. """
+    def __init__(self):
+        self._stream = StreamSource(self._on_stream_state)
+        self._recorder = RecordingManager(self._stream,
+                                          self._on_recorder_error)
+        self._schedule = SilverSchedule()
+        self._t_event = Timer(self.update_now_playing)
+        self._tasks = TaskRunner()
+        self._refresh = RefreshPolicy(self.refresh_schedule)
+        self._mirrors = MirrorProbe(self._tasks)
+        self.update_schedule()
+        self._mirrors.start()
+
+    def clean(self):
+        self._t_event.cancel()
+        self._recorder.clean()
+        self._stream.clean()
+
+# Remote API
+    def present(self):
+        logging.warning("Running headless, there's no window")
+
+    def play(self):
+        logging.warning("Running headless, there's no player")
+
+    def stop(self):
+        logging.warning("Running headless, there's no player")
+
+    def toggle_playback(self):
+        self.play()
+
+    def pause(self):
+        logging.warning("Running headless, there's no player")
+
+    def seek(self, delay):
+        logging.warning("Running headless, there's no player")
+
+    def volume_step(self, value):
+        logging.warning("Running headless, there's no player")
+
+    def record(self):
+        """ Start recorder, it runs until stopped
+            if the schedule isn't known """
+        period = self._schedule.get_event_period()
+        self._recorder.start(self._schedule.get_event_title(),
+                             period[1] if period else None)
+
+    def stop_record(self):
+        """ Stop recorder """
+        self._recorder.stop()
+
+    def toggle_record(self):
+        """ Start/stop recorder """
+        if self._recorder.playing:
+            self.stop_record()
+        else:
+            self.record()
+
+    def get_status(self):
+        """ Return current state """
+        return { "title"     : self._schedule.get_event_title(),
+                 "host"      : self._schedule.get_event_host(),
+                 "time"      : self._schedule.get_event_time(),
+                 "playing"   : False,
+                 "paused"    : False,
+                 "delay"     : 0,
+                 "recording" : self._recorder.playing,
+                 "volume"    : 0,
+                 "muted"     : True }
+
+    def refresh_schedule(self):
+        """ Refresh schedule in background """
+        self.update_schedule(refresh=True)
+
+    def update_schedule(self, refresh=False):
+        """ Load schedule in background, start timer """
+        def fetch(task):
+            return self._schedule.fetch_schedule(refresh, task)
+
+        def done(update):
+            if not update:
+                error()
+                return
+            self._schedule.apply_update(update)
+            self._refresh.schedule(self._schedule.get_schedule_created())
+            logging.info("Schedule updated")
+            self._on_event()
+
+        def error(e=None):
+            logging.error("Couldn't update schedule")
+            self._refresh.failed()
+
+        self._tasks.run("schedule", fetch, done, error=error)
+
+    def update_now_playing(self):
+        """ Switch to next event """
+        # Update event
+        # Previous recording goes on till its own end, so nothing is lost
+        self._schedule.update_event()
+        self._on_event()
+
+    def _on_event(self):
+        """ Start recording if needed, wait for the next event """
+        title = self._schedule.get_event_title()
+        logging.info("On air: " + title)
+        # Start timer first, so a failed recording doesn't stop it
+        self._t_event.start(self._schedule.get_event_end())
+        # Flagged programs starting soon, with padding
+        now = datetime.now(MSK())
+        self._recorder.plan(self._schedule.get_recordings(now,
+                                                          now + PLAN_AHEAD))
+
+    def _on_stream_state(self, state, lost):
+        """ Stream connection callback, logged by the source """
+        if state == STREAMING:
+            self._recorder.mark_gap(lost)
+        else:
+            self._mirrors.failed()
+
+    def _on_recorder_error(self, type, msg):
+        """ Recorder error callback """
+        if type == "warning":
+            logging.warning(msg)
+        elif type == "error":
+            # Failed recording is already stopped
+            logging.error(msg)
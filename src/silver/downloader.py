@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+import os
+import requests
+import tempfile
+
+__all__ = ["Downloader", "create_session", "save_atomic"]
+
+# Number of simultaneous downloads
+WORKERS = 8
+
+def create_session(pool_size=WORKERS):
+    """ Return session keeping up to pool_size connections alive """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def save_atomic(name, chunks):
+    """ Write chunks to temporary file and move it to name """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(name))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, name)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+class Downloader():
+    """ Bounded pool of download workers """
+    def __init__(self, workers=WORKERS):
+        self._workers = workers
+
+    def run(self, func, items, progress=None):
+        """ Call func once for every unique item.
+            Return {item : result}, report progress(done, total) """
+        items = list(dict.fromkeys(items))
+        results = {}
+        if not items:
+            return results
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            jobs = { pool.submit(func, x) : x for x in items }
+            for done, job in enumerate(as_completed(jobs), 1):
+                results[jobs[job]] = job.result()
+                if progress:
+                    progress(done, len(items))
+        return results
@@ -51,6 +51,9 @@ class ControlPanel(Gtk.Box):
         self._status.set_selectable(True)
         self._status.set_alignment(-1, 0.45)
         self._status.set_use_markup(True)
+        # Schedule age, shown while it's not up to date
+        self._age = Gtk.Label()
+        self._age.set_use_markup(True)
         # Mute Button
         text, icon = get_volume_label()
         self._mute = create_toolbutton(text, icon)
@@ -77,10 +80,12 @@ class ControlPanel(Gtk.Box):
         self.pack_start(toolbar, False, False, 0)
         self.pack_start(self._spinner, False, False, 0)
         self.pack_start(self._status, True, False, 0)
+        self.pack_start(self._age, False, False, 0)
         self.pack_end(self._volume, False, False, 0)
         self.pack_end(self._mute, False, False, 0)
         self.show_all()
         self._spinner.hide()
+        self._age.hide()
 
     def update_playback_button(self, playing):
         """ Update Play/Stop button """
@@ -119,12 +124,15 @@ class ControlPanel(Gtk.Box):
         self._spinner.start()
         self.status_set_text(_("Updating schedule..."))
 
-    def status_set_downloading_covers(self):
-        """ Show spinner and "Updating" message """
+    def status_set_downloading_covers(self, done=0, total=0):
+        """ Show spinner and "Downloading" message with progress """
         self._refresh.hide()
         self._spinner.show()
         self._spinner.start()
-        self.status_set_text(_("Downloading covers..."))
+        msg = _("Downloading covers...")
+        if total:
+            msg += " ({0}/{1})".format(done, total)
+        self.status_set_text(msg)
 
     def status_set_playing(self):
         """ Hide spinner and show currently playing """
@@ -132,6 +140,23 @@ class ControlPanel(Gtk.Box):
         self._spinner.hide()
         self._refresh.show()
 
+    def status_set_schedule_age(self, age):
+        """ Show how old schedule is next to status
+            and in refresh button tooltip """
+        hours = int(age // 3600)
+        if hours < 1:
+            msg = _("Schedule is up to date")
+        elif hours < 48:
+            msg = _("Schedule updated {0} h ago").format(hours)
+        else:
+            msg = _("Schedule updated {0} days ago").format(hours // 24)
+        self._refresh.set_tooltip_text(_("Update schedule") + "\n" + msg)
+        if hours < 1:
+            self._age.hide()
+        else:
+            self._age.set_markup("<small><i>" + msg + "</i></small>")
+            self._age.show()
+
     def status_set_text(self, msg):
         """ Show message in status """
         msg = "<span size='12000'><b>" + msg + "</b></span>"
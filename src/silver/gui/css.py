@@ -25,6 +25,9 @@ from silver.gui.common import rgba_to_hex
 
 __all__ = ["css_load"]
 
+# Single provider, reloaded when style changes
+_provider = None
+
 _silver_style = b"""
 @define-color silver_rain_red #FF4545;
 /*************************
@@ -90,8 +93,13 @@ def color_probe():
     return rgba_to_hex(color)
 
 def css_load():
-    """ Load style """
+    """ Load style, replace the one loaded before """
+    global _provider
     if not config.use_css:
+        if _provider:
+            Gtk.StyleContext.remove_provider_for_screen(
+                    Gdk.Screen.get_default(), _provider)
+            _provider = None
         return
 
     if config.css_path:
@@ -101,9 +109,10 @@ def css_load():
         css_data = _silver_style
         css_data += bytes(_treeview_selected.format(color_probe()), 'utf-8')
 
-    style_provider = Gtk.CssProvider()
-    style_provider.load_from_data(css_data)
-    Gtk.StyleContext.add_provider_for_screen(
-            Gdk.Screen.get_default(),
-            style_provider,
-            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+    if not _provider:
+        _provider = Gtk.CssProvider()
+        Gtk.StyleContext.add_provider_for_screen(
+                Gdk.Screen.get_default(),
+                _provider,
+                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+    _provider.load_from_data(css_data)
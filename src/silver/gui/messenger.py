@@ -28,6 +28,7 @@ import silver.config as config
 from silver.globals import ICON
 from silver.globals import SILVER_RAIN_URL
 from silver.gui.dialog import show_dialog
+from silver.netpolicy import send_request
 
 COLOR_TEXTVIEW_BORDER   = "#7C7C7C"
 COLOR_INVALID           = "#FF4545"
@@ -229,7 +230,8 @@ class Messenger():
                                           'form_text_82' : text})
         # POST request
         try:
-            resp = self._session.post(MESSENGER_URL, data=message)
+            resp = send_request(self._session, "POST", MESSENGER_URL,
+                                data=message)
         except requests.exceptions.RequestException as e:
             logging.error(str(e))
             return err
@@ -255,7 +257,7 @@ class Messenger():
                 "DNT"               : "1",
                 "Upgrade-Insecure-Requests" : "1" }
         try:
-            resp = self._session.get(SILVER_RAIN_URL)
+            resp = send_request(self._session, "GET", SILVER_RAIN_URL)
             # Get sessid from form
             sessid = re.sub(r'^.*name="sessid" id="sessid_6" value="(.*?)".*$',
                             r'\1', resp.text)
@@ -264,7 +266,7 @@ class Messenger():
             self._session.headers["Accept"] = "*/*"
             self._session.headers["Referer"] = "http://silver.ru/"
             del self._session.headers["Upgrade-Insecure-Requests"]
-            resp = self._session.get(BITRIX_SERVER)
+            resp = send_request(self._session, "GET", BITRIX_SERVER)
 
         except requests.exceptions.RequestException as e:
             logging.error(str(e))
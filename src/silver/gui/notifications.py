@@ -33,6 +33,21 @@ class Notifications(Notify.Notification):
         self.update(self._header, body)
         self.show()
 
+    def show_reconnecting(self):
+        """ Show notification on lost stream """
+        body = "<b>{0}</b>".format(_("Connection lost, reconnecting"))
+        img = "network-error"
+        self.update(self._header, body, img)
+        self.show()
+
+    def show_reconnected(self, lost):
+        """ Show notification when stream is back """
+        body = "<b>{0}</b>\n{1}".format(_("Reconnected"),
+                                        _("{0} seconds lost").format(int(lost)))
+        img = "network-transmit-receive"
+        self.update(self._header, body, img)
+        self.show()
+
     def show_stopped(self):
         """ Show notification on stop """
         body = "<b>{0}</b>".format(_("Stopped"))
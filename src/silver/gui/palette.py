@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import Pango
+
+import silver.config as config
+from silver.gui.common import hex_to_rgba
+
+__all__ = ["Palette", "get_palette", "reload_palette"]
+
+class Palette():
+    """ Schedule colors and fonts parsed from config
+
+        bg                  [Gdk.RGBA light, Gdk.RGBA dark]
+        fg                  str
+        font                Pango.FontDescription
+        selected_bg         Gdk.RGBA
+        selected_fg         str
+        selected_font       Pango.FontDescription """
+    def __init__(self):
+        self.bg = []
+        for dark in (False, True):
+            color = hex_to_rgba(config.bg_colors[dark])
+            color.alpha = config.bg_alpha[dark]
+            self.bg.append(color)
+        self.fg = config.font_color
+        self.font = Pango.FontDescription.from_string(config.get_font())
+        self.selected_bg = hex_to_rgba(config.selected_bg_color)
+        self.selected_bg.alpha = config.selected_alpha
+        self.selected_fg = config.selected_font_color
+        self.selected_font = Pango.FontDescription.from_string(
+                                                config.get_selected_font())
+
+_palette = None
+
+def get_palette():
+    """ Return current palette """
+    global _palette
+    if not _palette:
+        _palette = Palette()
+    return _palette
+
+def reload_palette():
+    """ Parse config again after appearance settings changed """
+    global _palette
+    _palette = Palette()
+    return _palette
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import GdkPixbuf, GLib, Gtk
+from collections import OrderedDict
+import logging
+import os
+import threading
+
+from silver.globals import ICON
+from silver.globals import THUMB_DIR
+from silver.imagestore import thumb_name
+
+__all__ = ["get_pixbuf"]
+
+# Decoded pixbufs memory limit in bytes
+PIXBUF_CACHE_SIZE = 16 * 1024 * 1024
+
+class PixbufCache():
+    """ Scaled pixbufs keyed by (path, size)
+
+        Every image is decoded and scaled once. Scaled copies are
+        kept on disk as thumbnails, decoded ones are kept in memory
+        and evicted in LRU order when they take more than max_size. """
+    def __init__(self, thumb_dir, max_size=PIXBUF_CACHE_SIZE):
+        self._thumb_dir = thumb_dir
+        self._max_size = max_size
+        self._size = 0
+        self._lock = threading.Lock()
+        self._pixbufs = OrderedDict()
+
+    def get(self, path, size):
+        """ Return pixbuf size x size, application icon if path is empty """
+        if path and not os.path.exists(path):
+            path = ""
+        key = (path, size)
+        with self._lock:
+            pb = self._pixbufs.get(key)
+            if pb:
+                self._pixbufs.move_to_end(key)
+                return pb
+        pb = self._load(path, size)
+        with self._lock:
+            if key not in self._pixbufs:
+                self._pixbufs[key] = pb
+                self._size += pb.get_rowstride() * pb.get_height()
+            while self._size > self._max_size and len(self._pixbufs) > 1:
+                k, old = self._pixbufs.popitem(last=False)
+                self._size -= old.get_rowstride() * old.get_height()
+            return self._pixbufs[key]
+
+    def _load(self, path, size):
+        """ Load thumbnail, create it if doesn't exist """
+        if not path:
+            icontheme = Gtk.IconTheme.get_default()
+            pb = icontheme.load_icon(ICON, 256, 0)
+            return pb.scale_simple(size, size, GdkPixbuf.InterpType.BILINEAR)
+        thumb = os.path.join(self._thumb_dir, thumb_name(path, size))
+        try:
+            if (os.path.exists(thumb) and
+                    os.path.getmtime(thumb) >= os.path.getmtime(path)):
+                return GdkPixbuf.Pixbuf.new_from_file(thumb)
+            # Keep aspect ratio
+            pb = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size,
+                                                         True)
+            pb.savev(thumb, "png", [], [])
+            return pb
+        except GLib.Error as e:
+            logging.error("Couldn't load image: " + path)
+            logging.error(str(e))
+            return self._load("", size)
+
+_cache = PixbufCache(THUMB_DIR)
+
+def get_pixbuf(path, size):
+    """ Return shared scaled pixbuf """
+    return _cache.get(path, size)
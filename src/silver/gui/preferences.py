@@ -217,7 +217,7 @@ class Preferences(Gtk.Dialog):
         text.set_size_request(180, -1)
         fonts.attach(text, 0, 0, 1, 1)
         self._font = Gtk.FontButton()
-        self._font.set_font_name(config.font)
+        self._font.set_font_name(config.get_font())
         self._font.connect("font-set", self._on_font_changed)
         fonts.attach_next_to(self._font, text,
                                   Gtk.PositionType.RIGHT, 1, 1)
@@ -232,7 +232,7 @@ class Preferences(Gtk.Dialog):
         text.set_size_request(180, -1)
         fonts.attach(text, 0, 1, 1, 1)
         self._selection_font = Gtk.FontButton()
-        self._selection_font.set_font_name(config.selected_font)
+        self._selection_font.set_font_name(config.get_selected_font())
         self._selection_font.connect("font-set",
                 self._on_selection_font_changed)
         fonts.attach_next_to(self._selection_font, text,
@@ -464,13 +464,13 @@ class Preferences(Gtk.Dialog):
         config.selected_alpha = config.Default.selected_alpha
         # Font
         self._font.set_font_name(config.Default.font)
-        config.font = config.Default.font
+        config.font = ""
         color.parse(config.Default.font_color)
         self._font_color.set_rgba(color)
         config.font_color = config.Default.font_color
         # Selection font
         self._selection_font.set_font_name(config.Default.selected_font)
-        config.selected_font = config.Default.selected_font
+        config.selected_font = ""
         color.parse(config.Default.selected_font_color)
         self._selection_font_color.set_rgba(color)
         config.selected_font_color = config.Default.selected_font_color
@@ -18,32 +18,33 @@ Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301 USA
 """
 
-from gi.repository import Gtk, GdkPixbuf, Gdk
+from gi.repository import Gtk, GObject
 from datetime import datetime
 import subprocess
 
-import silver.config as config
 from silver.gui.common import create_menuitem
-from silver.gui.common import hex_to_rgba
+from silver.gui.palette import get_palette
+from silver.gui.pixbufcache import get_pixbuf
 from silver.msktz import MSK
-from silver.schedule import SCHED_WEEKDAY_LIST
 
 class SchedTree(Gtk.TreeView):
-    """ Schedule TreeView """
-    def __init__(self, sched):
+    """ Schedule TreeView
+        record_func() is called when recording flags change """
+    def __init__(self, sched, record_func=None):
         Gtk.TreeView.__init__(self)
         self.set_grid_lines(Gtk.TreeViewGridLines.HORIZONTAL)
         self.connect("button-release-event", self._on_button_release_event)
-        self._weekday_filter = datetime.now(MSK()).strftime("%A")
-        self._marked = False
-        self._marked_pos = 0
+        self._weekday_filter = datetime.now(MSK()).weekday()
+        self._marked = None
         self._sched = sched
+        self._record_callback = record_func
+        self._palette = get_palette()
         # Init model
         self._init_model()
         # Icon
         renderer = Gtk.CellRendererPixbuf()
-        column = Gtk.TreeViewColumn("", renderer, pixbuf=6,
-                                    cell_background_rgba=7)
+        column = Gtk.TreeViewColumn("", renderer)
+        column.set_cell_data_func(renderer, self._icon_func)
         column.set_fixed_width(100)
         renderer.set_alignment(1, 0.5)
         self.append_column(column)
@@ -53,8 +54,8 @@ class SchedTree(Gtk.TreeView):
         renderer.set_alignment(0.5, 0.5)
         renderer.set_property('height', 50)
         # Time
-        column = Gtk.TreeViewColumn(_("Time"), renderer, text=2,
-                                    background_rgba=7, foreground=8, font=9)
+        column = Gtk.TreeViewColumn(_("Time"), renderer)
+        column.set_cell_data_func(renderer, self._text_func, 2)
         column.set_alignment(0.5)
         column.set_min_width(10)
         self.append_column(column)
@@ -62,92 +63,112 @@ class SchedTree(Gtk.TreeView):
         renderer.set_alignment(0, 0.5)
         renderer.set_property("wrap_mode", Gtk.WrapMode.WORD)
         renderer.set_property("wrap_width", 200)
-        column = Gtk.TreeViewColumn(_("Title"), renderer, text=3,
-                                    background_rgba=7, foreground=8, font=9)
+        column = Gtk.TreeViewColumn(_("Title"), renderer)
+        column.set_cell_data_func(renderer, self._text_func, 3)
         column.set_alignment(0.5)
         column.set_min_width(50)
         column.set_resizable(True)
         self.append_column(column)
         # Host
-        column = Gtk.TreeViewColumn(_("Host"), renderer, text=5,
-                                    background_rgba=7, foreground=8, font=9)
+        column = Gtk.TreeViewColumn(_("Host"), renderer)
+        column.set_cell_data_func(renderer, self._text_func, 5)
         column.set_alignment(0.5)
         column.set_min_width(50)
         column.set_resizable(True)
         self.append_column(column)
 
     def refilter(self, wd):
-        """ Refilter model """
-        self._weekday_filter = SCHED_WEEKDAY_LIST[wd]
-        self._model.refilter()
+        """ Show weekday """
+        self._weekday_filter = wd
+        self._model = self._get_filter(wd)
+        self.set_model(self._model)
 
     def reset_marked(self):
         """ Reset marked row """
-        if not self._marked:
-            # Nothing to reset
-            return
-        # Get current position
-        path = Gtk.TreePath(self._marked_pos)
-        iter = self._model.get_iter(path)
-        # Set original colors and font
-        dark = self._model[iter][10]
-        bg_color = hex_to_rgba(config.bg_colors[dark])
-        bg_color.alpha = config.bg_alpha[dark]
-        self._model[iter][7] = bg_color
-        self._model[iter][8] = config.font_color
-        self._model[iter][9] = config.font
-        self._marked = False
+        self._marked = None
+        self.queue_draw()
 
     def mark_current(self):
-        """ Mark current event """
+        """ Mark current event, scroll to it if today is shown """
         # Get current position
+        wd = datetime.now(MSK()).weekday()
+        model = self._get_filter(wd)
         pos = self._sched.get_event_position()
         path = Gtk.TreePath(pos)
-        iter = self._model.get_iter(path)
-        # Set current row color
-        marked_color = hex_to_rgba(config.selected_bg_color)
-        marked_color.alpha = config.selected_alpha
-        self._model[iter][7] = marked_color
-        self._model[iter][8] = config.selected_font_color
-        self._model[iter][9] = config.selected_font
-        # Scroll to current cell
-        self.scroll_to_cell(path, use_align=True, row_align=0.5)
-        # Backup position
-        self._marked = True
-        self._marked_pos = pos
-
-    def update_model(self):
-        """ Create new model """
-        self._init_model()
+        iter = model.get_iter(path)
+        self._marked = model.get_value(iter, 11)
+        self.queue_draw()
+        if wd == self._weekday_filter:
+            # Scroll to current cell
+            self.scroll_to_cell(path, use_align=True, row_align=0.5)
+
+    def set_palette(self, palette):
+        """ Restyle rows """
+        self._palette = palette
+        self.queue_draw()
+
+    def update_rows(self):
+        """ Apply schedule refresh to the current model """
+        self.reset_marked()
+        self._sched.update_tree_store(self._store)
 
     def _init_model(self):
         """ Initialize TreeView model filled with schedule events """
-        store = Gtk.TreeStore(str,              #  0 Weekday
+        store = Gtk.TreeStore(int,              #  0 Weekday
                               bool,             #  1 IsParent
                               str,              #  2 Time
                               str,              #  3 Title
                               str,              #  4 URL
                               str,              #  5 Host
-                              GdkPixbuf.Pixbuf, #  6 Icon
-                              Gdk.RGBA,         #  7 BackgroundColor
-                              str,              #  8 FontColor
-                              str,              #  9 Font
-                              bool,             # 10 IsDark
-                              bool,             # 11 Recorder set
-                              bool,             # 12 Playback set
-                              bool)             # 13 IsMerged
-        self._model = store.filter_new()
-        self._model.set_visible_func(self._model_func)
+                              str,              #  6 Icon
+                              bool,             #  7 IsDark
+                              bool,             #  8 Recorder set
+                              bool,             #  9 Playback set
+                              int,              # 10 Merged into weekday
+                              GObject.TYPE_PYOBJECT) # 11 Program
         self._sched.fill_tree_store(store)
-        self._marked = False
+        self._store = store
+        # Filtered views are created on first use
+        self._filters = [ None ] * 7
+        self._marked = None
+        self._model = self._get_filter(self._weekday_filter)
         self.set_model(self._model)
 
-    def _model_func(self, model, iter, data):
+    def _get_filter(self, wd):
+        """ Return cached view of weekday """
+        if not self._filters[wd]:
+            model = self._store.filter_new()
+            model.set_visible_func(self._model_func, wd)
+            self._filters[wd] = model
+        return self._filters[wd]
+
+    def _model_func(self, model, iter, wd):
         """ Filter by weekday """
-        prev_day = SCHED_WEEKDAY_LIST.index(self._weekday_filter)
-        prev_day = SCHED_WEEKDAY_LIST[prev_day - 1]
-        return (model[iter][0] == self._weekday_filter) or \
-                (model[iter][13] and model[iter][0] == prev_day)
+        return model.get_value(iter, 0) == wd or \
+               model.get_value(iter, 10) == wd
+
+    def _row_style(self, cell, model, iter):
+        """ Set background, font and its color of the row """
+        p = self._palette
+        if self._marked and model.get_value(iter, 11) is self._marked:
+            cell.set_property("cell-background-rgba", p.selected_bg)
+            return p.selected_fg, p.selected_font
+        cell.set_property("cell-background-rgba",
+                          p.bg[model.get_value(iter, 7)])
+        return p.fg, p.font
+
+    def _icon_func(self, column, cell, model, iter, data):
+        """ Decode icon only when the row is drawn """
+        self._row_style(cell, model, iter)
+        size = 80 if model.get_value(iter, 1) else 60
+        icon = get_pixbuf(model.get_value(iter, 6), size)
+        cell.set_property("pixbuf", icon)
+
+    def _text_func(self, column, cell, model, iter, col):
+        fg, font = self._row_style(cell, model, iter)
+        cell.set_property("text", model.get_value(iter, col))
+        cell.set_property("foreground", fg)
+        cell.set_property("font-desc", font)
 
     def _on_button_release_event(self, widget, event):
         """ Open menu on right click """
@@ -164,7 +185,7 @@ class SchedTree(Gtk.TreeView):
         self._popup.append(url)
         if model.get_value(iter, 1):
             # Play program
-            if not model.get_value(iter, 12):
+            if not model.get_value(iter, 9):
                 play = create_menuitem(_("Play program"),
                                        "media-playback-start")
             else:
@@ -172,7 +193,7 @@ class SchedTree(Gtk.TreeView):
             play.connect("activate", self._on_play, model, iter)
             self._popup.append(play)
             # Record program
-            if not model.get_value(iter, 11):
+            if not model.get_value(iter, 8):
                 rec = create_menuitem(_("Record program"), "media-record")
             else:
                 rec = create_menuitem(_("Don't record"), "gtk-cancel")
@@ -182,18 +203,20 @@ class SchedTree(Gtk.TreeView):
         self._popup.popup(None, None, None, None, event.button, event.time)
 
     def _on_record(self, button, model, iter):
-        rec = not model.get_value(iter, 11)
-        wd = SCHED_WEEKDAY_LIST.index(model.get_value(iter, 0))
+        rec = not model.get_value(iter, 8)
+        wd = model.get_value(iter, 0)
         time = model.get_value(iter, 2)
         self._sched.set_record_status(rec, wd, time)
-        model.set_value(iter, 11, rec)
+        model.set_value(iter, 8, rec)
+        if self._record_callback:
+            self._record_callback()
 
     def _on_play(self, button, model, iter):
-        play = not model.get_value(iter, 12)
-        wd = SCHED_WEEKDAY_LIST.index(model.get_value(iter, 0))
+        play = not model.get_value(iter, 9)
+        wd = model.get_value(iter, 0)
         time = model.get_value(iter, 2)
         self._sched.set_play_status(play, wd, time)
-        model.set_value(iter, 12, play)
+        model.set_value(iter, 9, play)
 
     def _on_url(self, button, url):
         subprocess.Popen(["xdg-open", url], stdout=subprocess.PIPE)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from silver.netpolicy import iter_content
+from silver.netpolicy import send_request
+
+__all__ = ["HTTPCache"]
+
+# Default cache size limit in bytes
+CACHE_SIZE = 32 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+class CachedResponse():
+    """ Response returned by HTTPCache
+
+        Body is either read from disk or streamed from the network.
+        Network body is written to the cache while it's being read
+        and stored once it's received completely. Responses cached
+        without body (from_cache and no file) have empty content. """
+    def __init__(self, url, status_code, encoding=None, file=None,
+                 resp=None, cache=None, from_cache=False, body=True):
+        self.url = url
+        self.status_code = status_code
+        self.encoding = encoding
+        self.from_cache = from_cache or file is not None
+        self._file = file
+        self._resp = resp
+        self._cache = cache
+        self._body = body
+        self._content = None
+        self._iters = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def content(self):
+        """ Return body as bytes """
+        if self._content is None:
+            self._content = b"".join(self.iter_content(65536))
+        return self._content
+
+    @property
+    def text(self):
+        """ Return body as str """
+        return self.content.decode(self.encoding or "utf-8", "replace")
+
+    def iter_content(self, chunk_size=65536):
+        """ Iterate over body """
+        it = self._iter_content(chunk_size)
+        # Closed along with response, even if not read till the end
+        self._iters.append(it)
+        return it
+
+    def close(self):
+        for it in self._iters:
+            it.close()
+        self._iters = []
+        if self._resp is not None:
+            self._resp.close()
+
+    def _iter_content(self, chunk_size):
+        if self._content is not None:
+            yield self._content
+        elif self._file:
+            with open(self._file, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    yield chunk
+        elif not self._resp:
+            return
+        elif not self._cache:
+            yield from iter_content(self._resp, chunk_size)
+        elif not self._body:
+            yield from iter_content(self._resp, chunk_size)
+            # Got everything, keep validators only
+            self._cache._store(self, None)
+        else:
+            fd, tmp = tempfile.mkstemp(dir=self._cache.cache_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in iter_content(self._resp, chunk_size):
+                        f.write(chunk)
+                        yield chunk
+                # Got everything
+                self._cache._store(self, tmp)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+class HTTPCache():
+    """ Persistent HTTP cache
+
+        Stores response bodies with their ETag/Last-Modified
+        validators and revalidates them with conditional requests.
+        Entries are evicted in LRU order once the cache grows
+        bigger than max_size. Bodies stored elsewhere, like images,
+        can be cached by validators only.
+        Index is written by flush(), once per batch of requests. """
+    def __init__(self, cache_dir, session, max_size=CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._session = session
+        self._lock = threading.Lock()
+        self._index = {}
+        self._dirty = False
+        self._index_load()
+
+    def get(self, url, max_age=0, body=True):
+        """ GET url.
+            Entries checked less than max_age seconds ago are
+            returned without contacting the server.
+            With body False only validators are kept, responses
+            served from cache have no content then. """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry and entry.get("body", True) and \
+                    not os.path.exists(self._path(url)):
+                # Removed behind our back
+                self._index.pop(url)
+                entry = None
+            if entry and time.time() - entry["checked"] < max_age:
+                return self._hit(url, entry)
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        resp = send_request(self._session, "GET", url, headers=headers,
+                            stream=True)
+
+        if resp.status_code == 304 and entry:
+            resp.close()
+            with self._lock:
+                entry["checked"] = time.time()
+                return self._hit(url, entry)
+
+        with self._lock:
+            self.misses += 1
+        if resp.status_code != 200:
+            return CachedResponse(url, resp.status_code, resp.encoding,
+                                  resp=resp)
+        return CachedResponse(url, resp.status_code, resp.encoding,
+                              resp=resp, cache=self, body=body)
+
+    def forget(self, url):
+        """ Drop url from cache """
+        with self._lock:
+            if self._index.pop(url, None) is not None:
+                self._dirty = True
+            try:
+                os.remove(self._path(url))
+            except OSError:
+                pass
+
+    def flush(self):
+        """ Write index if it's changed """
+        with self._lock:
+            if self._dirty:
+                self._index_save()
+                self._dirty = False
+
+    def validators(self, url):
+        """ Return (ETag, Last-Modified) of cached url """
+        with self._lock:
+            entry = self._index.get(url)
+            if not entry:
+                return ("", "")
+            return (entry["etag"], entry["last_modified"])
+
+    def stats(self):
+        """ Return hit/miss counters and cache size """
+        with self._lock:
+            size = sum(x["size"] for x in self._index.values())
+            return { "hits"    : self.hits,
+                     "misses"  : self.misses,
+                     "entries" : len(self._index),
+                     "size"    : size }
+
+    def _hit(self, url, entry):
+        """ Serve entry from disk """
+        self.hits += 1
+        entry["atime"] = time.time()
+        self._dirty = True
+        if not entry.get("body", True):
+            return CachedResponse(url, 200, entry["encoding"],
+                                  from_cache=True)
+        return CachedResponse(url, 200, entry["encoding"],
+                              file=self._path(url))
+
+    def _store(self, cached, tmp):
+        """ Move received body into cache """
+        headers = cached._resp.headers
+        now = time.time()
+        with self._lock:
+            if tmp:
+                os.replace(tmp, self._path(cached.url))
+                size = os.path.getsize(self._path(cached.url))
+            else:
+                size = 0
+            self._index[cached.url] = {
+                    "etag"          : headers.get("ETag", ""),
+                    "last_modified" : headers.get("Last-Modified", ""),
+                    "encoding"      : cached.encoding,
+                    "size"          : size,
+                    "body"          : tmp is not None,
+                    "checked"       : now,
+                    "atime"         : now }
+            self._evict()
+            self._dirty = True
+
+    def _evict(self):
+        """ Remove least recently used entries """
+        size = sum(x["size"] for x in self._index.values())
+        lru = sorted(self._index.items(), key=lambda x : x[1]["atime"])
+        for url, entry in lru:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(self._path(url))
+            except OSError:
+                pass
+            size -= entry["size"]
+            del self._index[url]
+
+    def _path(self, url):
+        """ Return body location """
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name)
+
+    def _index_load(self):
+        """ Read index file """
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+        # Bodies stored after the last flush and interrupted downloads
+        known = { os.path.basename(self._path(x)) for x in self._index }
+        try:
+            files = os.listdir(self.cache_dir)
+        except OSError:
+            files = []
+        for file in files:
+            if file not in known and file != INDEX_FILE:
+                try:
+                    os.remove(os.path.join(self.cache_dir, file))
+                except OSError:
+                    pass
+
+    def _index_save(self):
+        """ Write index file """
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, os.path.join(self.cache_dir, INDEX_FILE))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from silver.downloader import save_atomic
+
+__all__ = ["ImageStore", "check_image", "prune_thumbnails", "thumb_name"]
+
+INDEX_FILE = "index.json"
+# Thumbnail of image scaled to fit size x size
+THUMB_NAME = "{0}-{1}px.png"
+
+def check_image(data):
+    """ Return file extension if data looks like a complete image """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        # Last chunk must be IEND
+        if b"IEND" in data[-12:]:
+            return "png"
+    elif data[:3] == b"\xff\xd8\xff":
+        # Must end with EOI marker
+        if b"\xff\xd9" in data[-32:]:
+            return "jpg"
+    elif data[:6] in (b"GIF87a", b"GIF89a"):
+        if data[-1:] == b";":
+            return "gif"
+    return None
+
+def thumb_name(path, size):
+    """ Return file name of thumbnail of image at path """
+    return THUMB_NAME.format(os.path.basename(path), size)
+
+def prune_thumbnails(img_dir, thumb_dir):
+    """ Remove thumbnails of images which don't exist anymore
+        and the ones named by older versions """
+    try:
+        files = os.listdir(thumb_dir)
+    except OSError:
+        return
+    for file in files:
+        src, _, size = file.rpartition("-")
+        if not size.endswith("px.png") or \
+                not os.path.exists(os.path.join(img_dir, src)):
+            try:
+                os.remove(os.path.join(thumb_dir, file))
+            except OSError:
+                pass
+
+class ImageStore():
+    """ Content-addressed image storage
+
+        Images are saved as <sha1 of content>.<ext>, so different images
+        never overwrite each other and the same image is stored once.
+        Index maps urls to content hashes and keeps last access time
+        used for LRU eviction once the store exceeds max_size.
+        Access times are written by flush(), prune() or gc(). """
+    def __init__(self, img_dir, cache, max_size):
+        self.img_dir = img_dir
+        self.max_size = max_size
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._files = {}
+        self._dirty = False
+        # Files in use, never evicted
+        self._keep = set()
+        self._index_load()
+
+    def get(self, url, max_age=0):
+        """ Return local path of image at url or empty string """
+        # Image itself is stored here, cache keeps only validators
+        resp = self._cache.get(url, max_age=max_age, body=False)
+        if resp.from_cache:
+            with self._lock:
+                name = self._lookup(url)
+            if name:
+                # Not modified
+                return name
+            # Our copy is gone, download it again
+            self._cache.forget(url)
+            resp = self._cache.get(url, body=False)
+        with resp:
+            if resp.status_code != 200:
+                logging.error("Couldn't download image from url: " + url)
+                logging.error("Code: {0}".format(resp.status_code))
+                return ""
+            data = resp.content
+
+        ext = check_image(data)
+        if not ext:
+            logging.error("Broken image: " + url)
+            return ""
+        digest = hashlib.sha1(data).hexdigest()
+        name = os.path.join(self.img_dir, "{0}.{1}".format(digest, ext))
+        with self._lock:
+            if not os.path.exists(name):
+                save_atomic(name, [data])
+            self._urls[url] = digest
+            self._files[digest] = { "ext"   : ext,
+                                    "size"  : len(data),
+                                    "atime" : time.time() }
+            self._evict()
+            self._dirty = True
+        return name
+
+    def flush(self):
+        """ Write index if it's changed """
+        with self._lock:
+            if self._dirty:
+                self._index_save()
+                self._dirty = False
+
+    def prune(self, keep=()):
+        """ Drop least recently used files except those listed in keep,
+            they are kept by later evictions too.
+            Return number of bytes freed """
+        with self._lock:
+            self._keep = { os.path.basename(x) for x in keep if x }
+            freed = self._evict()
+            if freed or self._dirty:
+                self._index_save()
+                self._dirty = False
+        return freed
+
+    def gc(self, keep=()):
+        """ Drop broken, unknown and least recently used files.
+            Unknown files listed in keep are left alone.
+            Return number of bytes freed """
+        freed = 0
+        keep = { os.path.basename(x) for x in keep if x }
+        with self._lock:
+            known = set()
+            for digest, entry in list(self._files.items()):
+                name = self._path(digest)
+                try:
+                    with open(name, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    del self._files[digest]
+                    continue
+                if (check_image(data) != entry["ext"] or
+                        hashlib.sha1(data).hexdigest() != digest):
+                    # Corrupted on disk
+                    os.remove(name)
+                    freed += len(data)
+                    del self._files[digest]
+                    continue
+                known.add(os.path.basename(name))
+            # Leftovers from older versions and interrupted downloads
+            for file in os.listdir(self.img_dir):
+                if file in known or file in keep or file == INDEX_FILE:
+                    continue
+                name = os.path.join(self.img_dir, file)
+                if os.path.isfile(name):
+                    freed += os.path.getsize(name)
+                    os.remove(name)
+            freed += self._evict()
+            self._index_save()
+            self._dirty = False
+        return freed
+
+    def _lookup(self, url):
+        """ Return stored file for url, update access time """
+        digest = self._urls.get(url)
+        if digest not in self._files:
+            return ""
+        name = self._path(digest)
+        if not os.path.exists(name):
+            del self._files[digest]
+            return ""
+        self._files[digest]["atime"] = time.time()
+        self._dirty = True
+        return name
+
+    def _evict(self):
+        """ Remove least recently used files. Return bytes freed """
+        size = sum(x["size"] for x in self._files.values())
+        freed = 0
+        lru = sorted(self._files.items(), key=lambda x : x[1]["atime"])
+        for digest, entry in lru:
+            if size <= self.max_size:
+                break
+            if os.path.basename(self._path(digest)) in self._keep:
+                continue
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+            size -= entry["size"]
+            freed += entry["size"]
+            del self._files[digest]
+        # Forget urls pointing to removed files
+        self._urls = { k : v for k, v in self._urls.items()
+                       if v in self._files }
+        return freed
+
+    def _path(self, digest):
+        """ Return image location """
+        ext = self._files[digest]["ext"]
+        return os.path.join(self.img_dir, "{0}.{1}".format(digest, ext))
+
+    def _index_load(self):
+        """ Read index file """
+        try:
+            with open(os.path.join(self.img_dir, INDEX_FILE), "r") as f:
+                index = json.load(f)
+            self._urls = index["urls"]
+            self._files = index["files"]
+        except (OSError, ValueError, KeyError):
+            self._urls = {}
+            self._files = {}
+
+    def _index_save(self):
+        """ Write index file """
+        fd, tmp = tempfile.mkstemp(dir=self.img_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump({ "urls" : self._urls, "files" : self._files }, f)
+        os.replace(tmp, os.path.join(self.img_dir, INDEX_FILE))
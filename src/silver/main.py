@@ -18,98 +18,256 @@ Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301 USA
 """
 
-import gi
-gi.require_version("Gst", "1.0")
-gi.require_version("Gtk", "3.0")
-gi.require_version("Notify", "0.7")
-from gi.repository import Gst, Gtk, GObject, Notify
-import dbus
-from dbus.mainloop.glib import DBusGMainLoop
-DBusGMainLoop(set_as_default=True)
-
 import argparse
+import dbus
 import dbus.service
+import json
 import os
 import signal
+import time
+from dbus.mainloop.glib import DBusGMainLoop
+DBusGMainLoop(set_as_default=True)
 
 import silver.config as config
-from silver.application import SilverApp
+from silver.globals import CACHE_DIR
 from silver.globals import IMG_DIR
-from silver.gui.css import css_load
-from silver.translations import set_translation
+from silver.globals import SCHED_DUMP
+from silver.globals import SCHED_FILE
+from silver.globals import THUMB_DIR
+from silver.remote import BUS_NAME
+from silver.remote import COMMANDS
+from silver.remote import OBJECT_PATH
+from silver.remote import send_command
+
+def create_dirs():
+    """ Create system directories """
+    if not os.path.exists(IMG_DIR):
+        os.makedirs(IMG_DIR)
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    if not os.path.exists(THUMB_DIR):
+        os.makedirs(THUMB_DIR)
+
+class StartupProfile():
+    """ Startup phases timing """
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self._phases = []
+        self._last = time.monotonic()
+
+    def mark(self, phase):
+        """ End phase started by previous mark """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        """ Print phases, bench/bench_startup.py collects them """
+        if not self.enabled:
+            return
+        total = sum(x[1] for x in self._phases)
+        for phase, t in self._phases + [("total", total)]:
+            print("{0:<16} {1:8.1f} ms".format(phase, t * 1000), flush=True)
 
 class SilverService(dbus.service.Object):
     """ DBus service """
     def __init__(self, win):
         self.window = win
-        bus_name = dbus.service.BusName('org.SilverRain.Silver',
-                                        bus = dbus.SessionBus())
-        dbus.service.Object.__init__(self, bus_name,
-                                    '/org/SilverRain/Silver')
+        bus_name = dbus.service.BusName(BUS_NAME, bus = dbus.SessionBus())
+        dbus.service.Object.__init__(self, bus_name, OBJECT_PATH)
 
-    @dbus.service.method(dbus_interface='org.SilverRain.Silver')
+    @dbus.service.method(dbus_interface=BUS_NAME)
     def show_window(self):
         self.window.present()
 
-    @dbus.service.method(dbus_interface='org.SilverRain.Silver')
+    @dbus.service.method(dbus_interface=BUS_NAME)
     def play(self):
         self.window.play()
 
-    @dbus.service.method(dbus_interface='org.SilverRain.Silver')
+    @dbus.service.method(dbus_interface=BUS_NAME)
     def stop(self):
         self.window.stop()
 
-def let_it_rain():
+    @dbus.service.method(dbus_interface=BUS_NAME)
+    def pause(self):
+        self.window.pause()
+
+    @dbus.service.method(dbus_interface=BUS_NAME, in_signature='s')
+    def seek(self, value):
+        """ Play value seconds behind live, "live" to catch up,
+            +N or -N to move forward or back """
+        if value == "live":
+            delay = 0
+        elif value[0] in "+-":
+            delay = self.window.get_status()["delay"] - int(value)
+        else:
+            delay = int(value)
+        self.window.seek(max(0, delay))
+
+    @dbus.service.method(dbus_interface=BUS_NAME)
+    def toggle(self):
+        self.window.toggle_playback()
+
+    @dbus.service.method(dbus_interface=BUS_NAME)
+    def record(self):
+        self.window.toggle_record()
+
+    @dbus.service.method(dbus_interface=BUS_NAME, in_signature='s')
+    def volume(self, value):
+        """ Set volume [0-100], change it if value starts with +/- """
+        step = int(value)
+        if value[0] not in "+-":
+            step -= self.window.get_status()["volume"]
+        self.window.volume_step(step)
+
+    @dbus.service.method(dbus_interface=BUS_NAME, out_signature='a{ss}')
+    def status(self):
+        return { key : str(value)
+                 for key, value in self.window.get_status().items() }
+
+def let_it_rain(profile):
+    # Heavy modules are loaded only when the app really starts
+    import gi
+    gi.require_version("Gst", "1.0")
+    gi.require_version("Gtk", "3.0")
+    gi.require_version("Notify", "0.7")
+    from gi.repository import GObject, Gst, Gtk, Notify
+    from silver.application import SilverApp
+    from silver.gui.css import css_load
+    from silver.translations import set_translation
+    profile.mark("imports")
     Gst.init(None)
+    profile.mark("Gst.init")
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     Notify.init("silver-rain")
-    # Create system directories
-    if not os.path.exists(IMG_DIR):
-        os.makedirs(IMG_DIR)
+    create_dirs()
     # Initialize config
     config.setup()
     # Create directory for recordings
     if not os.path.exists(config.recs_dir):
         os.makedirs(config.recs_dir)
+    profile.mark("config.setup")
     # Load css
     css_load()
+    profile.mark("css_load")
     # Init translation
     set_translation()
     # Init application
     silver_app = SilverApp()
+    profile.mark("SilverApp")
     # Setup dbus service
     service = SilverService(silver_app)
+    if profile.enabled:
+        # Runs once pending redraws are done
+        def first_paint():
+            profile.mark("first paint")
+            profile.report()
+        GObject.idle_add(first_paint)
     # Run loop
     Gtk.main()
     # Cleanup
     silver_app.clean()
     Notify.uninit()
 
+def let_it_rain_headless(profile):
+    # No Gtk in here
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import GLib, Gst
+    from silver.daemon import SilverDaemon
+    profile.mark("imports")
+    Gst.init(None)
+    profile.mark("Gst.init")
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    create_dirs()
+    config.setup()
+    if not os.path.exists(config.recs_dir):
+        os.makedirs(config.recs_dir)
+    profile.mark("config.setup")
+    daemon = SilverDaemon()
+    profile.mark("SilverDaemon")
+    service = SilverService(daemon)
+    profile.report()
+    loop = GLib.MainLoop()
+    loop.run()
+    daemon.clean()
+
+def schedule_images():
+    """ Return icons and covers referenced by saved schedule.
+        Schedule converted from older versions refers to files
+        the image store doesn't know about """
+    from silver.program import Program
+    from silver.snapshot import read_snapshot
+    try:
+        if os.path.exists(SCHED_DUMP):
+            # Not converted yet
+            with open(SCHED_DUMP, "r") as f:
+                week = [ [ Program.from_dict(x) for x in day ]
+                         for day in json.load(f) ]
+        else:
+            week = read_snapshot(SCHED_FILE).week()
+        return { x for day in week for item in day
+                   for x in (item.icon, item.cover) }
+    except (OSError, KeyError, TypeError, ValueError):
+        return set()
+
+def collect_garbage():
+    """ Remove stale images """
+    if not os.path.exists(IMG_DIR):
+        return
+    # Running instance owns the image store
+    if dbus.SessionBus().name_has_owner(BUS_NAME):
+        print("Silver Rain is running, quit it first")
+        return
+    from silver.imagestore import ImageStore, prune_thumbnails
+    config.setup()
+    store = ImageStore(IMG_DIR, None, config.img_store_size * 1024 * 1024)
+    freed = store.gc(keep=schedule_images())
+    prune_thumbnails(IMG_DIR, THUMB_DIR)
+    print("Freed {0} KiB".format(freed // 1024))
+
 def exec_main():
+    # Get command from arguments
+    parser = argparse.ArgumentParser(description='Silver Rain radio app')
+    parser.add_argument('command', choices=sorted(COMMANDS) + ['gc'],
+                        nargs='?', default='show', const='show',
+                        help='run command')
+    parser.add_argument('value', nargs='?',
+                        help='volume level or seconds to seek back, '
+                             '+N or -N to change it, "live" to catch up')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print startup phases timing')
+    parser.add_argument('--headless', action='store_true',
+                        help='only record flagged programs, no GUI')
+    args = parser.parse_args()
+    profile = StartupProfile(args.profile_startup)
+    if args.command == 'gc':
+        collect_garbage()
+        return
+    if args.command == 'volume':
+        try:
+            int(args.value)
+        except (TypeError, ValueError):
+            parser.error("volume needs a number")
+    if args.command == 'seek' and args.value != 'live':
+        try:
+            int(args.value)
+        except (TypeError, ValueError):
+            parser.error("seek needs a number or \"live\"")
     # Check if already running
     bus = dbus.SessionBus()
-    reply = bus.request_name("org.SilverRain.Silver")
+    if args.command == 'status' and not bus.name_has_owner(BUS_NAME):
+        print("Not running")
+        return
+    reply = bus.request_name(BUS_NAME)
     if reply != dbus.bus.REQUEST_NAME_REPLY_PRIMARY_OWNER:
-        object = bus.get_object("org.SilverRain.Silver",
-                                "/org/SilverRain/Silver")
-        # Get command from arguments
-        parser = argparse.ArgumentParser(description='Silver Rain radio app')
-        parser.add_argument('command', choices=['play', 'stop', 'show'],
-                            nargs='?', default='show', const='show',
-                            help='run command')
-        args = parser.parse_args()
-        if args.command == 'show':
-            method = object.get_dbus_method("show_window")
-        elif args.command == 'play':
-            method = object.get_dbus_method("play")
-        elif args.command == 'stop':
-            method = object.get_dbus_method("stop")
-        else:
-            raise ValueError
-
-        method()
+        send_command(bus, args.command, args.value)
+    elif args.headless:
+        let_it_rain_headless(profile)
     else:
-        let_it_rain()
+        let_it_rain(profile)
 
 if __name__ == '__main__':
     exec_main()
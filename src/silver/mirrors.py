@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from urllib.parse import quote
+from urllib.parse import urlsplit
+import json
+import logging
+import requests
+import time
+
+import silver.config as config
+from silver.bitrate import SLOW
+from silver.bitrate import bitrate_of
+from silver.downloader import Downloader
+from silver.downloader import create_session
+from silver.downloader import save_atomic
+from silver.globals import MIRRORS_FILE
+from silver.globals import STREAM_BITRATE
+from silver.globals import STREAM_URL_LIST
+from silver.netpolicy import iter_content
+from silver.netpolicy import send_request
+
+__all__ = ["MirrorProbe", "preferred_url", "probe_mirrors", "set_ranking"]
+
+# Seconds of stream read by probe
+PROBE_TIME          = 3
+# Probe again after PROBE_INTERVAL seconds,
+# or after stream failure if the last probe is REPROBE_MIN seconds old
+PROBE_INTERVAL      = 6 * 3600
+REPROBE_MIN         = 60
+
+# {"probed" : time, "servers" : [{"server", "first_byte", "rate"}]}
+_ranking = None
+
+def _server(url):
+    return urlsplit(url).netloc
+
+def _load():
+    """ Read ranking file """
+    global _ranking
+    try:
+        with open(MIRRORS_FILE, "r") as f:
+            _ranking = json.load(f)
+        _ranking["servers"]
+    except (OSError, ValueError, KeyError, TypeError):
+        _ranking = { "probed" : 0, "servers" : [] }
+
+def get_ranking():
+    """ Return saved ranking """
+    if _ranking is None:
+        _load()
+    return _ranking
+
+def set_ranking(ranking):
+    """ Use and save new ranking """
+    global _ranking
+    _ranking = ranking
+    try:
+        save_atomic(MIRRORS_FILE, [ json.dumps(ranking).encode("utf-8") ])
+    except OSError as e:
+        logging.warning("Couldn't save mirror ranking: " + str(e))
+
+def preferred_url(url):
+    """ Return url of the same bitrate on the fastest server """
+    kbps = STREAM_BITRATE.get(url)
+    if not config.mirror_select or kbps is None:
+        return url
+    for entry in get_ranking()["servers"]:
+        if entry["first_byte"] is None:
+            # Unreachable ones are at the end
+            break
+        for x in STREAM_URL_LIST:
+            if _server(x) == entry["server"] and STREAM_BITRATE[x] == kbps:
+                return x
+    return url
+
+def _proxies():
+    """ Return requests proxies of configured proxy,
+        the one stream is played through """
+    if not config.proxy_required or not config.proxy_uri:
+        return {}
+    uri = config.proxy_uri
+    if "://" not in uri:
+        uri = "http://" + uri
+    if config.proxy_id:
+        scheme, rest = uri.split("://", 1)
+        uri = "{0}://{1}:{2}@{3}".format(scheme,
+                                         quote(config.proxy_id, safe=""),
+                                         quote(config.proxy_pw, safe=""),
+                                         rest)
+    return { "http" : uri, "https" : uri }
+
+def probe(session, url, probe_time=PROBE_TIME):
+    """ Return (time to first byte, bytes per second) of stream,
+        (None, 0) if it couldn't be reached """
+    start = time.monotonic()
+    first = None
+    size = 0
+    try:
+        # Retries would spoil time to first byte
+        resp = send_request(session, "GET", url, retries=0, stream=True)
+        with resp:
+            if resp.status_code != 200:
+                return None, 0
+            for chunk in iter_content(resp, 4096):
+                now = time.monotonic()
+                if first is None:
+                    first = now
+                size += len(chunk)
+                if now - first >= probe_time:
+                    break
+    except requests.exceptions.RequestException as e:
+        logging.debug("Probe failed: {0}: {1}".format(url, e))
+        return None, 0
+    if first is None:
+        return None, 0
+    return first - start, size / max(now - first, 0.001)
+
+def probe_mirrors(task=None):
+    """ Probe every server at once with the stream of configured
+        bitrate, return ranking, fastest first.
+        Servers delivering less than the stream needs go after
+        the others, unreachable ones are the last. """
+    kbps = STREAM_BITRATE.get(config.stream_url, 128)
+    urls = [ x for x in STREAM_URL_LIST if STREAM_BITRATE[x] == kbps ]
+    session = create_session(len(urls))
+    session.proxies.update(_proxies())
+    try:
+        results = Downloader(len(urls)).run(lambda x : probe(session, x),
+                                            urls)
+    finally:
+        session.close()
+    servers = []
+    for url in urls:
+        first_byte, rate = results[url]
+        servers.append({ "server"     : _server(url),
+                         "first_byte" : first_byte,
+                         "rate"       : rate })
+        logging.info("Mirror {0}: first byte {1}, {2:.0f} B/s".format(
+                                                url, first_byte, rate))
+
+    def key(entry):
+        url = [ x for x in urls if _server(x) == entry["server"] ][0]
+        if entry["first_byte"] is None:
+            return (2, 0)
+        slow = entry["rate"] < bitrate_of(url) * SLOW
+        return (int(slow), entry["first_byte"])
+
+    servers.sort(key=key)
+    return { "probed" : time.time(), "servers" : servers }
+
+class MirrorProbe():
+    """ Keep mirror ranking fresh
+
+        Probe in background if saved ranking is older than
+        PROBE_INTERVAL, every PROBE_INTERVAL seconds and after
+        stream failures. New ranking is used on the next
+        (re)connect of the stream. """
+    def __init__(self, tasks):
+        self._tasks = tasks
+        self._source = None
+        # Unix time of the last probe, failed or not
+        self._probed = 0
+
+    def start(self):
+        """ Probe if ranking is old, plan the next probe """
+        age = time.time() - get_ranking()["probed"]
+        if age >= PROBE_INTERVAL:
+            self.probe()
+        else:
+            self._plan(PROBE_INTERVAL - age)
+
+    def failed(self):
+        """ Stream failed, ranking might be wrong """
+        probed = max(self._probed, get_ranking()["probed"])
+        if time.time() - probed >= REPROBE_MIN:
+            self.probe()
+
+    def probe(self):
+        """ Probe mirrors in background """
+        if not config.mirror_select:
+            return
+
+        def done(ranking):
+            set_ranking(ranking)
+            self._plan(PROBE_INTERVAL)
+
+        def error(e=None):
+            logging.error("Couldn't probe mirrors")
+            self._plan(PROBE_INTERVAL)
+
+        # Stream losses while probing, or after a failed probe,
+        # don't start it over
+        self._probed = time.time()
+        self._tasks.run("mirrors", probe_mirrors, done, error=error)
+
+    def _plan(self, delay):
+        # Ranking functions are used without a main loop
+        from gi.repository import GObject
+        if self._source:
+            GObject.source_remove(self._source)
+        self._source = GObject.timeout_add_seconds(int(delay),
+                                                   self._on_timeout)
+
+    def _on_timeout(self):
+        self._source = None
+        self.probe()
+        return False
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from urllib.parse import urlsplit
+import logging
+import random
+import requests
+import threading
+import time
+
+__all__ = ["CircuitOpen", "DeadlineExceeded", "NetworkPolicy",
+           "iter_content", "send_request"]
+
+# Seconds to wait for connection and for every read
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT    = 15
+# The whole operation including retries
+DEADLINE        = 45
+# Retries of a single request
+RETRIES         = 3
+# Retry delay is random between 0 and BACKOFF * 2^attempt seconds
+BACKOFF         = 0.5
+BACKOFF_MAX     = 8
+# Every request adds RETRY_RATIO retries to the shared budget
+RETRY_RATIO     = 0.2
+RETRY_BUDGET    = 10
+# Host is skipped for BREAKER_COOLDOWN seconds
+# after BREAKER_FAILURES failures in a row
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 60
+
+# Server errors worth retrying
+RETRY_CODES = (500, 502, 503, 504)
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """ Host failed too many times, not trying for now """
+    pass
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """ Operation took too long """
+    pass
+
+class _Breaker():
+    """ Per-host circuit breaker state """
+    __slots__ = ("failures", "opened")
+
+    def __init__(self):
+        self.failures = 0
+        self.opened = 0.0
+
+class NetworkPolicy():
+    """ Timeouts, retries and circuit breakers for HTTP requests
+
+        Failed idempotent requests are retried with jittered
+        exponential backoff until the deadline or the shared retry
+        budget runs out. Hosts failing repeatedly are not contacted
+        until cooldown passes, then a single request checks them.
+        Response keeps the deadline, so reading a streamed body
+        with iter_content() doesn't take longer either. """
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, deadline=DEADLINE,
+                 retries=RETRIES):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._budget = RETRY_BUDGET
+        self._hosts = {}
+
+    def request(self, session, method, url, deadline=None, retries=None,
+                **kwargs):
+        """ session.request() within policy.
+            deadline is time.monotonic() to give up at.
+            Only GET is retried unless retries is given. """
+        host = urlsplit(url).netloc
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        if retries is None:
+            retries = self.retries if method.upper() == "GET" else 0
+        self._spend(RETRY_RATIO)
+        attempt = 0
+        while True:
+            self._check(host)
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise DeadlineExceeded("Deadline exceeded: " + url)
+            timeout = (min(self.connect_timeout, left),
+                       min(self.read_timeout, left))
+            try:
+                resp = session.request(method, url, timeout=timeout,
+                                       **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                self._failure(host)
+                error = e
+                resp = None
+            else:
+                if resp.status_code not in RETRY_CODES:
+                    self._success(host)
+                    resp.deadline = deadline
+                    return resp
+                self._failure(host)
+                error = None
+            # Retry?
+            delay = random.uniform(0, min(BACKOFF_MAX,
+                                          BACKOFF * 2 ** attempt))
+            attempt += 1
+            if attempt > retries or \
+                    time.monotonic() + delay >= deadline or \
+                    not self._spend(-1):
+                if error:
+                    raise error
+                resp.deadline = deadline
+                return resp
+            if resp is not None:
+                resp.close()
+            logging.debug("Retry {0} in {1:.2f}s: {2}".format(attempt,
+                                                               delay, url))
+            time.sleep(delay)
+
+    def _spend(self, n):
+        """ Change retry budget, return False if it's empty """
+        with self._lock:
+            if self._budget + n < 0:
+                return False
+            self._budget = min(RETRY_BUDGET, self._budget + n)
+            return True
+
+    def _check(self, host):
+        """ Raise CircuitOpen if host should be skipped """
+        with self._lock:
+            b = self._hosts.get(host)
+            if not b or b.failures < BREAKER_FAILURES:
+                return
+            if time.monotonic() - b.opened < BREAKER_COOLDOWN:
+                raise CircuitOpen("Host is down: " + host)
+            # Let one request through to check the host
+            b.opened = time.monotonic()
+
+    def _success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def _failure(self, host):
+        with self._lock:
+            b = self._hosts.setdefault(host, _Breaker())
+            b.failures += 1
+            if b.failures >= BREAKER_FAILURES:
+                if b.failures == BREAKER_FAILURES:
+                    logging.warning("Host is down: " + host)
+                b.opened = time.monotonic()
+
+_policy = NetworkPolicy()
+
+def iter_content(resp, chunk_size):
+    """ resp.iter_content() raising DeadlineExceeded once
+        the deadline of request is reached.
+        It's checked between chunks, so smaller chunks
+        keep it tighter """
+    deadline = getattr(resp, "deadline", None)
+    for chunk in resp.iter_content(chunk_size):
+        if deadline is not None and time.monotonic() > deadline:
+            resp.close()
+            raise DeadlineExceeded("Deadline exceeded: " + resp.url)
+        yield chunk
+
+def send_request(session, method, url, **kwargs):
+    """ Send request through shared network policy """
+    return _policy.request(session, method, url, **kwargs)
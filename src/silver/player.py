@@ -18,34 +18,55 @@ Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301 USA
 """
 
-from gi.repository import Gst
+from gi.repository import GObject, Gst
 from datetime import datetime
 import logging
-import sys
+import time
 
 import silver.config as config
+from silver.bitrate import BitrateMonitor
+from silver.bitrate import UP
+from silver.bitrate import bitrate_of
+from silver.bitrate import stream_variant
+from silver.globals import TIMESHIFT_FILE
 from silver.msktz import MSK
+from silver.stream import StreamSource
+from silver.stream import make_branch
+from silver.timeshift import TimeShift
+
+# Crossfade between bitrates
+FADE_TIME       = 2
+FADE_STEP       = 50
+# Give up switching if the new stream doesn't start in time
+SWITCH_TIMEOUT  = 10
 
 class Player():
-    """ Base class for player instances """
-    def __init__(self, err_func):
+    """ Base class for player instances
+
+        Every instance is a branch of the shared stream source.
+        The branch is created on start and dropped on stop,
+        the others keep running. """
+    def __init__(self, source, err_func):
         self.playing = False
+        self._source = source
+        self._branch = None
         self._error_callback = err_func
 
     def reset_connection_settings(self):
         if self.playing:
             self.stop()
-        self._on_config_changed()
+        self._source.reset_connection_settings()
 
     def clean(self):
         self.playing = False
-        self._clean()
+        if self._branch:
+            self._source.detach(self._branch)
+            self._branch = None
 
 # Playback control API
     def start(self, arg=None):
         if not self.playing:
-            self._start(arg)
-            self.playing = True
+            self.playing = self._start(arg)
 
     def stop(self):
         if self.playing:
@@ -53,107 +74,117 @@ class Player():
             self.playing = False
 
 # Internal
-    def _start(self, arg):
+    def _make_branch(self, arg):
+        """ Return (bin, error message) """
         raise NotImplementedError
 
-    def _stop(self):
-        raise NotImplementedError
-
-    def _on_config_changed(self):
-        raise NotImplementedError
+    def _start(self, arg):
+        self._branch, err = self._make_branch(arg)
+        if not self._branch:
+            self._error_callback("error", err)
+            return False
+        if not self._source.attach(self._branch, self._on_stream_error,
+                                   self._on_buffering):
+            self._branch = None
+            return False
+        return True
 
-    def _clean(self):
-        pass
+    def _stop(self):
+        self._source.detach(self._branch)
+        self._branch = None
 
-    def _on_eos(self, bus, msg):
-        self._error_callback("warning", "End of stream")
+    def _on_stream_error(self, type, msg):
+        self._error_callback(type, msg)
         self.stop()
 
-    def _on_error(self, bus, msg):
-        err, dbg = msg.parse_error()
-        self._error_callback("error", str(err))
-        logging.error(dbg)
-        self.stop()
+    # buffering_func(percent, rate) of the branch
+    _on_buffering = None
 
 class SilverPlayer(Player):
     """ GStreamer class for playing network stream
-        souphttpsrc -> decodebin -> audioconvert -> volume -> autoaudiosink """
+        tee -> queue -> queue2 -> decodebin -> audioconvert -> volume
+            -> autoaudiosink
+
+        With config.timeshift minutes set the stream is played
+        through TimeShift buffer, so it can be paused and rewound.
+
+        Otherwise with config.adaptive_bitrate set, queue2 buffering
+        is watched, and player switches to a lower or higher bitrate
+        stream of the same server. New stream is started in a second
+        pipeline and crossfaded with the old one once its first buffer
+        is decoded. The shared source
+        is left only while nothing else uses it. """
 
     __name__ = "SilverPlayer"
 
-    def __init__(self, err_func):
-        Player.__init__(self, err_func)
+    def __init__(self, source, err_func):
+        Player.__init__(self, source, err_func)
         self.muted = False
+        self.paused = False
         self.volume = 100
+        self._timeshift = None
+        self._shared = source
+        self._url = source.location
+        self._monitor = BitrateMonitor()
+        # (old source, old branch, old url, switch started, fade started)
+        self._fade = None
+        # New branch has decoded data
+        self._fade_ready = False
+        self._fade_id = None
 
-        # Create GStream pipeline
-        self._pipe = Gst.Pipeline.new(self.__name__)
-        if not self._pipe:
-            self._error_callback("error", "Couldn't create pipeline")
-            sys.exit(-1)
-        self._el = dict()
-        try:
-            self._el["source"] = Gst.ElementFactory.make("souphttpsrc",
-                                                            "source")
-            self._el["decode"] = Gst.ElementFactory.make("decodebin",
-                                                            "decode")
-            self._el["convert"] = Gst.ElementFactory.make("audioconvert",
-                                                            "convert")
-            self._el["volume"] = Gst.ElementFactory.make("volume",
-                                                            "volume")
-            self._el["sink"] = Gst.ElementFactory.make("autoaudiosink",
-                                                            "sink")
-        except Gst.ElementNotFoundError as e:
-            self._error_callback("error", "Couldn't find GStreamer element")
-            logging.error(str(e))
-            sys.exit(-1)
-
-        for e in self._el:
-            if not self._el[e]:
-                self._error_callback("error",
-                                     "Couldn't create GStreamer element: " + e)
-                sys.exit(-1)
-            self._pipe.add(self._el[e])
-
-        self._el["source"].set_property("location", config.stream_url)
-        self._el["source"].set_property("is-live", True)
-        self._el["source"].set_property("compress", True)
-        if config.proxy_required:
-            self._el["source"].set_property("proxy", config.proxy_uri)
-            self._el["source"].set_property("proxy-id", config.proxy_id)
-            self._el["source"].set_property("proxy-pw", config.proxy_pw)
-        self._el["volume"].set_property("volume", 1.)
+    def start(self, arg=None):
+        """ Start playing, resume if paused """
+        if self.paused:
+            self.resume()
+        else:
+            Player.start(self, arg)
 
-        # Link elements
-        def on_pad_added(decode, pad):
-            if not pad.is_linked():
-                return pad.link(self._el["convert"].get_static_pad("sink"))
-        self._el["decode"].connect("pad-added", on_pad_added)
-        if (not Gst.Element.link(self._el["source"], self._el["decode"]) or
-            not Gst.Element.link(self._el["convert"], self._el["volume"]) or
-            not Gst.Element.link(self._el["volume"], self._el["sink"])):
-            self._error_callback("error", "Elements could not be linked")
-            sys.exit(-1)
-
-        # Create message bus
-        self._bus = self._pipe.get_bus()
-        self._bus.add_signal_watch()
-        self._bus.connect("message::eos", self._on_eos)
-        self._bus.connect("message::error", self._on_error)
+    def clean(self):
+        self._stop_switch()
+        Player.clean(self)
+        self._stop_timeshift()
+        self._leave_source()
+
+    def pause(self):
+        """ Pause, keep buffering stream.
+            Same as stop without time-shift. """
+        if not self.playing or self.paused:
+            return
+        if not self._timeshift:
+            self.stop()
+            return
+        self.paused = True
+        self._check(self._timeshift.pause())
+
+    def resume(self):
+        """ Continue from where it was paused """
+        if not self.paused:
+            return
+        self.paused = False
+        self._check(self._timeshift.resume())
+
+    def seek(self, delay):
+        """ Play delay seconds behind live, 0 is live """
+        if self._timeshift:
+            self._check(self._timeshift.seek(delay))
+
+    @property
+    def delay(self):
+        """ Seconds behind live """
+        return self._timeshift.delay if self._timeshift else 0.
 
     def set_volume(self, value):
         """ Set player volume [0-100] """
         self.volume = value
-        self._pipe.get_by_name("volume").set_property("volume",
-                                                      self.volume / 100.)
         self.muted = False
+        self._apply_volume()
 
     def mute(self):
         """ Mute """
         if self.muted:
             return
-        self._pipe.get_by_name("volume").set_property("volume", 0.)
         self.muted = True
+        self._apply_volume()
 
     def unmute(self):
         """ Restore previous volume level """
@@ -161,121 +192,255 @@ class SilverPlayer(Player):
             return
         self.set_volume(self.volume)
 
+    def _level(self):
+        return 0. if self.muted else self.volume / 100.
+
+    def _apply_volume(self):
+        if self._timeshift:
+            self._timeshift.set_volume(self._level())
+        elif self._branch:
+            self._branch.get_by_name("volume").set_property("volume",
+                                                            self._level())
+
+    def _check(self, err):
+        if err:
+            self._on_stream_error("error", err)
+
     def _start(self, stream=None):
-        if stream:
-            self._pipe.get_by_name("source").set_property("location", stream)
-        ret = self._pipe.set_state(Gst.State.PLAYING)
-        if ret == Gst.StateChangeReturn.FAILURE:
-            self._error_callback("error", "Couldn't change state on pipeline")
-            self.clean()
-            sys.exit(-1)
+        if not Player._start(self, stream):
+            self._stop_timeshift()
+            return False
+        if self._timeshift:
+            err = self._timeshift.start(self._level())
+            if err:
+                self._error_callback("error", err)
+                self._stop()
+                return False
+        return True
 
     def _stop(self):
-        ret = self._pipe.set_state(Gst.State.READY)
-        if ret == Gst.StateChangeReturn.FAILURE:
-            self._error_callback("error", "Couldn't change state on pipeline")
-            self.clean()
-            sys.exit(-1)
-
-    def _clean(self):
-        """ Unref pipeline """
-        self._pipe.set_state(Gst.State.NULL)
-
-    def _on_config_changed(self):
-        src = self._pipe.get_by_name("source")
-        src.set_property("location", config.stream_url)
-        if config.proxy_required:
-            src.set_property("proxy", config.proxy_uri)
-            src.set_property("proxy-id", config.proxy_id)
-            src.set_property("proxy-pw", config.proxy_pw)
+        self._stop_switch()
+        Player._stop(self)
+        self._stop_timeshift()
+        self._leave_source()
+
+    def _stop_timeshift(self):
+        self.paused = False
+        if self._timeshift:
+            self._timeshift.stop()
+            self._timeshift = None
+
+    def _make_branch(self, stream=None):
+        self._url = stream or self._source.location
+        if stream:
+            self._source.set_location(stream)
+        self._monitor.reset()
+        if config.timeshift > 0:
+            self._timeshift = TimeShift(TIMESHIFT_FILE, config.timeshift,
+                                        self._on_stream_error)
+            return self._timeshift.make_branch()
+        return self._make_decoder(self._level())
+
+    def _make_decoder(self, level):
+        """ Return (bin, error message) of playback branch """
+        bin, el = make_branch(self.__name__,
+                              [ ("queue",         "queue"),
+                                ("queue2",        "buffer"),
+                                ("decodebin",     "decode"),
+                                ("audioconvert",  "convert"),
+                                ("volume",        "volume"),
+                                ("autoaudiosink", "sink") ])
+        if not bin:
+            return None, el
+        # Drop data rather than stall the recorder
+        el["queue"].set_property("leaky", 2)
+        # Measure buffer fill and incoming rate
+        el["buffer"].set_property("use-buffering", True)
+        el["buffer"].set_property("max-size-buffers", 0)
+        el["buffer"].set_property("max-size-bytes", 0)
+        el["buffer"].set_property("max-size-time", 3 * Gst.SECOND)
+
+        # Link elements
+        def on_pad_added(decode, pad):
+            if not pad.is_linked():
+                return pad.link(el["convert"].get_static_pad("sink"))
+        el["decode"].connect("pad-added", on_pad_added)
+        if (not Gst.Element.link(el["queue"], el["buffer"]) or
+            not Gst.Element.link(el["buffer"], el["decode"]) or
+            not Gst.Element.link(el["convert"], el["volume"]) or
+            not Gst.Element.link(el["volume"], el["sink"])):
+            return None, "Elements could not be linked"
+        el["volume"].set_property("volume", level)
+        return bin, None
+
+    def _on_buffering(self, percent, rate):
+        if not config.adaptive_bitrate or self._timeshift or self._fade:
+            return
+        # Never above the stream chosen in preferences
+        higher = None
+        if bitrate_of(self._url) < bitrate_of(config.stream_url):
+            higher = stream_variant(self._url, UP)
+        direction = self._monitor.update(percent, rate,
+                                         bitrate_of(self._url),
+                                         higher is not None)
+        url = direction and stream_variant(self._url, direction)
+        if not url:
+            return
+        if self._source is self._shared and self._shared.attached > 1:
+            # Recorder needs this stream
+            return
+        logging.info("Switching stream {0}: {1}".format(direction, url))
+        self._switch(url)
+
+    def _switch(self, url):
+        """ Start url in a second pipeline, crossfade to it """
+        if url == self._shared.location:
+            # Back to the shared one
+            source = self._shared
         else:
-            src.set_property("proxy", "")
-            src.set_property("proxy-id", "")
-            src.set_property("proxy-pw", "")
+            source = StreamSource()
+            source.set_location(url)
+        branch, err = self._make_decoder(0.)
+        if not branch or not source.attach(branch, self._on_stream_error,
+                                           self._on_buffering):
+            if source is not self._shared:
+                source.clean()
+            return
+        self._fade = (self._source, self._branch, self._url,
+                      time.monotonic(), None)
+        self._fade_ready = False
+
+        def on_buffer(pad, info):
+            # Streaming thread
+            GObject.idle_add(self._on_fade_ready, branch)
+            return Gst.PadProbeReturn.REMOVE
+
+        # Shared source might be streaming already,
+        # but the new branch starts from nothing
+        branch.get_by_name("volume").get_static_pad("sink").add_probe(
+                                        Gst.PadProbeType.BUFFER, on_buffer)
+        self._source, self._branch = source, branch
+        self._url = url
+        self._monitor.reset()
+        self._fade_id = GObject.timeout_add(FADE_STEP, self._on_fade)
+
+    def _on_fade(self):
+        old_source, old_branch, old_url, began, fade_began = self._fade
+        now = time.monotonic()
+        if not self._fade_ready:
+            if now - began > SWITCH_TIMEOUT:
+                logging.warning("Stream switch timed out")
+                self._stop_switch(keep_new=False)
+                return False
+            return True
+        if fade_began is None:
+            fade_began = now
+            self._fade = (old_source, old_branch, old_url, began, fade_began)
+        k = min(1., (now - fade_began) / FADE_TIME)
+        old_branch.get_by_name("volume").set_property("volume",
+                                                    (1 - k) * self._level())
+        self._branch.get_by_name("volume").set_property("volume",
+                                                        k * self._level())
+        if k < 1:
+            return True
+        self._fade_id = None
+        self._stop_switch()
+        return False
+
+    def _on_fade_ready(self, branch):
+        """ First buffer decoded by branch """
+        if self._fade and self._branch is branch:
+            self._fade_ready = True
+        return False
+
+    def _stop_switch(self, keep_new=True):
+        """ Finish or abort stream switch """
+        if not self._fade:
+            return
+        if self._fade_id:
+            GObject.source_remove(self._fade_id)
+            self._fade_id = None
+        old_source, old_branch, old_url = self._fade[:3]
+        self._fade = None
+        if not keep_new:
+            # Back to the old one
+            old_source, self._source = self._source, old_source
+            old_branch, self._branch = self._branch, old_branch
+            self._url = old_url
+        self._apply_volume()
+        old_source.detach(old_branch)
+        if old_source is not self._shared:
+            old_source.clean()
+
+    def _leave_source(self):
+        """ Go back to the shared source """
+        if self._source is not self._shared:
+            self._source.clean()
+            self._source = self._shared
+        self._url = self._shared.location
 
 class SilverRecorder(Player):
     """ GStreamer class for recording network stream
-        souphttpsrc -> icydemux -> filesink """
+        tee -> queue -> icydemux -> mpegaudioparse -> filesink
+
+        Only whole MP3 frames are written, and the file is appended
+        when the stream is reconnected, so the recording goes on
+        in the same file. Gaps are listed in <file>.gaps """
 
     __name__ = "SilverRecorder"
 
-    def __init__(self, err_func):
-        Player.__init__(self, err_func)
+    def __init__(self, source, err_func):
+        Player.__init__(self, source, err_func)
+        self.file = None
+        self._started = 0
+        self._lost = 0
 
-        # Create GStream pipeline
-        self._pipe = Gst.Pipeline.new(self.__name__)
-        if not self._pipe:
-            self._error_callback("error", "Couldn't create pipeline")
-            sys.exit(-1)
-        self._el = dict()
+    def mark_gap(self, lost):
+        """ Note that lost seconds of stream are missing """
+        lost = min(lost, time.monotonic() - self._started)
+        if not self.playing or lost <= 0:
+            return
+        # Position in the recording
+        pos = time.monotonic() - lost - self._started - self._lost
+        self._lost += lost
+        h, m = divmod(int(pos), 3600)
+        m, s = divmod(m, 60)
         try:
-            self._el["source"] = Gst.ElementFactory.make('souphttpsrc',
-                                                            'source')
-            self._el["demux"] = Gst.ElementFactory.make('icydemux',
-                                                            'demux')
-            self._el["filesink"] = Gst.ElementFactory.make('filesink',
-                                                            'filesink')
-        except Gst.ElementNotFoundError:
-            self._error_callback("error", "Couldn't find GStreamer element")
-            sys.exit(-1)
-
-        for e in self._el:
-            if not self._el[e]:
-                self._error_callback("error",
-                                     "Couldn't create GStreamer element: " + e)
-                sys.exit(-1)
-            self._pipe.add(self._el[e])
-
-        self._el["source"].set_property("location", config.stream_url)
-        self._el["source"].set_property("is-live", True)
-        self._el["source"].set_property("compress", True)
-        if config.proxy_required:
-            self._el["source"].set_property("proxy", config.proxy_uri)
-            self._el["source"].set_property("proxy-id", config.proxy_id)
-            self._el["source"].set_property("proxy-pw", config.proxy_pw)
-        self._el["filesink"].set_property("location", "file.mp3")
-
-        # Link elements
-        def on_pad_added(demux, pad):
-            if not pad.is_linked():
-                return pad.link(self._el["filesink"].get_static_pad("sink"))
-        self._el["demux"].connect('pad-added', on_pad_added)
-
-        if not Gst.Element.link(self._el["source"], self._el["demux"]):
-            self._error_callback("error", "Elements could not be linked")
-            sys.exit(-1)
+            with open(self.file + ".gaps", "a") as f:
+                f.write("{0:0=2d}:{1:0=2d}:{2:0=2d}\t{3:.0f}s lost\n".format(
+                                                            h, m, s, lost))
+        except OSError as e:
+            logging.warning("Couldn't mark gap: " + str(e))
 
-        # Create message bus
-        self._bus = self._pipe.get_bus()
-        self._bus.add_signal_watch()
-        self._bus.connect("message::eos", self._on_eos)
-        self._bus.connect("message::error", self._on_error)
-
-    def _start(self, name):
+    def _make_branch(self, name):
         file = datetime.now(MSK()).strftime(config.recs_prefix) + name
         file = "{0}/{1}.mp3".format(config.recs_dir, file)
-        self._pipe.get_by_name("filesink").set_property("location", file)
-        ret = self._pipe.set_state(Gst.State.PLAYING)
-        if ret == Gst.StateChangeReturn.FAILURE:
-            self._error_callback("error", "Couldn't change state on pipeline")
-            self.clean()
-            sys.exit(-1)
+        self.file = file
+        self._started = time.monotonic()
+        self._lost = 0
+        bin, el = make_branch(self.__name__,
+                              [ ("queue",    "queue"),
+                                ("icydemux", "demux"),
+                                ("mpegaudioparse", "parse"),
+                                ("filesink", "filesink") ])
+        if not bin:
+            return None, el
+        # Compressed data is small, keep a few seconds of it
+        # in case the disk is slow, drop it rather than stall playback
+        el["queue"].set_property("max-size-buffers", 0)
+        el["queue"].set_property("max-size-time", 0)
+        el["queue"].set_property("max-size-bytes", 4 * 1024 * 1024)
+        el["queue"].set_property("leaky", 2)
+        el["filesink"].set_property("location", file)
+        # Reopened after reconnect
+        el["filesink"].set_property("append", True)
 
-    def _stop(self):
-        ret = self._pipe.set_state(Gst.State.NULL)
-        if ret == Gst.StateChangeReturn.FAILURE:
-            self._error_callback("error", "Couldn't change state on pipeline")
-            self.clean()
-            sys.exit(-1)
-
-    def _on_config_changed(self):
-        src = self._pipe.get_by_name("source")
-        src.set_property("location", config.stream_url)
-        if config.proxy_required:
-            src.set_property("proxy", config.proxy_uri)
-            src.set_property("proxy-id", config.proxy_id)
-            src.set_property("proxy-pw", config.proxy_pw)
-        else:
-            src.set_property("proxy", "")
-            src.set_property("proxy-id", "")
-            src.set_property("proxy-pw", "")
+        # Link elements
+        def on_pad_added(demux, pad):
+            if not pad.is_linked():
+                return pad.link(el["parse"].get_static_pad("sink"))
+        el["demux"].connect("pad-added", on_pad_added)
+        if (not Gst.Element.link(el["queue"], el["demux"]) or
+            not Gst.Element.link(el["parse"], el["filesink"])):
+            return None, "Elements could not be linked"
+        return bin, None
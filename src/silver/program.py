@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import sys
+
+__all__ = ["Program", "str_time"]
+
+# Use this list to operate with schedule
+SCHED_WEEKDAY_LIST = ["Monday", "Tuesday", "Wednesday", "Thursday",
+                      "Friday", "Saturday", "Sunday"]
+
+MUSIC = "Музыка"
+MUSIC_URL = "http://silver.ru/programms/muzyka/"
+
+# Shared host tuples
+_hosts = {}
+
+def str_time(start, end):
+    """ Return time in HH:MM-HH:MM """
+    s_h, s_m = divmod(int(start), 3600)
+    s_m = int(s_m / 60)
+    e_h, e_m = divmod(int(end), 3600)
+    e_m = int(e_m / 60)
+    return "{0:0=2d}:{1:0=2d} - {2:0=2d}:{3:0=2d}".format(s_h, s_m, e_h, e_m)
+
+def intern_hosts(host):
+    """ Return shared tuple of interned names """
+    host = tuple(sys.intern(x) for x in host)
+    return _hosts.setdefault(host, host)
+
+class Program():
+    """ Scheduled event
+
+        weekday             int (0-6)
+        is_main             bool
+        is_merged           bool
+        title               str
+        url                 str
+        host                (str)
+        icon                str
+        cover               str
+        start (seconds)     float
+        end   (seconds)     float
+        position            int
+        record              bool
+        play                bool
+
+        Strings are interned, so the same program scheduled
+        on several days doesn't keep its own copies. """
+    __slots__ = ("weekday", "is_main", "is_merged", "title", "url", "host",
+                 "icon", "cover", "start", "end", "position", "record",
+                 "play")
+
+    KEYS = ("weekday", "is_main", "is_merged", "title", "url", "host",
+            "icon", "cover", "start", "end", "record", "play")
+
+    def __init__(self, weekday, title, url, host=(), icon="", cover="",
+                 start=0.0, end=0.0, is_main=False, is_merged=False,
+                 record=False, play=False):
+        self.weekday = weekday
+        self.is_main = is_main
+        self.is_merged = is_merged
+        self.title = sys.intern(title)
+        self.url = sys.intern(url)
+        self.host = intern_hosts(host)
+        self.icon = sys.intern(icon)
+        self.cover = sys.intern(cover)
+        self.start = start
+        self.end = end
+        self.position = 0
+        self.record = record
+        self.play = play
+
+    @property
+    def time(self):
+        """ HH:MM - HH:MM """
+        return str_time(self.start, self.end)
+
+    def copy(self):
+        """ Return shallow copy """
+        return Program(**self.to_dict())
+
+    def to_dict(self):
+        """ Return dict for serialization """
+        return { key : getattr(self, key) for key in self.KEYS }
+
+    @classmethod
+    def from_dict(cls, d):
+        """ Create from dict, raise KeyError if something is missing """
+        d = { key : d[key] for key in cls.KEYS }
+        if isinstance(d["weekday"], str):
+            # Older schedule files
+            d["weekday"] = SCHED_WEEKDAY_LIST.index(d["weekday"])
+        return cls(**d)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import GObject
+from datetime import datetime
+from datetime import timedelta
+import logging
+
+import silver.config as config
+from silver.msktz import MSK
+from silver.player import SilverRecorder
+
+__all__ = ["PLAN_AHEAD", "RecordingManager"]
+
+# Recordings are planned this far ahead
+PLAN_AHEAD = timedelta(days=1)
+
+def _delay(dt):
+    """ Return milliseconds till datetime, 0 if it's passed """
+    return max(0, int((dt - datetime.now(MSK())).total_seconds() * 1000))
+
+class RecordingManager():
+    """ Several recordings running at once
+
+        Every recording is a separate branch of the shared stream,
+        so the next program starts recording while the previous one
+        is still being written. Recordings start config.recs_padding
+        seconds before the program and stop as much after its end,
+        so padded back-to-back programs overlap and nothing is lost
+        at the boundary. """
+    def __init__(self, source, err_func, idle_func=None, busy_func=None):
+        self._source = source
+        self._error_callback = err_func
+        self._idle_callback = idle_func
+        self._busy_callback = busy_func
+        # name : [SilverRecorder, stop timeout id]
+        self._recs = {}
+        # (name, start) : start timeout id
+        self._planned = {}
+        # (name, start) of planned recordings already started,
+        # they aren't started again once stopped
+        self._started = set()
+
+    @property
+    def playing(self):
+        """ True if anything is being recorded """
+        return bool(self._recs)
+
+    def names(self):
+        """ Return names of running recordings """
+        return list(self._recs)
+
+    def plan(self, recordings):
+        """ Record [(name, start, end)] datetimes, padded.
+            Replaces the previous plan, running recordings go on. """
+        self._cancel_plan()
+        padding = timedelta(seconds=config.recs_padding)
+        now = datetime.now(MSK())
+        self._started &= { x[:2] for x in recordings }
+        for name, start, end in recordings:
+            if end + padding <= now or (name, start) in self._started:
+                continue
+            if start - padding <= now:
+                # Already on
+                self._on_planned(name, start, end)
+                continue
+            self._planned[(name, start)] = GObject.timeout_add(
+                                _delay(start - padding), self._on_planned,
+                                name, start, end)
+
+    def start(self, name, end=None):
+        """ Record name until end datetime plus padding,
+            until stopped if end is None.
+            Running recording with the same name is extended. """
+        rec = self._recs.get(name)
+        if not rec:
+            def on_error(type, msg):
+                self.stop(name)
+                self._error_callback(type, msg)
+            recorder = SilverRecorder(self._source, on_error)
+            recorder.start(name)
+            if not recorder.playing:
+                return
+            rec = [ recorder, None ]
+            self._recs[name] = rec
+            if len(self._recs) == 1 and self._busy_callback:
+                self._busy_callback()
+        if rec[1]:
+            GObject.source_remove(rec[1])
+            rec[1] = None
+        if end is not None:
+            end += timedelta(seconds=config.recs_padding)
+            rec[1] = GObject.timeout_add(_delay(end), self._on_end, name)
+
+    def stop(self, name=None):
+        """ Stop recording name, all of them if name is None """
+        for key in ([ name ] if name is not None else self.names()):
+            rec = self._recs.pop(key, None)
+            if not rec:
+                continue
+            if rec[1]:
+                GObject.source_remove(rec[1])
+            rec[0].stop()
+        if not self._recs and self._idle_callback:
+            self._idle_callback()
+
+    def mark_gap(self, lost):
+        """ Note lost seconds of stream in every recording """
+        for recorder, timeout in self._recs.values():
+            recorder.mark_gap(lost)
+
+    def reset_connection_settings(self):
+        self.stop()
+        self._source.reset_connection_settings()
+
+    def clean(self):
+        self._cancel_plan()
+        for recorder, timeout in self._recs.values():
+            if timeout:
+                GObject.source_remove(timeout)
+            recorder.clean()
+        self._recs = {}
+
+    def _cancel_plan(self):
+        for timeout in self._planned.values():
+            GObject.source_remove(timeout)
+        self._planned = {}
+
+    def _on_planned(self, name, start, end):
+        """ Planned recording starts """
+        self._planned.pop((name, start), None)
+        self._started.add((name, start))
+        logging.info("Recording: " + name)
+        self.start(name, end)
+        return False
+
+    def _on_end(self, name):
+        """ Recording is over """
+        rec = self._recs.get(name)
+        if rec:
+            # Removed on return
+            rec[1] = None
+            self.stop(name)
+        return False
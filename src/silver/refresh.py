@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import Gio, GObject
+from datetime import datetime
+from datetime import timedelta
+import logging
+import time
+
+import silver.config as config
+from silver.msktz import MSK
+
+__all__ = ["RefreshPolicy"]
+
+# Retry delay after failure doubles from RETRY_MIN up to RETRY_MAX seconds
+RETRY_MIN = 60
+RETRY_MAX = 30 * 60
+
+class RefreshPolicy():
+    """ Decide when schedule should be refreshed in background
+
+        Refresh once the schedule is older than config.sched_max_age
+        hours, every day at config.sched_refresh_hour MSK (-1 to
+        disable) and when network comes back after a failed refresh.
+        Failed refresh is retried within minutes.
+        callback() is called in the main loop. """
+    def __init__(self, callback):
+        self._callback = callback
+        self._source = None
+        self._created = 0.0
+        self._failed = False
+        self._retries = 0
+        monitor = Gio.NetworkMonitor.get_default()
+        monitor.connect("network-changed", self._on_network_changed)
+
+    def schedule(self, created):
+        """ Plan next refresh of schedule retrieved at created """
+        self._created = created
+        self._failed = False
+        self._retries = 0
+        self._start(self._next_refresh(created) - time.time())
+
+    def failed(self):
+        """ Refresh failed, retry later or when network is up """
+        self._failed = True
+        delay = min(RETRY_MAX, RETRY_MIN * 2 ** self._retries,
+                    config.sched_max_age * 3600)
+        self._retries = min(self._retries + 1, 5)
+        self._start(delay)
+
+    def is_stale(self):
+        """ True if schedule is due for refresh """
+        return self._created > 0 and \
+               self._next_refresh(self._created) <= time.time()
+
+    def _next_refresh(self, created):
+        """ Return unix time refresh is due at """
+        due = created + config.sched_max_age * 3600
+        if config.sched_refresh_hour >= 0:
+            dt = datetime.fromtimestamp(created, MSK())
+            daily = dt.replace(hour=config.sched_refresh_hour, minute=0,
+                               second=0, microsecond=0)
+            if daily <= dt:
+                daily += timedelta(days=1)
+            due = min(due, daily.timestamp())
+        return due
+
+    def _start(self, delay):
+        if self._source:
+            GObject.source_remove(self._source)
+        delay = max(1, int(delay))
+        logging.debug("Next schedule refresh in {0}s".format(delay))
+        self._source = GObject.timeout_add_seconds(delay, self._on_timeout)
+
+    def _on_timeout(self):
+        self._source = None
+        self._callback()
+        return False
+
+    def _on_network_changed(self, monitor, available):
+        if available and (self._failed or self.is_stale()):
+            logging.debug("Network is up, refreshing schedule")
+            self._failed = False
+            self._callback()
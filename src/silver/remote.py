@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+__all__ = ["BUS_NAME", "COMMANDS", "OBJECT_PATH", "send_command"]
+
+BUS_NAME    = "org.SilverRain.Silver"
+OBJECT_PATH = "/org/SilverRain/Silver"
+
+# Command line command : D-Bus method
+COMMANDS = {
+        "pause"     : "pause",
+        "play"      : "play",
+        "record"    : "record",
+        "seek"      : "seek",
+        "show"      : "show_window",
+        "status"    : "status",
+        "stop"      : "stop",
+        "toggle"    : "toggle",
+        "volume"    : "volume",
+        }
+
+def send_command(bus, command, value=None):
+    """ Run command in the running instance.
+        Only dbus is needed here, so it's fast enough for hotkeys. """
+    object = bus.get_object(BUS_NAME, OBJECT_PATH)
+    method = object.get_dbus_method(COMMANDS[command], BUS_NAME)
+    if command in ("seek", "volume"):
+        method(value)
+    elif command == "status":
+        for key, val in sorted(method().items()):
+            print("{0}: {1}".format(key, val))
+    else:
+        method()
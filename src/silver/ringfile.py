@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from bisect import bisect_right
+from collections import deque
+import os
+import threading
+import time
+
+__all__ = ["RingFile"]
+
+class RingFile():
+    """ Fixed size file keeping the last bytes of the stream
+
+        Offsets are absolute, counted from the start of the stream.
+        Arrival time is marked about once a second, so offsets can be
+        turned into time and back. Memory use doesn't depend on
+        the file size. """
+    def __init__(self, path, size):
+        self.size = size
+        self.written = 0
+        self._path = path
+        self._file = open(path, "w+b")
+        self._lock = threading.Lock()
+        # (arrival time, offset)
+        self._marks = deque()
+
+    @property
+    def oldest(self):
+        """ Offset of the oldest byte still kept """
+        return max(0, self.written - self.size)
+
+    def write(self, data):
+        """ Append data, overwrite the oldest bytes """
+        with self._lock:
+            if self._file.closed:
+                # Writer branch is still being detached
+                return
+            # Only the tail fits, offsets still count all of it
+            skip = max(0, len(data) - self.size)
+            data = data[skip:]
+            self.written += skip
+            pos = self.written % self.size
+            head = data[:self.size - pos]
+            self._file.seek(pos)
+            self._file.write(head)
+            if len(head) < len(data):
+                self._file.seek(0)
+                self._file.write(data[len(head):])
+            self.written += len(data)
+            now = time.monotonic()
+            if not self._marks or now - self._marks[-1][0] >= 1:
+                self._marks.append((now, self.written))
+            # Keep a single mark before the oldest byte
+            while len(self._marks) > 1 and self._marks[1][1] <= self.oldest:
+                self._marks.popleft()
+
+    def read(self, pos, size):
+        """ Return (offset, data) of up to size bytes from pos,
+            pos is moved forward if it's already overwritten """
+        with self._lock:
+            pos = min(max(pos, self.oldest), self.written)
+            if self._file.closed:
+                return pos, b""
+            size = min(size, self.written - pos, self.size - pos % self.size)
+            self._file.seek(pos % self.size)
+            return pos, self._file.read(size)
+
+    def time_at(self, pos):
+        """ Return arrival time of byte at offset """
+        with self._lock:
+            marks = list(self._marks)
+        if not marks:
+            return time.monotonic()
+        i = bisect_right([ x[1] for x in marks ], pos)
+        if i == 0:
+            return marks[0][0]
+        if i == len(marks):
+            # Arrived after the last mark
+            return marks[-1][0]
+        (t0, p0), (t1, p1) = marks[i - 1], marks[i]
+        return t0 + (t1 - t0) * (pos - p0) / (p1 - p0)
+
+    def offset_at(self, t):
+        """ Return offset of the byte arrived at time t """
+        with self._lock:
+            marks = list(self._marks)
+            written = self.written
+        if not marks:
+            return written
+        i = bisect_right([ x[0] for x in marks ], t)
+        if i == 0:
+            return self.oldest
+        if i == len(marks):
+            return written
+        (t0, p0), (t1, p1) = marks[i - 1], marks[i]
+        return int(p0 + (p1 - p0) * (t - t0) / (t1 - t0))
+
+    def close(self):
+        """ Remove file """
+        with self._lock:
+            self._file.close()
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
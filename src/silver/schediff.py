@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+__all__ = ["INSERT", "UPDATE", "DELETE", "Change",
+           "apply_changes", "diff_week"]
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# op        - INSERT, UPDATE or DELETE
+# weekday   - int (0-6)
+# index     - position in the new day (in the old one for DELETE)
+# program   - new Program (old one for DELETE)
+# target    - old Program to be updated, None otherwise
+Change = namedtuple("Change", "op weekday index program target")
+
+# Copied from the new program on update.
+# Record and play flags belong to the user and are never touched.
+CONTENT = ("is_merged", "url", "host", "icon", "cover", "end")
+
+def program_key(item):
+    """ Program identity, stays the same between refreshes """
+    return (item.is_main, item.start, item.title)
+
+def _changed(old, new):
+    """ Return True if content of the same program differs """
+    for key in CONTENT:
+        value = getattr(new, key)
+        if key == "cover" and not value:
+            # Covers are downloaded later, keep the old one
+            continue
+        if getattr(old, key) != value:
+            return True
+    return False
+
+def diff_week(old, new):
+    """ Return list of changes turning old week into new one.
+        Changes of a weekday are ordered by their index. """
+    changes = []
+    for wd in range(7):
+        a = old[wd]
+        b = new[wd]
+        matcher = SequenceMatcher(None, [ program_key(x) for x in a ],
+                                  [ program_key(x) for x in b ],
+                                  autojunk=False)
+        deleted = []
+        inserted = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    if _changed(a[i], b[j]):
+                        inserted.append(Change(UPDATE, wd, j, b[j], a[i]))
+                continue
+            deleted += [ Change(DELETE, wd, i, a[i], None)
+                         for i in range(i1, i2) ]
+            inserted += [ Change(INSERT, wd, j, b[j], None)
+                          for j in range(j1, j2) ]
+        changes += deleted + inserted
+    return changes
+
+def apply_changes(week, changes):
+    """ Apply changes in place, return the week.
+        Unchanged and updated programs keep their objects. """
+    for wd in range(7):
+        day = week[wd]
+        todo = [ x for x in changes if x.weekday == wd ]
+        if not todo:
+            continue
+        removed = { id(x.program) for x in todo if x.op == DELETE }
+        if removed:
+            day = [ x for x in day if id(x) not in removed ]
+        for change in todo:
+            if change.op == UPDATE:
+                for key in CONTENT:
+                    value = getattr(change.program, key)
+                    if key == "cover" and not value:
+                        continue
+                    setattr(change.target, key, value)
+            elif change.op == INSERT:
+                day.insert(change.index, change.program)
+        week[wd] = day
+    return week
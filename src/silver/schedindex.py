@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import timedelta
+
+__all__ = ["ScheduleIndex"]
+
+def _seconds(dt):
+    """ Return seconds since midnight """
+    return dt.hour * 3600 + dt.minute * 60 + dt.second + \
+           dt.microsecond / 1000000
+
+def _midnight(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class _Day():
+    """ Main programs of a single weekday sorted by start.
+        Merged programs end after midnight, so their end is
+        counted from the start of this day (end + 24h). """
+    __slots__ = ("programs", "starts", "ends")
+
+    def __init__(self, programs):
+        self.programs = sorted((x for x in programs if x.is_main),
+                               key=lambda x : x.start)
+        self.starts = [ x.start for x in self.programs ]
+        self.ends = [ x.end + 86400 if x.is_merged else x.end
+                      for x in self.programs ]
+
+class ScheduleIndex():
+    """ Interval index of main programs
+
+        Per-weekday sorted arrays of start and end times.
+        Days are indexed on first use. """
+    def __init__(self, week):
+        self._week = week
+        self._days = [ None ] * 7
+        self._titles = None
+
+    def day(self, wd):
+        """ Return main programs of weekday sorted by start """
+        return self._day(wd).programs
+
+    def find(self, wd, start):
+        """ Return main program starting at start seconds or None """
+        day = self._day(wd)
+        i = bisect_left(day.starts, start)
+        if i < len(day.starts) and day.starts[i] == start:
+            return day.programs[i]
+        return None
+
+    def merged_from(self, wd):
+        """ Return the last program of weekday if it lasts
+            past midnight, None otherwise """
+        day = self._day(wd)
+        if day.programs and day.programs[-1].is_merged:
+            return day.programs[-1]
+        return None
+
+    def first_not_ended(self, wd, time):
+        """ Return position of the first program of weekday
+            which is still on at time seconds """
+        return bisect_right(self._day(wd).ends, time)
+
+    def event_at(self, dt):
+        """ Return main program on air at datetime dt or None """
+        wd = dt.weekday()
+        time = _seconds(dt)
+        prev = self.merged_from(wd - 1)
+        if prev and time < prev.end:
+            return prev
+        day = self._day(wd)
+        i = bisect_right(day.starts, time) - 1
+        if i >= 0 and time < day.ends[i]:
+            return day.programs[i]
+        return None
+
+    def next_occurrence(self, title, dt):
+        """ Return (start datetime, program) of the next program
+            with this title starting after dt, None if there's none """
+        if self._titles is None:
+            # Week seconds of starts and programs by title
+            self._titles = {}
+            for wd in range(7):
+                for item in self._day(wd).programs:
+                    starts, items = self._titles.setdefault(item.title,
+                                                            ([], []))
+                    starts.append(wd * 86400 + item.start)
+                    items.append(item)
+        found = self._titles.get(title)
+        if not found:
+            return None
+        starts, items = found
+        now = dt.weekday() * 86400 + _seconds(dt)
+        i = bisect_right(starts, now)
+        if i < len(starts):
+            delta = starts[i] - now
+        else:
+            # Next week
+            i = 0
+            delta = starts[0] + 7 * 86400 - now
+        return dt + timedelta(seconds=delta), items[i]
+
+    def range(self, start, end):
+        """ Yield (start datetime, program) for every program
+            on air between start and end datetimes """
+        # Yesterday's program might go past midnight
+        day = _midnight(start) - timedelta(days=1)
+        while day < end:
+            index = self._day(day.weekday())
+            # Seconds since the day's midnight
+            lo = _seconds(start) + (_midnight(start) - day).days * 86400
+            hi = _seconds(end) + (_midnight(end) - day).days * 86400
+            # Main programs don't overlap, so ends are sorted too
+            first = bisect_right(index.ends, lo)
+            last = bisect_left(index.starts, hi)
+            for item in index.programs[first:last]:
+                yield day + timedelta(seconds=item.start), item
+            day += timedelta(days=1)
+
+    def _day(self, wd):
+        wd %= 7
+        if self._days[wd] is None:
+            self._days[wd] = _Day(self._week[wd])
+        return self._days[wd]
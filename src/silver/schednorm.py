@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from silver.program import MUSIC
+from silver.program import MUSIC_URL
+from silver.program import Program
+
+__all__ = ["normalize_week"]
+
+DAY = 86400.0
+
+def _end(item):
+    """ End counted from the start of item's day """
+    return item.end + DAY if item.is_merged else item.end
+
+def _part(item, start, end):
+    """ Return item cut to [start, end) """
+    if start == item.start and end == _end(item):
+        return item
+    part = item.copy()
+    part.start = start
+    part.is_merged = end > DAY
+    part.end = end - DAY if part.is_merged else end
+    return part
+
+def _join_duplicates(mains):
+    """ Join overlapping programs with the same title """
+    joined = []
+    last = {}
+    for item in sorted(mains, key=lambda x : x.start):
+        prev = last.get(item.title)
+        if prev is not None and _end(joined[prev]) >= item.start:
+            if _end(item) > _end(joined[prev]):
+                joined[prev] = _part(joined[prev], joined[prev].start,
+                                     _end(item))
+            continue
+        last[item.title] = len(joined)
+        joined.append(item)
+    return joined
+
+def _sweep(mains):
+    """ Return non-overlapping programs sorted by start.
+        The program which started last is on air until it ends,
+        then the one it interrupted goes on. """
+    out = []
+    stack = []
+    now = 0.0
+
+    def advance(time):
+        nonlocal now
+        while stack:
+            top = stack[-1]
+            stop = min(_end(top), time)
+            if stop > now and now < DAY:
+                out.append(_part(top, now, stop))
+            now = max(now, stop)
+            if _end(top) > time:
+                break
+            stack.pop()
+        now = max(now, time)
+
+    # Longer programs first, so the nested one is on top
+    for item in sorted(mains, key=lambda x : (x.start, -_end(x))):
+        advance(item.start)
+        stack.append(item)
+    advance(float("inf"))
+    return out
+
+def _fill(mains, wd, start, music_icon):
+    """ Fill spaces with music """
+    filled = []
+    time = start
+    for item in mains:
+        if item.start > time:
+            filled.append(Program(wd, MUSIC, MUSIC_URL, icon=music_icon,
+                                  start=time, end=item.start, is_main=True))
+        filled.append(item)
+        time = max(time, _end(item))
+    if time < DAY:
+        filled.append(Program(wd, MUSIC, MUSIC_URL, icon=music_icon,
+                              start=time, end=DAY, is_main=True))
+    return filled
+
+def normalize_week(week, music_icon=""):
+    """ Return fixed week schedule:
+            same programs next to each other are joined,
+            programs inside another one split it in two,
+            spaces between programs are filled with music.
+        Main programs of every day cover 24 hours without overlaps
+        and normalizing the result again changes nothing. """
+    mains = []
+    for wd in range(7):
+        day = [ x for x in week[wd] if x.is_main ]
+        mains.append(_sweep(_join_duplicates(day)))
+    for wd in range(7):
+        # Yesterday's program might go past midnight,
+        # today's first program interrupts it
+        prev = mains[wd - 1]
+        if prev and prev[-1].is_merged and mains[wd] and \
+                mains[wd][0].start < prev[-1].end:
+            prev[-1] = _part(prev[-1], prev[-1].start,
+                             DAY + mains[wd][0].start)
+    fixed = []
+    for wd in range(7):
+        prev = mains[wd - 1]
+        start = 0.0
+        if prev and prev[-1].is_merged:
+            start = prev[-1].end
+        day = _fill(mains[wd], wd, start, music_icon)
+        day += [ x for x in week[wd] if not x.is_main ]
+        day.sort(key=lambda x : (x.start, -x.is_main, x.end))
+        fixed.append(day)
+    return fixed
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from collections import deque
+from html.parser import HTMLParser
+from xml.etree.ElementTree import TreeBuilder
+
+__all__ = ["ProgramListParser"]
+
+# Elements that never have a closing tag
+VOID_TAGS = { "area", "base", "br", "col", "embed", "hr", "img", "input",
+              "link", "meta", "param", "source", "track", "wbr" }
+
+class ProgramListParser(HTMLParser):
+    """ Incremental parser for the program list table
+
+        Feed the page in chunks. Every <tr> of the first <tbody>
+        inside <div class="program-list"> becomes an Element
+        as soon as the row is closed. Everything outside the table
+        is skipped without building anything. """
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.found = False
+        self.done = False
+        self._in_list = False
+        self._in_body = False
+        self._builder = None
+        self._stack = []
+        self._rows = deque()
+
+    def rows(self):
+        """ Pop finished rows """
+        while self._rows:
+            yield self._rows.popleft()
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self._builder:
+            self._builder.start(tag, dict(attrs))
+            if tag in VOID_TAGS:
+                self._builder.end(tag)
+            else:
+                self._stack.append(tag)
+        elif self._in_body:
+            if tag == "tr":
+                self._builder = TreeBuilder()
+                self._builder.start(tag, dict(attrs))
+                self._stack.append(tag)
+        elif self._in_list:
+            if tag == "tbody":
+                self._in_body = True
+                self.found = True
+        elif tag == "div":
+            cls = dict(attrs).get("class") or ""
+            if cls.startswith("program-list"):
+                self._in_list = True
+
+    def handle_startendtag(self, tag, attrs):
+        if self._builder:
+            self._builder.start(tag, dict(attrs))
+            self._builder.end(tag)
+        else:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if self._builder:
+            if tag in VOID_TAGS or tag not in self._stack:
+                # Stray closing tag
+                return
+            # Close everything left unclosed
+            while self._stack:
+                last = self._stack.pop()
+                self._builder.end(last)
+                if last == tag:
+                    break
+            if not self._stack:
+                self._rows.append(self._builder.close())
+                self._builder = None
+        elif self._in_body and tag == "tbody":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._builder:
+            # Drop &nbsp;
+            self._builder.data(data.replace("\xa0", ""))
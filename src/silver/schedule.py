@@ -18,29 +18,41 @@ Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
 Boston, MA 02110-1301 USA
 """
 
-from gi.repository import GdkPixbuf, Gtk, Gdk
+import codecs
 import glob
 import json
 import logging
 import os
 import re
 import requests
-import urllib.request
+import time
 from collections import deque
+from collections import namedtuple
 from datetime import datetime
 from datetime import timedelta
 
-try:
-    from lxml import etree
-except ImportError as err:
-    import xml.etree.ElementTree as etree
-
 import silver.config as config
-from silver.globals import ICON
+from silver.globals import CACHE_DIR
 from silver.globals import IMG_DIR
+from silver.globals import SCHED_DUMP
 from silver.globals import SCHED_FILE
-from silver.gui.common import hex_to_rgba
+from silver.globals import THUMB_DIR
+from silver.downloader import Downloader
+from silver.downloader import create_session
+from silver.httpcache import HTTPCache
+from silver.imagestore import ImageStore
+from silver.imagestore import prune_thumbnails
 from silver.msktz import MSK
+from silver.program import MUSIC
+from silver.program import Program
+from silver.schediff import apply_changes
+from silver.schediff import diff_week
+from silver.schedindex import ScheduleIndex
+from silver.schednorm import normalize_week
+from silver.snapshot import SnapshotError
+from silver.snapshot import read_snapshot
+from silver.snapshot import write_snapshot
+from silver.schedparser import ProgramListParser
 
 SCHED_URL       = "http://silver.ru/programms/"
 SILVER_RAIN_URL = "http://silver.ru"
@@ -48,19 +60,16 @@ USER_AGENT      = "Mozilla/5.0 (X11; Linux x86_64) " + \
                   "AppleWebKit/537.36 (KHTML, like Gecko) " + \
                   "Chrome/41.0.2227.0 Safari/537.36"
 
-# Use this list to operate with schedule
-SCHED_WEEKDAY_LIST = ["Monday", "Tuesday", "Wednesday", "Thursday",
-                      "Friday", "Saturday", "Sunday"]
-MUSIC = "Музыка"
-MUSIC_URL = "http://silver.ru/programms/muzyka/"
+# Read page by chunks of this size
+CHUNK_SIZE = 16384
+# Don't revalidate images more often than that
+IMG_MAX_AGE = 7 * 86400
 
-def str_time(start, end):
-    """ Return time in HH:MM-HH:MM """
-    s_h, s_m = divmod(int(start), 3600)
-    s_m = int(s_m / 60)
-    e_h, e_m = divmod(int(end), 3600)
-    e_m = int(e_m / 60)
-    return "{0:0=2d}:{1:0=2d} - {2:0=2d}:{3:0=2d}".format(s_h, s_m, e_h, e_m)
+# Schedule loaded in background
+#   week        - list[weekday(0-6)] of Program, not shared with anyone
+#   refreshed   - True if loaded from site, False if from file
+#   created     - unix time schedule was retrieved from site at
+ScheduleUpdate = namedtuple("ScheduleUpdate", "week refreshed created")
 
 def parse_time(str):
     """ Return time in seconds """
@@ -91,6 +100,14 @@ def parse_weekday(str):
             wd_parsed += [ wd_name_list[x[0].strip()] ]
     return wd_parsed
 
+def program_period(start, item):
+    """ Return (start, end) datetimes of program starting at start """
+    length = item.end - item.start
+    if item.is_merged:
+        # Ends after midnight
+        length += 86400
+    return start, start + timedelta(seconds=length)
+
 def parse_hosts(hosts):
     """ Return formatted string from list """
     if len(hosts) > 1 :
@@ -105,93 +122,90 @@ class SilverSchedule():
         _sched_week      - full schedule
         _sched_day       - daily agenda
         _event           - currently playing
+        _updated         - programs changed by the last refresh
 
         Schedule list[weekday(0-6)]:
-            position            int
-            weekday             str
-            is_parent           bool
-            is_merged           bool
-            time  (HH:MM-HH:MM) str
-            title               str
-            url                 str
-            host                [str]
-            icon                str
-            start (seconds)     float
-            end   (seconds)     float
-            cover               str
-            record              bool
-            play                bool
+            Program
     """
     def __init__(self):
         self._sched_week = [ [] for x in range(7) ]
         self._sched_day = deque()
-        self._event = {}
-        self._SCHEDULE_ERROR = False
+        self._index = ScheduleIndex(self._sched_week)
+        self._event = None
+        self._updated = set()
+        self._created = 0.0
+        self._SCHEDULE_ERROR = True
+        # Shared session with fake user-agent
+        self._session = create_session()
+        self._session.headers["User-Agent"] = USER_AGENT
+        self._downloader = Downloader()
+        # All downloads go through cache
+        self._cache = HTTPCache(CACHE_DIR, self._session)
+        self._images = ImageStore(IMG_DIR, self._cache,
+                                  config.img_store_size * 1024 * 1024)
 
     def get_event_title(self):
         """ Return event title """
         if not self._SCHEDULE_ERROR:
-            return self._event["title"]
+            return self._event.title
         else:
             return "Silver-Rain"
 
     def get_event_time(self):
         """ Return event time hh:mm-hh:mm """
         if not self._SCHEDULE_ERROR:
-            return self._event["time"]
+            return self._event.time
         else:
             return "00:00-24:00"
 
     def get_event_url(self):
         """ Return event url """
         if not self._SCHEDULE_ERROR:
-            return self._event["url"]
+            return self._event.url
         else:
             return "http://silver.ru/"
 
     def get_event_merged_status(self):
         """ Return end time in seconds """
         if not self._SCHEDULE_ERROR:
-            return self._event["is_merged"]
+            return self._event.is_merged
         else:
             return False
 
     def get_event_end(self):
         """ Return end time in seconds """
         if not self._SCHEDULE_ERROR:
-            return self._event["end"]
+            return self._event.end
         else:
             return 86400.0
 
     def get_event_position(self):
         """ Return event position """
         if not self._SCHEDULE_ERROR:
-            return self._event["position"]
+            return self._event.position
         else:
             return 0
 
     def get_event_weekday(self):
         """ Return weekday """
         if not self._SCHEDULE_ERROR:
-            return SCHED_WEEKDAY_LIST.index(self._event["weekday"])
+            return self._event.weekday
         else:
             return datetime.now(MSK()).weekday()
 
     def get_event_icon(self):
         """ Return pixbuf """
-        if not self._SCHEDULE_ERROR and self._event["icon"]:
-            pb = GdkPixbuf.Pixbuf.new_from_file_at_size(self._event["icon"],
-                                                        width=90, height=90)
-        else:
-            icontheme = Gtk.IconTheme.get_default()
-            pb = icontheme.load_icon(ICON, 256, 0)
-            pb = pb.scale_simple(80, 80, GdkPixbuf.InterpType.BILINEAR)
-        return pb
+        # Not loaded in headless mode
+        from silver.gui.pixbufcache import get_pixbuf
+        icon = ""
+        if not self._SCHEDULE_ERROR:
+            icon = self._event.icon
+        return get_pixbuf(icon, 90)
 
     def get_event_host(self):
         """ Return host """
         if not self._SCHEDULE_ERROR:
-            str = parse_hosts(self._event["host"])
+            str = parse_hosts(self._event.host)
         else:
             str = ""
         return str
@@ -199,20 +213,23 @@ class SilverSchedule():
     def get_event_cover(self):
         file = ""
         if not self._SCHEDULE_ERROR and config.background_image:
-            file = self._event["cover"]
+            file = self._event.cover
+        if file and not os.path.exists(file):
+            # Removed from image store
+            file = ""
         return file
 
     def get_record_status(self):
         """ Return True if should be recorded """
         if not self._SCHEDULE_ERROR:
-            return self._event["record"]
+            return self._event.record
         else:
             return False
 
     def get_play_status(self):
         """ Return True if should start playing """
         if not self._SCHEDULE_ERROR:
-            return self._event["play"]
+            return self._event.play
         else:
             return False
 
@@ -224,473 +241,481 @@ class SilverSchedule():
             self._sched_gen_daily_agenda()
         self._event = self._sched_day.popleft()
 
-    def update_schedule(self, force_refresh=False):
-        """ Retrieve schedule """
-        self._SCHEDULE_ERROR = True
+    def fetch_schedule(self, force_refresh=False, task=None):
+        """ Retrieve schedule, return ScheduleUpdate or None on error.
+            Current schedule isn't touched, so it's safe to run
+            in a worker thread. """
+        if not os.path.exists(SCHED_FILE) and os.path.exists(SCHED_DUMP):
+            # Convert schedule saved by older version
+            self._sched_migrate()
         if not force_refresh and os.path.exists(SCHED_FILE):
             # Read from file
-            self._sched_load_from_file()
-
-        if self._SCHEDULE_ERROR:
-            # Backup
-            sched_week_bak = self._sched_week
-            sched_day_bak = self._sched_day
-            # Clear
-            self._sched_week = [ [] for x in range(7) ]
-            self._sched_day = deque()
-            # Load from website
-            if not self._sched_load_from_html():
-                if sched_week_bak[0]:
-                    # Got backup. Reset error status
-                    self._SCHEDULE_ERROR = False
-                self._sched_week = sched_week_bak
-                self._sched_day = sched_day_bak
-                return False
+            snapshot = self._sched_load_from_file()
+            if snapshot:
+                return ScheduleUpdate(snapshot.week(), False,
+                                      snapshot.created)
+        # Load from website
+        try:
+            week = self._sched_load_from_html(task)
+        finally:
+            # Write cache index once per refresh
+            self._cache.flush()
+            self._images.flush()
+        if not week:
+            return None
+        return ScheduleUpdate(week, True, time.time())
+
+    def apply_update(self, update, save=True):
+        """ Replace schedule with the one retrieved by fetch_schedule.
+            Refreshed schedule is saved, unless save is False and
+            the caller does it later with save_schedule() """
+        if update.refreshed and not self._SCHEDULE_ERROR:
+            # Keep unchanged programs and user flags
+            changes = diff_week(self._sched_week, update.week)
+            logging.debug("Schedule refresh: {0} changes".format(
+                          len(changes)))
+            self._sched_week = apply_changes(self._sched_week, changes)
+            self._updated = { x.target for x in changes if x.target }
+        else:
+            self._sched_week = update.week
+        self._created = update.created
+        self._index = ScheduleIndex(self._sched_week)
+        if update.refreshed and save:
+            # Save sched to file
+            self._sched_write_to_file()
         # Generate schedule for today
         self._sched_gen_daily_agenda()
         # Update current event
         self.update_event()
         self._SCHEDULE_ERROR = False
-        return True
 
-    def update_covers(self):
-        """ Retrieve covers """
-        covers = {}
+    def save_schedule(self):
+        """ Save schedule on disk """
+        self._sched_write_to_file()
+
+    def get_schedule_created(self):
+        """ Return unix time schedule was retrieved at """
+        return self._created
+
+    def get_program_urls(self):
+        """ Return pages of main programs """
+        return [ item.url for wd in range(7) for item in self._sched_week[wd]
+                 if item.is_main ]
+
+    def fetch_covers(self, urls, task=None):
+        """ Retrieve covers, return {url : file}.
+            Safe to run in a worker thread. """
+        def get_cover(url):
+            if task and task.cancelled:
+                return ""
+            return self._get_cover(url)
+        try:
+            covers = self._downloader.run(get_cover, urls,
+                                          task.progress if task else None)
+        finally:
+            self._cache.flush()
+            self._images.flush()
+        # Keep image store within its budget,
+        # images of the current schedule stay
+        keep = set(covers.values())
+        for wd in range(7):
+            for item in self._sched_week[wd]:
+                keep.add(item.icon)
+                keep.add(item.cover)
+        self._images.prune(keep)
+        prune_thumbnails(IMG_DIR, THUMB_DIR)
+        logging.debug("HTTP cache: {hits} hits, {misses} misses, "
+                      "{entries} entries, {size} bytes".format(
+                      **self._cache.stats()))
+        return covers
+
+    def apply_covers(self, covers):
+        """ Set covers retrieved by fetch_covers """
         for wd in range(7):
             for item in self._sched_week[wd]:
-                if not item["is_main"]:
-                    continue
-                elif item["title"] in covers:
-                    # If already downloaded
-                    item["cover"] = covers[item["title"]]
-                    continue
-                item["cover"] = self._get_cover(item["url"])
-                covers[item["title"]] = item["cover"]
+                if item.is_main and item.url in covers:
+                    item.cover = covers[item.url]
         self._sched_write_to_file()
 
     def fill_tree_store(self, store):
         """ Fill TreeStore object """
         it = None
-        font = config.font
-        fg_color = config.font_color
-        icontheme = Gtk.IconTheme.get_default()
-
         bg_dark = False
         ch_dark = False
         for wd in range(7):
             for item in self._sched_week[wd]:
-                # Get pixbuf
-                if item["icon"]:
-                    icon = GdkPixbuf.Pixbuf.new_from_file(item["icon"])
-                else:
-                    # Load default icon instead
-                    icon = icontheme.load_icon(ICON, 256, 0)
-                # Scale
-                sz = 80
-                if not item["is_main"]:
-                    sz = 60
-                icon = icon.scale_simple(sz, sz, GdkPixbuf.InterpType.BILINEAR)
-                # Join hosts
-                host = parse_hosts(item["host"])
-                # Insert program
-                if item["is_main"]:
+                if item.is_main:
                     # Main event
-                    bg_color = hex_to_rgba(config.bg_colors[bg_dark])
-                    bg_color.alpha = config.bg_alpha[bg_dark]
-                    # Insert item
-                    it = store.append(None, [item["weekday"], item["is_main"],
-                                             item["time"], item["title"],
-                                             item["url"], host, icon,
-                                             bg_color, fg_color, font,
-                                             bg_dark, item["record"],
-                                             item["play"], item["is_merged"]])
+                    it = store.append(None, self._tree_row(item, bg_dark))
                     # Alternate row color
                     bg_dark = not bg_dark
                     ch_dark = bg_dark
                 else:
                     # Child event
-                    bg_color = hex_to_rgba(config.bg_colors[ch_dark])
-                    bg_color.alpha = config.bg_alpha[ch_dark]
-                    # Insert item
-                    store.append(it, [item["weekday"], item["is_main"],
-                                 item["time"], item["title"], item["url"],
-                                 host, icon, bg_color, fg_color, font,
-                                 ch_dark, False, False, False])
+                    store.append(it, self._tree_row(item, ch_dark))
                     # Alternate row color
                     ch_dark = not ch_dark
 
+    def update_tree_store(self, store):
+        """ Apply last refresh to TreeStore object filled before.
+            Only rows of inserted, updated or removed programs
+            are touched, others only get their dark flag fixed. """
+        # Position of every program in the new schedule
+        order = {}
+        for wd in range(7):
+            for item in self._sched_week[wd]:
+                order[item] = len(order)
+
+        def skip_removed(it, pos):
+            """ Remove rows which are not expected at pos or later """
+            while it and order.get(store[it][11], -1) < pos:
+                if not store.remove(it):
+                    return None
+            return it
+
+        def sync(it, item, dark):
+            """ Update row if its program or color changed """
+            if item in self._updated:
+                store[it] = self._tree_row(item, dark)
+            elif store[it][7] != dark:
+                store[it][7] = dark
+
+        parent = None
+        child = None
+        it = store.get_iter_first()
+        bg_dark = False
+        ch_dark = False
+        for item in order:
+            pos = order[item]
+            if item.is_main:
+                if parent:
+                    # Remove children left from the previous program
+                    skip_removed(child, len(order))
+                it = skip_removed(it, pos)
+                if it and store[it][11] is item:
+                    sync(it, item, bg_dark)
+                    parent = it
+                    it = store.iter_next(it)
+                else:
+                    parent = store.insert_before(None, it,
+                                                 self._tree_row(item, bg_dark))
+                child = store.iter_children(parent)
+                bg_dark = not bg_dark
+                ch_dark = bg_dark
+            elif not parent:
+                # Child before the first main program of the week
+                # is a top level row, like fill_tree_store makes it
+                it = skip_removed(it, pos)
+                if it and store[it][11] is item:
+                    sync(it, item, ch_dark)
+                    it = store.iter_next(it)
+                else:
+                    store.insert_before(None, it,
+                                        self._tree_row(item, ch_dark))
+                ch_dark = not ch_dark
+            else:
+                child = skip_removed(child, pos)
+                if child and store[child][11] is item:
+                    sync(child, item, ch_dark)
+                    child = store.iter_next(child)
+                else:
+                    store.insert_before(parent, child,
+                                        self._tree_row(item, ch_dark))
+                ch_dark = not ch_dark
+        # Remove what's left
+        if parent:
+            skip_removed(child, len(order))
+        skip_removed(it, len(order))
+        self._updated = set()
+
     def set_record_status(self, status, wd, time):
         """ Set recorder status """
-        for item in self._sched_week[wd]:
-            if not item["is_main"]:
-                continue
-            if item["time"] == time:
-                item["record"] = status
-                break
-        else:
-            logging("Program not found")
+        item = self._index.find(wd, parse_time(time.split("-")[0].strip()))
+        if not item:
+            logging.error("Program not found")
             return
+        item.record = status
         self._sched_write_to_file()
 
     def set_play_status(self, status, wd, time):
         """ Set playback flag """
-        for item in self._sched_week[wd]:
-            if not item["is_main"]:
-                continue
-            if item["time"] == time:
-                item["play"] = status
-                break
-        else:
-            logging("Program not found")
+        item = self._index.find(wd, parse_time(time.split("-")[0].strip()))
+        if not item:
+            logging.error("Program not found")
             return
+        item.play = status
         self._sched_write_to_file()
 
+    def get_event_at(self, dt):
+        """ Return program on air at datetime """
+        return self._index.event_at(dt)
+
+    def get_next_occurrence(self, title, dt=None):
+        """ Return (start datetime, program) of the next broadcast """
+        if dt is None:
+            dt = datetime.now(MSK())
+        return self._index.next_occurrence(title, dt)
+
+    def get_events_between(self, start, end):
+        """ Return [(start datetime, program)] on air between datetimes """
+        return list(self._index.range(start, end))
+
+    def get_event_period(self, dt=None):
+        """ Return (start, end) datetimes of program on air at datetime,
+            None if it isn't known """
+        if dt is None:
+            dt = datetime.now(MSK())
+        item = self._index.event_at(dt)
+        for start, x in self._index.range(dt, dt + timedelta(seconds=1)):
+            if x is item:
+                return program_period(start, x)
+        return None
+
+    def get_recordings(self, start, end):
+        """ Return [(title, start, end datetime)] of programs
+            to be recorded, on air between datetimes """
+        return [ (item.title,) + program_period(begin, item)
+                 for begin, item in self._index.range(start, end)
+                 if item.record ]
+
     def _sched_gen_daily_agenda(self):
         """ Create a list of main events for today """
         today = datetime.now(MSK())
         now = timedelta(hours=today.hour, minutes=today.minute,
                         seconds=today.second).total_seconds()
+        wd = today.weekday()
         position = 0
         self._sched_day = deque()
 
-        for it in reversed(self._sched_week[today.weekday() - 1]):
-            if not it["is_main"]:
-                continue
-            if it["is_merged"]:
-                if it["end"] > now:
-                    self._sched_day.append(it)
-                    self._sched_day[0]["position"] = position
-                position += 1
-            break
-
-        for item in self._sched_week[today.weekday()]:
-            if not item["is_main"]:
-                continue
-            else:
-                item["position"] = position
-                position += 1
-            if item["end"] <= now and not item["is_merged"]:
-                # Already ended. Skip
-                continue
-            self._sched_day.append(item)
+        # Yesterday's program might still be on
+        prev = self._index.merged_from(wd - 1)
+        if prev:
+            if prev.end > now:
+                prev.position = position
+                self._sched_day.append(prev)
+            position += 1
+
+        day = self._index.day(wd)
+        for item in day:
+            item.position = position
+            position += 1
+        # Skip already ended
+        self._sched_day.extend(day[self._index.first_not_ended(wd, now):])
 
     def _sched_load_from_file(self):
-        """ Load schedule from file """
-        with open(SCHED_FILE, "r") as f:
-            self._sched_week = json.load(f)
-        # Check integrity
-        self._SCHEDULE_ERROR = False
-        program = self._sched_week[0][0]
-        keys = ["weekday", "is_main", "is_merged", "time", "title", "url",
-                "host", "icon", "cover", "start", "end", "play", "record"]
-        for key in keys:
-            if key not in program.keys():
-                self._SCHEDULE_ERROR = True
-                break
+        """ Load schedule snapshot, return None on error """
+        try:
+            # Programs are decoded on first access
+            return read_snapshot(SCHED_FILE)
+        except (OSError, SnapshotError) as e:
+            logging.error("Couldn't load schedule: " + str(e))
+            return None
 
     def _sched_write_to_file(self):
         """ Save schedule on disk """
-        with open(SCHED_FILE, 'w') as f:
-            json.dump(self._sched_week, f)
-
-    def _sched_load_from_html(self):
-        """ Load schedule from site """
-        # Create session with fake user-agent
-        session = requests.Session()
-        session.headers["User-Agent"] = USER_AGENT
+        write_snapshot(SCHED_FILE, self._sched_week,
+                       self._cache.validators(SCHED_URL), self._created)
+
+    def _sched_migrate(self):
+        """ Convert JSON dump into snapshot """
+        try:
+            with open(SCHED_DUMP, "r") as f:
+                sched_week = json.load(f)
+            sched_week = [ [ Program.from_dict(x) for x in day ]
+                           for day in sched_week ]
+            write_snapshot(SCHED_FILE, sched_week,
+                           created=os.path.getmtime(SCHED_DUMP))
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            logging.error("Couldn't convert old schedule: " + str(e))
+        os.remove(SCHED_DUMP)
+
+    def _tree_row(self, item, dark):
+        """ Return TreeStore row of program.
+            Icons and colors are set by the tree when drawing """
+        # Program past midnight is shown next day too
+        merged_into = -1
+        if item.is_main and item.is_merged:
+            merged_into = (item.weekday + 1) % 7
+        return [item.weekday, item.is_main,
+                item.time, item.title, item.url, parse_hosts(item.host),
+                item.icon, dark, item.record, item.play, merged_into, item]
+
+    def _sched_load_from_html(self, task=None):
+        """ Load schedule from site, return None on error """
+        week = [ [] for x in range(7) ]
         # Default event icon
-        music_icon_name = ""
-        # Weekdays parser
-        wd_name_list = {"Вс" : [6], "Пн" : [0], "Вт" : [1], "Ср" : [2],
-                        "Чт" : [3], "Пт" : [4], "Сб" : [5],
-                        "По будням" : list(range(0,5)),
-                        "По выходным" : [5, 6]}
+        music_icon_src = ""
+        parser = ProgramListParser()
         try:
             # Download schedule
-            resp = session.get(SCHED_URL)
-            if resp.status_code != 200:
-                logging.error("Couldn't reach server. Code:", resp.status_code)
-                return False
-            # Get table
-            r = r'^.*<div\ class="program-list.*?(<tbody>.*?<\/tbody>).*$'
-            xhtml = re.sub(r, r'\1', resp.text)
-            # Handle unclosed img tags /* xhtml style */
-            xhtml = re.sub(r'(<img.*?"\s*)>', r'\1/>', xhtml)
-            xhtml = re.sub(r'<br>', r'<br/>', xhtml)
-            xhtml = re.sub(r'&nbsp;', r'', xhtml)
-            xhtml = re.sub(r'<!--.*?-->', r'', xhtml)
-            root = etree.fromstring(xhtml)
+            with self._cache.get(SCHED_URL) as resp:
+                if resp.status_code != 200:
+                    logging.error("Couldn't reach server. Code: {0}".format(
+                                  resp.status_code))
+                    return None
+                decoder = codecs.getincrementaldecoder(
+                                    resp.encoding or "utf-8")(errors="replace")
+                # Parse rows as soon as they are received
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    if task and task.cancelled:
+                        return None
+                    if parser.done:
+                        # Nothing to parse anymore, but the rest of
+                        # the page is still read: the cache stores
+                        # complete bodies only, and without it
+                        # the next refresh can't be a conditional one
+                        continue
+                    parser.feed(decoder.decode(chunk))
+                    for obj in parser.rows():
+                        title, icon_src = self._sched_parse_program(week,
+                                                                   obj)
+                        if title == MUSIC:
+                            music_icon_src = icon_src
 
         except requests.exceptions.RequestException as e:
             logging.error(str(e))
-            return False
+            return None
 
-        except ValueError as e:
+        if not parser.found:
             logging.error("Unexpected response")
-            logging.error(str(e))
-            return False
-
-        except etree.XMLSyntaxError as e:
-            logging.error("Syntax error")
-            logging.error(str(e))
-            return False
-
-        # Parse xhtml text
-        for obj in root:
-            # If time not presented
-            if not len(obj[3]):
-                # Event happens randomly or never
-                continue
-            # Get title
-            title = obj[1][0][0].text.strip()
-            # Event type
-            is_main = False
-            is_merged = False
-            # Get icon
-            icon_src = obj[0][0][0].attrib['src'].split("?")[0]
-            icon_name = self._get_icon(icon_src)
-            # Get program url
-            url = obj[1][0][0].attrib['href']
-            url = re.sub(r'^.*(/programms/.*?/).*$', r'\1', url)
-            url = SILVER_RAIN_URL + url
-            # Don't parse music. Just save icon location
-            if title == MUSIC:
-                music_icon_name = icon_name
-                continue
-            # Get hosts
-            host = []
-            if len(obj[2]):
-                # If hosts presented
-                for it in obj[2][0]:
-                    h = it[0][0].text.strip()
-                    h = h.split(' ')
-                    if len(h) == 2 :
-                        # Show name first
-                        h.insert(0, h.pop())
-                    h = ' '.join(h)
-                    host.append(h)
-            # Get schedule
-            # Expecting "WD: HH:MM - HH:MM" format
-            sched = []
-            sched_list = []
-            wd_list_prev = []
-
-            for it in obj[3][0]:
-                sched_list.append(it.text)
-                i = 0
-                while i < len(it) - 1:
-                    sched_list.append(it[i].tail)
-                    i += 1
-
-            for it in sched_list:
-                if not it:
-                    continue
-                # Remove extra comma
-                if it[-1] == ',' :
-                    it = it[:-1]
-                try:
-                    # Split wd and time
-                    weekday, time = it.split(': ')
-                    wd_list = parse_weekday(weekday)
-                    wd_list_prev = wd_list
-                except ValueError:
-                    # No weekday, use previous
-                    wd_list = wd_list_prev
-                    time = it
-
-                # Parse time
-                try:
-                    start, end = time.split('-')
-                except:
-                    continue
-                if start.strip() == "24:00":
-                    start = "00:00"
-                if end.strip() == "00:00":
-                    end = "24:00"
-
-                # Fix Mixtape
-                #XXX: This is ridiculous
-                # Maybe better try to retrieve schedule from the same source,
-                # the win version does.
-                if title == "Mixtape" and wd_list == [4] and \
-                   time.strip() == "04:00 - 05:00":
-                    wd_list = [5,6]
-                    start = "01:00"
-                    end = "05:00"
-
-                # Convert into seconds
-                start = parse_time(start.strip())
-                end = parse_time(end.strip())
-
-                # Fix cultur multur
-                if (title == "Культур-мультур weekend" or title == "Культур-мультур") and \
-                   (end <= start or end > start + 300):
-                    end = start + 300
-
-                # Calculate length
-                length = end - start
-                if length < 0:
-                    length = 86400 + length
-                    is_merged = True
-
-                if length >= 3000:
-                    # At least 50 minutes
-                    is_main = True
-                    # Round to hours
-                    #FIXME: That's rude, but I don't have time right now
-                    hrs, mins = divmod(length, 3600)
-                    if mins:
-                        start = start - start % 3600
-                        end = start + (hrs + 1) * 3600
-                        if is_merged:
-                            end -= 86400
-
-                # Convert into string
-                time = str_time(start, end)
-
-                #  Weekday number,
-                #  HH:MM,
-                #  start in seconds,
-                #  end in seconds
-                sched.append([ wd_list, time, start, end ])
-
-            # Insert
-            for it in sched:
-                for weekday in it[0]:
-                    program = {}
-                    program["weekday"] = SCHED_WEEKDAY_LIST[weekday]
-                    program["is_main"] = is_main
-                    program["is_merged"] = is_merged
-                    program["time"] = it[1]
-                    program["title"] = title
-                    program["url"] = url
-                    program["host"] = host
-                    program["icon"] = icon_name
-                    program["cover"] = ""
-                    program["start"] = it[2]
-                    program["end"] = it[3]
-                    program["play"] = False
-                    program["record"] = False
-                    self._sched_week[weekday].append(program)
-
+            logging.error("Program list not found")
+            return None
+
+        # Download icons
+        srcs = [ x.icon for wd in range(7) for x in week[wd] ]
+        icons = self._downloader.run(self._get_icon, srcs + [music_icon_src])
+        if task and task.cancelled:
+            return None
         for wd in range(7):
-            # Sort schedule by parent/start/end
-            self._sched_week[wd].sort(key = lambda x : (-x["is_main"], \
-                                                        x["start"], -x["end"]))
-            # Fix common errors
-            i = 1
-            while i < len(self._sched_week[wd]):
-                item = self._sched_week[wd][i]
-                prev = self._sched_week[wd][i-1]
-                next = {}
-
-                # Fix only main items
-                if not item["is_main"] :
-                    break
-
-                # Join duplicates
-                if (prev["end"] >= item["start"] and
-                        prev["title"] == item["title"]) :
-
-                    if prev["end"] > item["end"]:
-                        item["end"] = prev["end"]
-
-                    if prev["start"] < item["start"]:
-                        item["start"] = prev["start"]
-
-                    item["time"] = str_time(item["start"], item["end"])
-
-                    self._sched_week[wd][i] = item
-                    self._sched_week[wd].pop(i-1)
-                    continue
-
-                # Fix one main program inside another
-                elif (prev["end"] > item["start"] and
-                        prev["end"] >= item["end"]) :
-
-                    if (prev["end"] > item["end"]) :
-                        # Divide bigger one in two
-                        next = prev
-                        next["start"] = item["end"]
-                        next["time"] = str_time(next["start"], next["end"])
-                        self._sched_week[wd].insert(i+1, next)
-
-                    if (prev["start"] < item["start"]) :
-                        prev["end"] = item["start"]
-                        prev["time"] = str_time(prev["start"], prev["end"])
-                        self._sched_week[wd][i-1] = prev
-                    else :
-                        # Delete left one
-                        self._sched_week[wd].pop(i-1)
-                        i -= 1
-
-                    if len(next) : i += 1
+            for item in week[wd]:
+                item.icon = icons[item.icon]
+
+        return normalize_week(week, icons[music_icon_src])
+
+    def _sched_parse_program(self, week, obj):
+        """ Parse program row, add events to week schedule.
+            Return title and icon url """
+        title = ""
+        icon_src = ""
+        # If time not presented
+        if len(obj) < 4 or not len(obj[3]):
+            # Event happens randomly or never
+            return title, icon_src
+        # Get title
+        title = obj[1][0][0].text.strip()
+        # Event type
+        is_main = False
+        is_merged = False
+        # Get icon
+        icon_src = obj[0][0][0].attrib['src'].split("?")[0]
+        # Get program url
+        url = obj[1][0][0].attrib['href']
+        url = re.sub(r'^.*(/programms/.*?/).*$', r'\1', url)
+        url = SILVER_RAIN_URL + url
+        # Don't parse music. Just save icon location
+        if title == MUSIC:
+            return title, icon_src
+        # Get hosts
+        host = []
+        if len(obj[2]):
+            # If hosts presented
+            for it in obj[2][0]:
+                h = it[0][0].text.strip()
+                h = h.split(' ')
+                if len(h) == 2 :
+                    # Show name first
+                    h.insert(0, h.pop())
+                h = ' '.join(h)
+                host.append(h)
+        # Get schedule
+        # Expecting "WD: HH:MM - HH:MM" format
+        sched = []
+        sched_list = []
+        wd_list_prev = []
+
+        for it in obj[3][0]:
+            sched_list.append(it.text)
+            i = 0
+            while i < len(it) - 1:
+                sched_list.append(it[i].tail)
                 i += 1
 
-            # Sort schedule by start/parent
-            self._sched_week[wd].sort(key = lambda x : \
-                                      (x["start"], -x["is_main"]))
-
-            time = 0.0
-            last = {"end" : 0}
-
-            # Find first program
-            for it in reversed(self._sched_week[wd - 1]):
-                if it["is_main"]:
-                    if it["is_merged"]: time = it["end"]
-                    break
-
-            # Fill spaces with music
-            sched_week_with_music = []
-
-            for item in self._sched_week[wd]:
-                if not item["is_main"]:
-                    sched_week_with_music.append(item)
-                    continue
-                if item["start"] > time:
-                    # If doesn't start right after the previous one
-                    program = {}
-                    program["is_main"] = True
-                    program["is_merged"] = False
-                    program["title"] = MUSIC
-                    program["url"] = MUSIC_URL
-                    program["host"] = []
-                    program["icon"] = music_icon_name
-                    program["cover"] = ""
-                    program["weekday"] = SCHED_WEEKDAY_LIST[wd]
-                    program["time"] = str_time(time, item["start"])
-                    program["start"] = time
-                    program["end"] = item["start"]
-                    program["play"] = False
-                    program["record"] = False
-                    sched_week_with_music.append(program)
-                time = item["end"]
-                sched_week_with_music.append(item)
-                last = item
-            # Check if last event doesn't go till 24:00
-            if last["end"] < 86400.0 and not last["is_merged"]:
-                program = {}
-                program["is_main"] = True
-                program["is_merged"] = False
-                program["title"] = MUSIC
-                program["url"] = MUSIC_URL
-                program["host"] = []
-                program["icon"] = music_icon_name
-                program["cover"] = ""
-                program["weekday"] = SCHED_WEEKDAY_LIST[wd]
-                program["time"] = str_time(last["end"], 86400.0)
-                program["start"] = last["end"]
-                program["end"] = 86400.0
-                program["play"] = False
-                program["record"] = False
-                sched_week_with_music.append(program)
-            self._sched_week[wd] = sched_week_with_music
-            # Sort again
-            self._sched_week[wd].sort(key = lambda x : \
-                                         (x["start"], -x["is_main"], x["end"]))
-        # Save sched to file
-        self._sched_write_to_file()
-        return True
+        for it in sched_list:
+            if not it:
+                continue
+            # Remove extra comma
+            if it[-1] == ',' :
+                it = it[:-1]
+            try:
+                # Split wd and time
+                weekday, time = it.split(': ')
+                wd_list = parse_weekday(weekday)
+                wd_list_prev = wd_list
+            except ValueError:
+                # No weekday, use previous
+                wd_list = wd_list_prev
+                time = it
+
+            # Parse time
+            try:
+                start, end = time.split('-')
+            except:
+                continue
+            if start.strip() == "24:00":
+                start = "00:00"
+            if end.strip() == "00:00":
+                end = "24:00"
+
+            # Fix Mixtape
+            #XXX: This is ridiculous
+            # Maybe better try to retrieve schedule from the same source,
+            # the win version does.
+            if title == "Mixtape" and wd_list == [4] and \
+               time.strip() == "04:00 - 05:00":
+                wd_list = [5,6]
+                start = "01:00"
+                end = "05:00"
+
+            # Convert into seconds
+            start = parse_time(start.strip())
+            end = parse_time(end.strip())
+
+            # Fix cultur multur
+            if (title == "Культур-мультур weekend" or title == "Культур-мультур") and \
+               (end <= start or end > start + 300):
+                end = start + 300
+
+            # Calculate length
+            length = end - start
+            if length < 0:
+                length = 86400 + length
+                is_merged = True
+
+            if length >= 3000:
+                # At least 50 minutes
+                is_main = True
+                # Round to hours
+                #FIXME: That's rude, but I don't have time right now
+                hrs, mins = divmod(length, 3600)
+                if mins:
+                    start = start - start % 3600
+                    end = start + (hrs + 1) * 3600
+                    if is_merged:
+                        end -= 86400
+
+            #  Weekday number,
+            #  start in seconds,
+            #  end in seconds
+            sched.append([ wd_list, start, end ])
+
+        # Insert
+        for it in sched:
+            for weekday in it[0]:
+                program = Program(weekday, title, url, host, icon_src,
+                                  start=it[1], end=it[2], is_main=is_main,
+                                  is_merged=is_merged)
+                week[weekday].append(program)
+        return title, icon_src
 
     def _get_icon(self, src):
         """ Download icon from url """
@@ -707,32 +732,27 @@ class SilverSchedule():
             else:
                 # url/name.png
                 src = "http://" + src
-        name = IMG_DIR + src.split("/")[-1]
-        # Download icon if it doesn't exist
-        if not os.path.exists(name):
-            try:
-                urllib.request.urlretrieve(src, name)
-            except urllib.error.URLError as e:
-                err = "Couldn't download icon from url: " + src
-                logging.error(err)
-                logging.error(str(e))
-                name = ""
+        try:
+            name = self._images.get(src, max_age=IMG_MAX_AGE)
+        except requests.exceptions.RequestException as e:
+            logging.error("Couldn't download icon from url: " + src)
+            logging.error(str(e))
+            name = ""
         return name
 
     def _get_cover(self, program_page):
         """ Download program cover """
         name = ""
-        session = requests.Session()
-        session.headers["User-Agent"] = USER_AGENT
         try:
-            resp = session.get(program_page)
-            if resp.status_code != 200:
-                logging.error(f"Couldn't get url '{program_page}'"
-                               " Code: {resp.status_code}")
-                return name
+            with self._cache.get(program_page) as resp:
+                if resp.status_code != 200:
+                    logging.error(f"Couldn't get url '{program_page}'"
+                                  f" Code: {resp.status_code}")
+                    return name
+                text = resp.text
             # Get image src
             div = r'<div class="program-detail">.*?<div class="title".*?div>'
-            found = re.findall(div, resp.text)
+            found = re.findall(div, text)
             src = re.sub(r'.*<img src="([^\?"]+)\??.*?".*', r'\1', found[0])
             name = self._get_icon(src)
 
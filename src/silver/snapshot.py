@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import struct
+import time
+import zlib
+
+from silver.downloader import save_atomic
+from silver.program import Program
+
+__all__ = ["SnapshotError", "read_snapshot", "write_snapshot"]
+
+# Schedule snapshot file
+#
+# Header:
+#     magic               4s
+#     schema version      H
+#     created (unix time) d
+#     payload length      I
+#     payload crc32       I
+#     etag                H + utf-8
+#     last-modified       H + utf-8
+#
+# Payload:
+#     strings             I + (H + utf-8) * n
+#     hosts               I + (H + I * m) * n
+#     days                (I offset, I count) * 7
+#     records             RECORD * n
+#
+# Strings and host lists are stored once and referenced by index.
+# Records are fixed size, so a single day can be decoded
+# without touching the rest of the file.
+
+MAGIC = b"SRSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHdII")
+RECORD = struct.Struct("<BBIIIIIII")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+DAY = struct.Struct("<II")
+
+# Record flags
+IS_MAIN     = 0x1
+IS_MERGED   = 0x2
+RECORD_SET  = 0x4
+PLAY_SET    = 0x8
+
+class SnapshotError(ValueError):
+    """ Broken or unsupported snapshot """
+    pass
+
+class LazyWeek():
+    """ Week schedule decoding each day on first access """
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._days = [ None ] * 7
+
+    def __len__(self):
+        return 7
+
+    def __getitem__(self, wd):
+        wd %= 7
+        if self._days[wd] is None:
+            self._days[wd] = self._snapshot.day(wd)
+        return self._days[wd]
+
+    def __setitem__(self, wd, day):
+        self._days[wd % 7] = day
+
+    def __iter__(self):
+        for wd in range(7):
+            yield self[wd]
+
+class Snapshot():
+    """ Parsed snapshot """
+    def __init__(self, data):
+        try:
+            magic, version, created, length, crc = HEADER.unpack_from(data)
+        except struct.error:
+            raise SnapshotError("Truncated header")
+        if magic != MAGIC:
+            raise SnapshotError("Not a schedule snapshot")
+        if version != VERSION:
+            raise SnapshotError("Unsupported version {0}".format(version))
+        self.version = version
+        self.created = created
+        pos = HEADER.size
+        etag, pos = self._str(data, pos)
+        last_modified, pos = self._str(data, pos)
+        self.validators = (etag, last_modified)
+        payload = data[pos:]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise SnapshotError("Checksum mismatch")
+        # String and host tables
+        self._strings = []
+        count = self._u32(payload, 0)
+        pos = U32.size
+        for i in range(count):
+            s, pos = self._str(payload, pos)
+            self._strings.append(s)
+        self._hosts = []
+        count = self._u32(payload, pos)
+        pos += U32.size
+        try:
+            for i in range(count):
+                n = U16.unpack_from(payload, pos)[0]
+                pos += U16.size
+                ids = struct.unpack_from("<{0}I".format(n), payload, pos)
+                pos += U32.size * n
+                self._hosts.append(tuple(self._strings[x] for x in ids))
+            self._days = [ DAY.unpack_from(payload, pos + DAY.size * wd)
+                           for wd in range(7) ]
+        except (struct.error, IndexError):
+            raise SnapshotError("Broken tables")
+        self._records = memoryview(payload)[pos + DAY.size * 7:]
+        for offset, count in self._days:
+            if offset + count * RECORD.size > len(self._records):
+                raise SnapshotError("Truncated records")
+
+    def week(self):
+        """ Return lazily decoded week """
+        return LazyWeek(self)
+
+    def day(self, wd):
+        """ Decode programs of a single weekday """
+        offset, count = self._days[wd]
+        day = []
+        s = self._strings
+        for rec in RECORD.iter_unpack(self._records[offset:offset +
+                                      count * RECORD.size]):
+            weekday, flags, title, url, host, icon, cover, start, end = rec
+            day.append(Program(weekday, s[title], s[url], self._hosts[host],
+                               s[icon], s[cover],
+                               start=float(start), end=float(end),
+                               is_main=bool(flags & IS_MAIN),
+                               is_merged=bool(flags & IS_MERGED),
+                               record=bool(flags & RECORD_SET),
+                               play=bool(flags & PLAY_SET)))
+        return day
+
+    @staticmethod
+    def _u32(data, pos):
+        try:
+            return U32.unpack_from(data, pos)[0]
+        except struct.error:
+            raise SnapshotError("Truncated snapshot")
+
+    @staticmethod
+    def _str(data, pos):
+        try:
+            n = U16.unpack_from(data, pos)[0]
+            pos += U16.size
+            s = bytes(data[pos:pos + n]).decode("utf-8")
+        except (struct.error, UnicodeDecodeError):
+            raise SnapshotError("Broken string")
+        if len(s.encode("utf-8")) != n:
+            raise SnapshotError("Truncated string")
+        return s, pos + n
+
+def _pack_str(s):
+    b = s.encode("utf-8")
+    return U16.pack(len(b)) + b
+
+def read_snapshot(name):
+    """ Read snapshot file """
+    with open(name, "rb") as f:
+        data = f.read()
+    return Snapshot(data)
+
+def write_snapshot(name, week, validators=("", ""), created=None):
+    """ Save week schedule retrieved at created (now by default) """
+    strings = {}
+    hosts = {}
+    def sid(s):
+        return strings.setdefault(s, len(strings))
+    def hid(h):
+        if h not in hosts:
+            hosts[h] = (len(hosts), [ sid(x) for x in h ])
+        return hosts[h][0]
+
+    records = []
+    days = []
+    for wd in range(7):
+        days.append(DAY.pack(len(records) * RECORD.size, len(week[wd])))
+        for item in week[wd]:
+            flags = ((IS_MAIN if item.is_main else 0) |
+                     (IS_MERGED if item.is_merged else 0) |
+                     (RECORD_SET if item.record else 0) |
+                     (PLAY_SET if item.play else 0))
+            records.append(RECORD.pack(item.weekday, flags, sid(item.title),
+                                       sid(item.url), hid(item.host),
+                                       sid(item.icon), sid(item.cover),
+                                       int(item.start), int(item.end)))
+
+    payload = [ U32.pack(len(strings)) ]
+    payload += [ _pack_str(s) for s in strings ]
+    payload.append(U32.pack(len(hosts)))
+    for i, ids in hosts.values():
+        payload.append(U16.pack(len(ids)) +
+                       struct.pack("<{0}I".format(len(ids)), *ids))
+    payload += days
+    payload += records
+    payload = b"".join(payload)
+
+    if created is None:
+        created = time.time()
+    header = HEADER.pack(MAGIC, VERSION, created, len(payload),
+                         zlib.crc32(payload))
+    header += _pack_str(validators[0]) + _pack_str(validators[1])
+    save_atomic(name, [header, payload])
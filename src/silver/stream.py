@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import GObject, Gst
+import itertools
+import logging
+import random
+import time
+
+import silver.config as config
+from silver.mirrors import preferred_url
+
+__all__ = ["RECONNECTING", "STREAMING", "StreamSource", "make_branch"]
+
+# Connection states
+IDLE            = "idle"
+CONNECTING      = "connecting"
+STREAMING       = "streaming"
+RECONNECTING    = "reconnecting"
+
+# Reconnect delay is random between 0 and BACKOFF * 2^attempt seconds
+RECONNECT_BACKOFF   = 1
+RECONNECT_MAX       = 60
+
+# Suffix of branch names. Removing a branch from the pipeline
+# takes a while, a new one can't reuse its name until then.
+_branch_ids = itertools.count()
+
+def make_branch(name, elements):
+    """ Create bin of elements [(factory, name)].
+        Bin sink pad is the sink of the first element.
+        Return (bin, {name : element}) or (None, error message).
+        Elements are added, not linked. """
+    bin = Gst.Bin.new("{0}{1}".format(name, next(_branch_ids)))
+    el = {}
+    for factory, el_name in elements:
+        try:
+            el[el_name] = Gst.ElementFactory.make(factory, el_name)
+        except Gst.ElementNotFoundError as e:
+            logging.error(str(e))
+            el[el_name] = None
+        if not el[el_name]:
+            return None, "Couldn't create GStreamer element: " + factory
+        bin.add(el[el_name])
+    first = el[elements[0][1]]
+    bin.add_pad(Gst.GhostPad.new("sink", first.get_static_pad("sink")))
+    return bin, el
+
+class StreamSource():
+    """ Network stream shared by player and recorder
+
+        souphttpsrc -> tee -> branch
+                           -> branch
+                           ...
+
+        Every branch is a bin starting with a queue, so branches
+        don't block each other, and can be attached or detached
+        while the others keep running. The connection is open only
+        while at least one branch is attached.
+
+        Unless location is set explicitly, the configured stream is
+        played from the fastest mirror, chosen on every (re)connect.
+
+        Connection errors and end of stream don't reach the branches.
+        The pipeline is restarted with growing delay until data flows
+        again, state_func(state, lost) is told when the stream is lost
+        (RECONNECTING) and when it's back (STREAMING, lost seconds). """
+
+    __name__ = "SilverStream"
+
+    def __init__(self, state_func=None):
+        self._branches = {}
+        self._state_callback = state_func
+        self._state = IDLE
+        self._attempt = 0
+        self._lost_at = 0
+        self._retry_id = None
+        self._error = None
+        self._location = None
+        self._pipe = Gst.Pipeline.new(self.__name__)
+        try:
+            self._source = Gst.ElementFactory.make("souphttpsrc", "source")
+            self._tee = Gst.ElementFactory.make("tee", "tee")
+        except Gst.ElementNotFoundError as e:
+            logging.error(str(e))
+            self._source = self._tee = None
+        if not self._pipe or not self._source or not self._tee:
+            self._error = "Couldn't create pipeline"
+            return
+        self._source.set_property("is-live", True)
+        self._source.set_property("compress", True)
+        # Keep streaming while a branch is being detached
+        self._tee.set_property("allow-not-linked", True)
+        self._pipe.add(self._source)
+        self._pipe.add(self._tee)
+        if not self._source.link(self._tee):
+            self._error = "Elements could not be linked"
+            return
+        self.reset_connection_settings()
+        # Create message bus
+        self._bus = self._pipe.get_bus()
+        self._bus.add_signal_watch()
+        self._bus.connect("message::eos", self._on_eos)
+        self._bus.connect("message::error", self._on_error)
+        self._bus.connect("message::buffering", self._on_buffering)
+
+    def attach(self, branch, err_func, buffering_func=None):
+        """ Link branch to the stream, start streaming if needed.
+            err_func(type, msg) is called on errors of the branch,
+            buffering_func(percent, rate) on its buffering messages. """
+        if self._error:
+            err_func("error", self._error)
+            return False
+        try:
+            self._pipe.add(branch)
+        except Gst.AddError as e:
+            logging.error(str(e))
+            err_func("error", "Couldn't add branch to pipeline")
+            return False
+        pad = self._tee.get_request_pad("src_%u")
+        if pad.link(branch.get_static_pad("sink")) != Gst.PadLinkReturn.OK:
+            self._pipe.remove(branch)
+            self._tee.release_request_pad(pad)
+            err_func("error", "Elements could not be linked")
+            return False
+        self._branches[branch] = (pad, err_func, buffering_func)
+        if self._state == RECONNECTING:
+            # Started along with the others
+            return True
+        if self._pipe.get_state(0)[1] == Gst.State.PLAYING:
+            branch.sync_state_with_parent()
+        elif not self._connect():
+            self.detach(branch)
+            err_func("error", "Couldn't change state on pipeline")
+            return False
+        return True
+
+    def detach(self, branch):
+        """ Unlink branch, close connection if it was the last one """
+        if branch not in self._branches:
+            return
+        pad = self._branches.pop(branch)[0]
+        if not self._branches:
+            self._cancel_retry()
+
+        def remove():
+            branch.set_state(Gst.State.NULL)
+            self._pipe.remove(branch)
+            self._tee.release_request_pad(pad)
+            if not self._branches:
+                self._state = IDLE
+                self._pipe.set_state(Gst.State.READY)
+            return False
+
+        def on_idle(pad, info):
+            # Streaming thread
+            pad.unlink(branch.get_static_pad("sink"))
+            GObject.idle_add(remove)
+            return Gst.PadProbeReturn.REMOVE
+
+        # Called right away if no buffer is being pushed to the branch,
+        # otherwise once it's through
+        pad.add_probe(Gst.PadProbeType.IDLE, on_idle)
+
+    @property
+    def state(self):
+        """ Connection state """
+        return self._state
+
+    @property
+    def attached(self):
+        """ Number of attached branches """
+        return len(self._branches)
+
+    @property
+    def location(self):
+        """ Stream url used on the next connect """
+        return self._location or preferred_url(config.stream_url)
+
+    def set_location(self, location):
+        """ Change stream url, None to follow config """
+        self._location = location
+        if not self._error:
+            self._source.set_property("location", self.location)
+
+    def reset_connection_settings(self):
+        """ Apply stream url and proxy from config """
+        if self._error:
+            return
+        self.set_location(None)
+        if config.proxy_required:
+            self._source.set_property("proxy", config.proxy_uri)
+            self._source.set_property("proxy-id", config.proxy_id)
+            self._source.set_property("proxy-pw", config.proxy_pw)
+        else:
+            self._source.set_property("proxy", "")
+            self._source.set_property("proxy-id", "")
+            self._source.set_property("proxy-pw", "")
+
+    def clean(self):
+        """ Unref pipeline """
+        self._cancel_retry()
+        self._branches = {}
+        self._state = IDLE
+        if self._pipe:
+            self._pipe.set_state(Gst.State.NULL)
+
+    def _connect(self):
+        """ Start pipeline, wait for the first buffer """
+        if self._state != RECONNECTING:
+            self._state = CONNECTING
+        # Mirror ranking might have changed
+        self._source.set_property("location", self.location)
+
+        def on_buffer(pad, info):
+            # Streaming thread
+            GObject.idle_add(self._on_streaming)
+            return Gst.PadProbeReturn.REMOVE
+
+        self._source.get_static_pad("src").add_probe(
+                                        Gst.PadProbeType.BUFFER, on_buffer)
+        return self._pipe.set_state(Gst.State.PLAYING) != \
+               Gst.StateChangeReturn.FAILURE
+
+    def _reconnect(self):
+        """ Stream is lost, restart it later """
+        if self._state == IDLE or self._retry_id:
+            return
+        if self._state != RECONNECTING:
+            self._state = RECONNECTING
+            self._lost_at = time.monotonic()
+            self._attempt = 0
+            if self._state_callback:
+                self._state_callback(RECONNECTING, 0)
+        self._pipe.set_state(Gst.State.READY)
+        delay = random.uniform(0, min(RECONNECT_MAX,
+                                      RECONNECT_BACKOFF * 2 ** self._attempt))
+        self._attempt += 1
+        logging.warning("Stream lost, reconnecting in {0:.1f}s "
+                        "(attempt {1})".format(delay, self._attempt))
+        self._retry_id = GObject.timeout_add(int(delay * 1000), self._retry)
+
+    def _retry(self):
+        self._retry_id = None
+        if self._branches and not self._connect():
+            self._reconnect()
+        return False
+
+    def _cancel_retry(self):
+        if self._retry_id:
+            GObject.source_remove(self._retry_id)
+            self._retry_id = None
+
+    def _on_streaming(self):
+        """ First buffer received """
+        if self._state == RECONNECTING:
+            lost = time.monotonic() - self._lost_at
+            logging.info("Stream is back after {0:.1f}s".format(lost))
+            self._state = STREAMING
+            if self._state_callback:
+                self._state_callback(STREAMING, lost)
+        elif self._state == CONNECTING:
+            self._state = STREAMING
+        return False
+
+    def _owner(self, msg):
+        """ Return (err_func, buffering_func) of the branch
+            which posted message, None if it's the source """
+        for branch, callbacks in self._branches.items():
+            if msg.src is branch or msg.src.has_as_ancestor(branch):
+                return callbacks[1:]
+        return None
+
+    def _on_eos(self, bus, msg):
+        # Server closed connection
+        self._reconnect()
+
+    def _on_error(self, bus, msg):
+        err, dbg = msg.parse_error()
+        logging.error(dbg)
+        owner = self._owner(msg)
+        if owner:
+            owner[0]("error", str(err))
+        else:
+            self._reconnect()
+
+    def _on_buffering(self, bus, msg):
+        owner = self._owner(msg)
+        if owner and owner[1]:
+            mode, rate_in, rate_out, left = msg.parse_buffering_stats()
+            owner[1](msg.parse_buffering(), rate_in)
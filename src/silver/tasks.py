@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import GObject
+from collections import deque
+import logging
+import queue
+import threading
+import time
+
+__all__ = ["TaskRunner"]
+
+# Main loop time spent on results per idle call in seconds
+SLICE = 0.01
+
+# Queue messages
+PROGRESS = 0
+DONE = 1
+ERROR = 2
+
+class Task():
+    """ Background task handle passed to the worker function """
+    def __init__(self, runner, name, done, progress, error):
+        self.name = name
+        self._runner = runner
+        self._cancelled = threading.Event()
+        self._handlers = { DONE : done, PROGRESS : progress, ERROR : error }
+
+    @property
+    def cancelled(self):
+        """ True if task was cancelled or superseded """
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """ Drop results, worker should stop as soon as it can """
+        self._cancelled.set()
+
+    def progress(self, *args):
+        """ Report progress, thread-safe """
+        self._runner._post(PROGRESS, self, args)
+
+class TaskRunner():
+    """ Run functions in worker threads
+
+        Workers never touch GTK. Results and progress reports are
+        queued and handled by the main loop, SLICE seconds at most
+        per idle call. A handler doing a lot of work can be a
+        generator: it's resumed step by step, one yield to another,
+        and nothing else is handled until it's finished.
+        Running a task with the name of a running one cancels
+        the older task. """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._steps = deque()
+        self._scheduled = False
+
+    def run(self, name, func, done=None, progress=None, error=None):
+        """ Call func(task) in a worker thread.
+            done(result), progress(*args) and error(exception)
+            are called in the main loop. """
+        task = Task(self, name, done, progress, error)
+        with self._lock:
+            old = self._tasks.get(name)
+            if old:
+                logging.debug("Task {0}: superseded".format(name))
+                old.cancel()
+            self._tasks[name] = task
+        t = threading.Thread(target=self._worker, args=(task, func),
+                             daemon=True)
+        t.start()
+        return task
+
+    def cancel(self, name):
+        """ Cancel running task """
+        with self._lock:
+            task = self._tasks.pop(name, None)
+        if task:
+            task.cancel()
+
+    def _worker(self, task, func):
+        start = time.monotonic()
+        try:
+            self._post(DONE, task, (func(task),))
+        except Exception as e:
+            logging.exception("Task {0} failed".format(task.name))
+            self._post(ERROR, task, (e,))
+        logging.debug("Task {0}: {1:.3f}s{2}".format(
+                      task.name, time.monotonic() - start,
+                      " (cancelled)" if task.cancelled else ""))
+
+    def _post(self, kind, task, args):
+        """ Queue message, wake up main loop """
+        self._queue.put((kind, task, args))
+        with self._lock:
+            if not self._scheduled:
+                self._scheduled = True
+                GObject.idle_add(self._dispatch)
+
+    def _dispatch(self):
+        """ Handle queued messages for SLICE seconds """
+        deadline = time.monotonic() + SLICE
+        while time.monotonic() < deadline:
+            if self._steps:
+                self._step()
+                continue
+            try:
+                kind, task, args = self._queue.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._scheduled = False
+                        return False
+                continue
+            if task.cancelled:
+                continue
+            if kind != PROGRESS:
+                with self._lock:
+                    if self._tasks.get(task.name) is task:
+                        del self._tasks[task.name]
+            handler = task._handlers[kind]
+            if not handler:
+                continue
+            try:
+                result = handler(*args)
+            except Exception:
+                # Keep handling the others
+                logging.exception("Task {0}: handler failed".format(
+                                  task.name))
+                continue
+            if hasattr(result, "send"):
+                self._steps.append((task, result))
+        # Let the main loop breathe, continue next time
+        return True
+
+    def _step(self):
+        """ Resume the first generator handler """
+        task, steps = self._steps[0]
+        try:
+            next(steps)
+        except StopIteration:
+            self._steps.popleft()
+        except Exception:
+            self._steps.popleft()
+            logging.exception("Task {0}: handler failed".format(task.name))
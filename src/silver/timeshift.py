@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from gi.repository import Gst
+import logging
+import threading
+import time
+
+from silver.ringfile import RingFile
+from silver.stream import make_branch
+
+__all__ = ["RingFile", "TimeShift"]
+
+# Ring file size per minute of time-shift, enough for 320 kbps
+BYTES_PER_MINUTE = 60 * 40000
+# appsrc queue, small enough to keep read position close to what's heard
+CHUNK = 4096
+QUEUE_SIZE = 16 * CHUNK
+
+class TimeShift():
+    """ Pause and rewind live stream
+
+        tee -> queue -> icydemux -> appsink -> ring file
+        ring file -> appsrc -> decodebin -> audioconvert -> volume
+                  -> autoaudiosink
+
+        The branch keeps filling the ring file while playback reads
+        it from its own position, paused or behind live. """
+
+    __name__ = "SilverTimeShift"
+
+    def __init__(self, path, minutes, err_func):
+        self.paused = False
+        self._ring = RingFile(path, minutes * BYTES_PER_MINUTE)
+        self._error_callback = err_func
+        self._lock = threading.RLock()
+        self._pos = 0
+        self._wanted = False
+        self._pipe = None
+
+    def make_branch(self):
+        """ Return (bin, error message) of the ring writer branch """
+        bin, el = make_branch(self.__name__,
+                              [ ("queue",    "queue"),
+                                ("icydemux", "demux"),
+                                ("appsink",  "sink") ])
+        if not bin:
+            return None, el
+        el["queue"].set_property("leaky", 2)
+        el["sink"].set_property("emit-signals", True)
+        el["sink"].set_property("sync", False)
+        el["sink"].connect("new-sample", self._on_new_sample)
+
+        def on_pad_added(demux, pad):
+            if not pad.is_linked():
+                return pad.link(el["sink"].get_static_pad("sink"))
+        el["demux"].connect("pad-added", on_pad_added)
+        if not Gst.Element.link(el["queue"], el["demux"]):
+            return None, "Elements could not be linked"
+        return bin, None
+
+    def start(self, volume):
+        """ Start playback from live, volume [0-1].
+            Return error message or None. """
+        self._pipe = Gst.Pipeline.new(self.__name__ + "Playback")
+        el = dict()
+        for factory, name in [ ("appsrc",        "source"),
+                               ("decodebin",     "decode"),
+                               ("audioconvert",  "convert"),
+                               ("volume",        "volume"),
+                               ("autoaudiosink", "sink") ]:
+            try:
+                el[name] = Gst.ElementFactory.make(factory, name)
+            except Gst.ElementNotFoundError as e:
+                logging.error(str(e))
+                el[name] = None
+            if not el[name]:
+                return "Couldn't create GStreamer element: " + factory
+            self._pipe.add(el[name])
+        el["source"].set_property("max-bytes", QUEUE_SIZE)
+        el["source"].connect("need-data", self._on_need_data)
+        el["source"].connect("enough-data", self._on_enough_data)
+        el["volume"].set_property("volume", volume)
+
+        def on_pad_added(decode, pad):
+            if not pad.is_linked():
+                return pad.link(el["convert"].get_static_pad("sink"))
+        el["decode"].connect("pad-added", on_pad_added)
+        if (not Gst.Element.link(el["source"], el["decode"]) or
+            not Gst.Element.link(el["convert"], el["volume"]) or
+            not Gst.Element.link(el["volume"], el["sink"])):
+            return "Elements could not be linked"
+
+        bus = self._pipe.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message::error", self._on_error)
+        self._pos = self._ring.written
+        self.paused = False
+        return self._set_state(Gst.State.PLAYING)
+
+    def stop(self):
+        """ Stop playback, drop buffered stream """
+        if self._pipe:
+            self._pipe.get_bus().remove_signal_watch()
+            self._pipe.set_state(Gst.State.NULL)
+            self._pipe = None
+        self._ring.close()
+
+    def set_volume(self, volume):
+        """ Set playback volume [0-1] """
+        if self._pipe:
+            self._pipe.get_by_name("volume").set_property("volume", volume)
+
+    def pause(self):
+        """ Pause playback, keep buffering """
+        self.paused = True
+        return self._set_state(Gst.State.PAUSED)
+
+    def resume(self):
+        """ Continue from where it was paused """
+        self.paused = False
+        return self._set_state(Gst.State.PLAYING)
+
+    @property
+    def delay(self):
+        """ Seconds behind live """
+        with self._lock:
+            pos = self._pos
+        if pos >= self._ring.written:
+            return 0.
+        return max(0., time.monotonic() - self._ring.time_at(pos))
+
+    @property
+    def available(self):
+        """ Seconds of stream kept in the ring """
+        return max(0., time.monotonic() -
+                       self._ring.time_at(self._ring.oldest))
+
+    def seek(self, delay):
+        """ Play from delay seconds behind live, 0 is live """
+        pos = self._ring.offset_at(time.monotonic() - max(0., delay))
+        with self._lock:
+            self._pos = max(pos, self._ring.oldest)
+            self._wanted = False
+        # Flush what's queued and restart decoder at the new position
+        self._set_state(Gst.State.READY)
+        return self._set_state(Gst.State.PAUSED if self.paused else
+                               Gst.State.PLAYING)
+
+    def _set_state(self, state):
+        if not self._pipe:
+            return None
+        if self._pipe.set_state(state) == Gst.StateChangeReturn.FAILURE:
+            return "Couldn't change state on pipeline"
+        return None
+
+    def _feed(self):
+        """ Push ring data to playback """
+        # Writer and playback streaming threads
+        with self._lock:
+            # enough-data is emitted while pushing
+            while self._wanted and self._pipe:
+                pos, data = self._ring.read(self._pos, CHUNK)
+                if not data:
+                    # Caught up with live, wait for the writer
+                    return
+                self._pos = pos + len(data)
+                src = self._pipe.get_by_name("source")
+                src.emit("push-buffer", Gst.Buffer.new_wrapped(data))
+
+    def _on_new_sample(self, sink):
+        sample = sink.emit("pull-sample")
+        buf = sample.get_buffer()
+        self._ring.write(buf.extract_dup(0, buf.get_size()))
+        self._feed()
+        return Gst.FlowReturn.OK
+
+    def _on_need_data(self, src, length):
+        self._wanted = True
+        self._feed()
+
+    def _on_enough_data(self, src):
+        self._wanted = False
+
+    def _on_error(self, bus, msg):
+        err, dbg = msg.parse_error()
+        logging.error(dbg)
+        self._error_callback("error", str(err))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Local HTTP server for tests and benchmarks.
+# Handlers decide how badly it behaves.
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import contextlib
+import socket
+import struct
+import threading
+import time
+
+# MPEG-1 Layer III, 128 kbit/s, 44100 Hz, no padding, no CRC.
+# Frame number is written after the side info.
+MP3_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+MP3_FRAME_TIME = 1152 / 44100
+
+@contextlib.contextmanager
+def serve(handler):
+    """ Serve handler class on a free local port, yield base url """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{0}".format(httpd.server_address[1])
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+def closed_port():
+    """ Return url nothing listens at """
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return "http://127.0.0.1:{0}".format(port)
+
+def mp3_frame(n):
+    """ Return silent MP3 frame number n """
+    return MP3_HEADER + bytes(32) + struct.pack(">I", n) + \
+           bytes(MP3_FRAME_SIZE - 40)
+
+def mp3_frames(data):
+    """ Return numbers of frames in data """
+    start = data.find(MP3_HEADER)
+    nums = []
+    for i in range(start, len(data) - MP3_FRAME_SIZE + 1, MP3_FRAME_SIZE):
+        assert data[i:i + 4] == MP3_HEADER
+        nums.append(struct.unpack(">I", data[i + 36:i + 40])[0])
+    return nums
+
+class MP3Handler(BaseHTTPRequestHandler):
+    """ Numbered frames sent in real time, endless stream
+        unless frames is set """
+    frames = None
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.end_headers()
+        self.stream(self.frames)
+
+    def stream(self, count=None):
+        """ Send count frames, until client is gone if count is None """
+        n = 0
+        next_frame = time.monotonic()
+        try:
+            while count is None or n < count:
+                self.wfile.write(mp3_frame(n))
+                n += 1
+                next_frame += MP3_FRAME_TIME
+                time.sleep(max(0, next_frame - time.monotonic()))
+        except OSError:
+            # Client is gone
+            pass
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Import silver from the source tree.
+# silver/globals.py is generated by configure, if the tree isn't
+# configured it's built from globals.py.in here the same way.
+# HOME is moved to a temporary directory first, so nothing
+# touches the real ~/.silver
+
+import os
+import sys
+import tempfile
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+def setup():
+    """ Make silver importable, return temporary HOME """
+    if "silver.globals" in sys.modules:
+        return os.environ["HOME"]
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="silver-test-")
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    import silver
+    try:
+        import silver.globals
+    except ImportError:
+        path = os.path.join(SRC, "silver", "globals.py.in")
+        with open(path, "r") as f:
+            source = f.read().replace("@VERSION@", "test")
+        module = types.ModuleType("silver.globals")
+        module.__file__ = path
+        exec(compile(source, path, "exec"), module.__dict__)
+        sys.modules["silver.globals"] = module
+        silver.globals = module
+    return os.environ["HOME"]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import pytest
+
+import silver.bitrate as bitrate
+from silver.bitrate import DOWN
+from silver.bitrate import SLOW_TIME
+from silver.bitrate import UP
+from silver.bitrate import UP_TIME
+from silver.bitrate import UP_TIME_MAX
+from silver.bitrate import BitrateMonitor
+from silver.bitrate import bitrate_of
+from silver.bitrate import stream_variant
+from silver.globals import STREAM_URL_LIST
+
+# 128 kbps in bytes per second
+RATE = 16000
+
+class Clock():
+    """ Monotonic clock moved by hand """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(bitrate, "time", clock)
+    return clock
+
+def feed(monitor, clock, seconds, percent=100, rate=RATE, higher=True):
+    """ Report once a second, return the first decision """
+    for i in range(seconds):
+        clock.now += 1
+        direction = monitor.update(percent, rate, RATE, higher)
+        if direction:
+            return direction
+    return None
+
+def test_variants():
+    hi, lo = STREAM_URL_LIST[0], STREAM_URL_LIST[1]
+    assert bitrate_of(hi) == RATE
+    assert bitrate_of("http://unknown/") == 0
+    assert stream_variant(hi, DOWN) == lo
+    assert stream_variant(lo, UP) == hi
+    assert stream_variant(hi, UP) is None
+    assert stream_variant(lo, DOWN) is None
+    # Never another server
+    assert stream_variant(STREAM_URL_LIST[2], DOWN) == STREAM_URL_LIST[3]
+    assert stream_variant("http://unknown/", DOWN) is None
+
+def test_underruns(clock):
+    monitor = BitrateMonitor()
+    for i in range(2):
+        assert monitor.update(0, RATE, RATE) is None
+        # Still the same underrun
+        clock.now += 1
+        assert monitor.update(5, RATE, RATE) is None
+        clock.now += 1
+        assert monitor.update(100, RATE, RATE) is None
+    clock.now += 1
+    assert monitor.update(0, RATE, RATE) == DOWN
+
+def test_old_underruns_forgotten(clock):
+    monitor = BitrateMonitor()
+    for i in range(5):
+        assert monitor.update(0, RATE, RATE) is None
+        clock.now += 1
+        assert monitor.update(100, RATE, RATE) is None
+        clock.now += 40
+
+def test_slow(clock):
+    monitor = BitrateMonitor()
+    # Slow since the first report
+    assert feed(monitor, clock, SLOW_TIME, rate=RATE * 0.8) is None
+    assert feed(monitor, clock, 1, rate=RATE * 0.8) == DOWN
+    # Any fast enough report starts over
+    monitor = BitrateMonitor()
+    assert feed(monitor, clock, 15, rate=RATE * 0.8) is None
+    assert feed(monitor, clock, 1) is None
+    assert feed(monitor, clock, 15, rate=RATE * 0.8) is None
+    # Unknown rate isn't slow
+    assert feed(monitor, clock, 30, rate=0, higher=False) is None
+
+def test_up_after_quiet_period(clock):
+    monitor = BitrateMonitor()
+    assert feed(monitor, clock, UP_TIME - 1) is None
+    assert feed(monitor, clock, 1) == UP
+    # Nothing better
+    monitor = BitrateMonitor()
+    assert feed(monitor, clock, UP_TIME * 2, higher=False) is None
+
+def test_failed_up_backs_off(clock):
+    monitor = BitrateMonitor()
+    assert feed(monitor, clock, UP_TIME) == UP
+    up_time = UP_TIME
+    while up_time < UP_TIME_MAX:
+        # Higher bitrate can't keep up
+        assert feed(monitor, clock, SLOW_TIME + 1, rate=RATE // 2) == DOWN
+        up_time = min(up_time * 2, UP_TIME_MAX)
+        assert feed(monitor, clock, up_time - 1) is None
+        assert feed(monitor, clock, 1) == UP
+
+def test_late_down_is_not_failed_up(clock):
+    monitor = BitrateMonitor()
+    assert feed(monitor, clock, UP_TIME) == UP
+    # Fine for a while
+    assert feed(monitor, clock, UP_TIME, higher=False) is None
+    assert feed(monitor, clock, SLOW_TIME + 1, rate=RATE // 2,
+                higher=False) == DOWN
+    assert feed(monitor, clock, UP_TIME - 1) is None
+    assert feed(monitor, clock, 1) == UP
+
+def test_reset(clock):
+    monitor = BitrateMonitor()
+    monitor.update(0, RATE, RATE)
+    clock.now += 1
+    monitor.update(100, RATE, RATE)
+    clock.now += 1
+    monitor.update(0, RATE, RATE)
+    monitor.reset()
+    clock.now += 1
+    assert monitor.update(0, RATE, RATE) is None
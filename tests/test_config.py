@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import configparser
+import os
+
+import silver.config as config
+from silver.globals import CONFIG_FILE
+
+def read_config():
+    cfg = configparser.ConfigParser()
+    cfg.read(CONFIG_FILE)
+    return cfg
+
+def test_probed_fonts_not_saved():
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    if os.path.exists(CONFIG_FILE):
+        os.remove(CONFIG_FILE)
+    config.setup()
+    cfg = read_config()
+    assert cfg.get("APPEARANCE", "font") == ""
+    assert cfg.get("APPEARANCE", "selectedfont") == ""
+    # Resolved on access
+    assert config.font == ""
+    assert config.get_font() == config.Default.font
+    config._load()
+    assert config.selected_font == ""
+    assert config.get_selected_font() == config.Default.selected_font
+
+def test_user_font_kept():
+    config.setup()
+    config.font = "Serif 12"
+    config.save()
+    config._load()
+    assert config.get_font() == "Serif 12"
+    assert read_config().get("APPEARANCE", "font") == "Serif 12"
+    assert read_config().get("APPEARANCE", "selectedfont") == ""
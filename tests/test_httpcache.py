@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import json
+import os
+
+from silver.httpcache import HTTPCache, INDEX_FILE
+
+class FakeResponse():
+    """ Minimal streamed requests.Response """
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.encoding = "utf-8"
+        self.headers = headers or {}
+        self.closed = False
+        self._body = body
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+class FakeSession():
+    """ Serve one body with ETag validation """
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.requests += 1
+        if headers and headers.get("If-None-Match") == "tag":
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, { "ETag" : "tag" })
+
+def index(path):
+    with open(os.path.join(path, INDEX_FILE)) as f:
+        return json.load(f)
+
+def test_index_written_on_flush(tmp_path):
+    cache = HTTPCache(str(tmp_path), FakeSession(b"x" * 1000))
+    assert cache.get("http://a/").content == b"x" * 1000
+    assert not os.path.exists(os.path.join(str(tmp_path), INDEX_FILE))
+    cache.flush()
+    mtime = os.stat(os.path.join(str(tmp_path), INDEX_FILE)).st_mtime_ns
+    # Hit marks index dirty, doesn't write it
+    with cache.get("http://a/") as resp:
+        assert resp.from_cache
+        assert resp.content == b"x" * 1000
+    assert os.stat(os.path.join(str(tmp_path),
+                   INDEX_FILE)).st_mtime_ns == mtime
+    cache.flush()
+    assert "http://a/" in index(str(tmp_path))
+
+def test_validators_only(tmp_path):
+    session = FakeSession(b"image")
+    cache = HTTPCache(str(tmp_path), session)
+    assert cache.get("http://a/", body=False).content == b"image"
+    cache.flush()
+    assert os.listdir(str(tmp_path)) == [INDEX_FILE]
+    with cache.get("http://a/", body=False) as resp:
+        assert resp.from_cache
+        assert resp.content == b""
+    assert session.requests == 2
+
+def test_close_partly_read(tmp_path):
+    cache = HTTPCache(str(tmp_path), FakeSession(b"x" * 100000))
+    with cache.get("http://a/") as resp:
+        next(resp.iter_content(1000))
+        assert len(os.listdir(str(tmp_path))) == 1
+    # Temporary file is removed, nothing stored
+    assert os.listdir(str(tmp_path)) == []
+    assert cache.stats()["entries"] == 0
+
+def test_orphans_removed(tmp_path):
+    cache = HTTPCache(str(tmp_path), FakeSession(b"body"))
+    cache.get("http://a/").content
+    # Not flushed, body isn't referenced by index
+    HTTPCache(str(tmp_path), FakeSession(b"body"))
+    assert os.listdir(str(tmp_path)) == []
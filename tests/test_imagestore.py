@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import os
+
+from silver.imagestore import ImageStore
+from silver.imagestore import prune_thumbnails
+from silver.imagestore import thumb_name
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 64 + b"IEND\xaeB`\x82"
+
+class FakeCache():
+    """ Always serve the same image """
+    def get(self, url, max_age=0, body=True):
+        return FakeResponse()
+
+class FakeResponse():
+    status_code = 200
+    from_cache = False
+    content = PNG
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+def test_gc_keeps_referenced(tmp_path):
+    path = str(tmp_path)
+    store = ImageStore(path, FakeCache(), 1024 * 1024)
+    name = store.get("http://a/")
+    for file in ("old_icon.png", "stray.jpg"):
+        with open(os.path.join(path, file), "wb") as f:
+            f.write(b"x")
+    store.gc(keep=[os.path.join(path, "old_icon.png"), ""])
+    assert sorted(os.listdir(path)) == sorted(["index.json",
+                                               os.path.basename(name),
+                                               "old_icon.png"])
+
+def test_prune_leaves_unknown(tmp_path):
+    path = str(tmp_path)
+    store = ImageStore(path, FakeCache(), 0)
+    with open(os.path.join(path, "old_icon.png"), "wb") as f:
+        f.write(b"x")
+    store.get("http://a/")
+    assert store.prune() == 0
+    assert sorted(os.listdir(path)) == ["index.json", "old_icon.png"]
+
+def test_index_written_on_flush(tmp_path):
+    path = str(tmp_path)
+    store = ImageStore(path, FakeCache(), 1024 * 1024)
+    name = store.get("http://a/")
+    assert not os.path.exists(os.path.join(path, "index.json"))
+    store.flush()
+    assert ImageStore(path, None, 1024 * 1024)._lookup("http://a/") == name
+
+class CountingCache():
+    """ Serve a different image for every url """
+    def get(self, url, max_age=0, body=True):
+        resp = FakeResponse()
+        resp.content = PNG[:-12] + url.encode("utf-8") + PNG[-12:]
+        return resp
+
+def test_prune_keeps_referenced(tmp_path):
+    path = str(tmp_path)
+    store = ImageStore(path, CountingCache(), 1024 * 1024)
+    names = [ store.get("http://a/{0}".format(i)) for i in range(4) ]
+    store.max_size = 0
+    store.prune(keep=names[:2])
+    assert sorted(os.listdir(path)) == sorted([ "index.json" ] +
+                                    [ os.path.basename(x) for x in names[:2] ])
+    # Still kept once something else is downloaded
+    store.get("http://a/new")
+    for name in names[:2]:
+        assert os.path.exists(name)
+
+def test_prune_thumbnails(tmp_path):
+    img_dir = str(tmp_path / "img")
+    thumb_dir = str(tmp_path / "thumbs")
+    os.makedirs(img_dir)
+    os.makedirs(thumb_dir)
+    open(os.path.join(img_dir, "a-b.png"), "wb").close()
+    for file in (thumb_name("a-b.png", 80), thumb_name("gone.png", 80),
+                 "a-b.png-80.png"):
+        open(os.path.join(thumb_dir, file), "wb").close()
+    prune_thumbnails(img_dir, thumb_dir)
+    assert os.listdir(thumb_dir) == [ "a-b.png-80px.png" ]
+    # Nothing to prune yet
+    prune_thumbnails(img_dir, str(tmp_path / "none"))
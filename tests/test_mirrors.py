@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from functools import partial
+from http.server import BaseHTTPRequestHandler
+import contextlib
+import os
+import time
+
+import pytest
+
+import localserver
+import silver.bitrate
+import silver.config as config
+import silver.mirrors as mirrors
+from silver.downloader import create_session
+from silver.globals import CONFIG_FILE
+from silver.mirrors import MirrorProbe
+from silver.mirrors import get_ranking
+from silver.mirrors import preferred_url
+from silver.mirrors import probe_mirrors
+from silver.mirrors import set_ranking
+
+class Handler(BaseHTTPRequestHandler):
+    """ Stream of zeros after delay seconds, rate bytes per second """
+    delay = 0
+    rate = None
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.end_headers()
+        start = time.monotonic()
+        sent = 0
+        try:
+            while time.monotonic() - start < 5:
+                self.wfile.write(bytes(1024))
+                sent += 1024
+                if self.rate:
+                    time.sleep(max(0, start + sent / self.rate -
+                                      time.monotonic()))
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+class Fast(Handler):
+    pass
+
+class Late(Handler):
+    delay = 0.3
+
+class Slow(Handler):
+    # 128 kbps stream needs 16000
+    rate = 4000
+
+@pytest.fixture
+def servers(monkeypatch):
+    """ Return {name : (128 kbps url, 48 kbps url)} of local mirrors """
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    config.setup()
+    config.mirror_select = True
+    config.proxy_required = False
+    monkeypatch.setattr(mirrors, "_ranking", None)
+    monkeypatch.setattr(mirrors, "probe",
+                        partial(mirrors.probe, probe_time=0.5))
+    with contextlib.ExitStack() as stack:
+        bases = { name : stack.enter_context(localserver.serve(handler))
+                  for name, handler in (("fast", Fast), ("late", Late),
+                                        ("slow", Slow)) }
+        bases["down"] = localserver.closed_port()
+        urls = { name : (base + "/silver128.mp3", base + "/stream48.mp3")
+                 for name, base in bases.items() }
+        # Listed in the worst order
+        order = [ urls[x] for x in ("down", "slow", "late", "fast") ]
+        monkeypatch.setattr(mirrors, "STREAM_URL_LIST",
+                            [ x for pair in order for x in pair ])
+        bitrates = { x : kbps for pair in order
+                     for x, kbps in zip(pair, (128, 48)) }
+        monkeypatch.setattr(mirrors, "STREAM_BITRATE", bitrates)
+        monkeypatch.setattr(silver.bitrate, "STREAM_BITRATE", bitrates)
+        config.stream_url = urls["down"][0]
+        yield urls
+
+def server(url):
+    return mirrors._server(url)
+
+def test_ranking(servers):
+    ranking = probe_mirrors()
+    assert time.time() - ranking["probed"] < 10
+    assert [ x["server"] for x in ranking["servers"] ] == \
+           [ server(servers[x][0]) for x in ("fast", "late", "slow", "down") ]
+    late = ranking["servers"][1]
+    assert late["first_byte"] >= 0.3
+    assert ranking["servers"][-1]["first_byte"] is None
+
+def test_preferred_url(servers):
+    set_ranking(probe_mirrors())
+    # Saved and read back
+    mirrors._ranking = None
+    assert get_ranking()["servers"][0]["server"] == \
+           server(servers["fast"][0])
+    # Same bitrate on the fastest server
+    assert preferred_url(servers["down"][0]) == servers["fast"][0]
+    assert preferred_url(servers["slow"][1]) == servers["fast"][1]
+    # Unknown stream is played as is
+    assert preferred_url("http://127.0.0.1:1/x.mp3") == \
+           "http://127.0.0.1:1/x.mp3"
+    config.mirror_select = False
+    assert preferred_url(servers["slow"][0]) == servers["slow"][0]
+
+def test_unreachable_not_preferred(servers):
+    set_ranking({ "probed"  : time.time(),
+                  "servers" : [ { "server"     : server(servers["down"][0]),
+                                  "first_byte" : None,
+                                  "rate"       : 0 } ] })
+    assert preferred_url(servers["slow"][0]) == servers["slow"][0]
+
+def test_session_closed(servers, monkeypatch):
+    sessions = []
+    def create(pool_size):
+        session = create_session(pool_size)
+        session.close = partial(sessions.append, session)
+        return session
+    monkeypatch.setattr(mirrors, "create_session", create)
+    probe_mirrors()
+    assert len(sessions) == 1
+
+class Tasks():
+    """ Task runner failing every task right away """
+    def __init__(self):
+        self.runs = 0
+
+    def run(self, name, func, done=None, progress=None, error=None):
+        self.runs += 1
+        error(RuntimeError("failed"))
+
+def test_failed_probe_not_repeated(servers):
+    GObject = pytest.importorskip("gi.repository.GObject")
+    tasks = Tasks()
+    probe = MirrorProbe(tasks)
+    probe.failed()
+    assert tasks.runs == 1
+    # Stream keeps failing
+    probe.failed()
+    probe.failed()
+    assert tasks.runs == 1
+    GObject.source_remove(probe._source)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from http.server import BaseHTTPRequestHandler
+import time
+
+import pytest
+import requests
+
+import localserver
+import silver.netpolicy as netpolicy
+from silver.httpcache import HTTPCache
+from silver.netpolicy import CircuitOpen
+from silver.netpolicy import DeadlineExceeded
+from silver.netpolicy import NetworkPolicy
+from silver.netpolicy import iter_content
+
+class Handler(BaseHTTPRequestHandler):
+    """ Misbehaving server """
+    flaky = 0
+
+    def do_GET(self):
+        if self.path == "/fail":
+            self.send_error(503)
+        elif self.path == "/flaky":
+            Handler.flaky += 1
+            if Handler.flaky < 3:
+                self.send_error(503)
+            else:
+                self._send(b"ok")
+        elif self.path == "/stall":
+            # No headers in time
+            time.sleep(1)
+            self._send(b"late")
+        elif self.path == "/trickle":
+            # Every chunk arrives in time, the whole body doesn't
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            try:
+                for i in range(100):
+                    self.wfile.write(b"x" * 10)
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+        else:
+            self._send(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture(scope="module")
+def server():
+    with localserver.serve(Handler) as url:
+        yield url
+
+@pytest.fixture
+def closed_port():
+    return localserver.closed_port()
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+def test_retry_server_error(server, session):
+    Handler.flaky = 0
+    policy = NetworkPolicy(deadline=10)
+    resp = policy.request(session, "GET", server + "/flaky")
+    assert resp.status_code == 200
+    assert Handler.flaky == 3
+
+def test_server_error_returned(server, session):
+    policy = NetworkPolicy(deadline=10, retries=1)
+    resp = policy.request(session, "GET", server + "/fail")
+    assert resp.status_code == 503
+
+def test_post_not_retried(server, session):
+    Handler.flaky = 0
+    policy = NetworkPolicy(deadline=10)
+    resp = policy.request(session, "POST", server + "/flaky")
+    assert resp.status_code == 501
+    assert Handler.flaky == 0
+
+def test_stall(server, session):
+    policy = NetworkPolicy(read_timeout=0.2, deadline=0.8)
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        policy.request(session, "GET", server + "/stall")
+    assert time.monotonic() - start < 1.5
+
+def test_refused_opens_circuit(closed_port, session):
+    policy = NetworkPolicy(deadline=0.1, retries=0)
+    for i in range(netpolicy.BREAKER_FAILURES):
+        with pytest.raises(requests.exceptions.ConnectionError) as e:
+            policy.request(session, "GET", closed_port)
+        assert not isinstance(e.value, CircuitOpen)
+    with pytest.raises(CircuitOpen):
+        policy.request(session, "GET", closed_port)
+
+def test_body_deadline(server, session):
+    policy = NetworkPolicy(read_timeout=1, deadline=0.5)
+    resp = policy.request(session, "GET", server + "/trickle", stream=True)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        for chunk in iter_content(resp, 10):
+            pass
+    assert time.monotonic() - start < 1.5
+
+def test_cache_body_deadline(server, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(netpolicy, "_policy",
+                        NetworkPolicy(read_timeout=1, deadline=0.5))
+    cache = HTTPCache(str(tmp_path), session)
+    with pytest.raises(DeadlineExceeded):
+        with cache.get(server + "/trickle") as resp:
+            for chunk in resp.iter_content(10):
+                pass
+    # Nothing stored
+    assert cache.stats()["entries"] == 0
+    with cache.get(server + "/ok") as resp:
+        assert resp.content == b"ok"
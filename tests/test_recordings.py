@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from datetime import datetime
+from datetime import timedelta
+import os
+import time
+
+import pytest
+
+Gst = pytest.importorskip("gi.repository.Gst")
+from gi.repository import GLib
+
+import localserver
+import silver.config as config
+import silver.recordings as recordings
+from silver.globals import CONFIG_FILE
+from silver.msktz import MSK
+from silver.recordings import RecordingManager
+from silver.stream import StreamSource
+
+Gst.init(None)
+
+class StubRecorder():
+    """ Records nothing, logs starts and stops """
+    log = []
+
+    def __init__(self, source, err_func):
+        self.playing = False
+
+    def start(self, name):
+        self.name = name
+        self.playing = True
+        self.log.append(("start", name, time.monotonic()))
+
+    def stop(self):
+        self.playing = False
+        self.log.append(("stop", self.name, time.monotonic()))
+
+    def mark_gap(self, lost):
+        pass
+
+    def clean(self):
+        self.stop()
+
+@pytest.fixture
+def cfg(tmp_path):
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    config.setup()
+    config.recs_dir = str(tmp_path)
+    config.recs_prefix = ""
+    config.recs_padding = 0.5
+    return tmp_path
+
+@pytest.fixture
+def stub(monkeypatch):
+    StubRecorder.log = []
+    monkeypatch.setattr(recordings, "SilverRecorder", StubRecorder)
+    return StubRecorder.log
+
+def run_loop(seconds):
+    loop = GLib.MainLoop()
+    GLib.timeout_add(int(seconds * 1000), loop.quit)
+    loop.run()
+
+def back_to_back(length, lead):
+    """ Return two programs, the first starts in lead seconds """
+    now = datetime.now(MSK())
+    a = now + timedelta(seconds=lead)
+    b = a + timedelta(seconds=length)
+    return [ ("A", a, b), ("B", b, b + timedelta(seconds=length)) ]
+
+def test_padded_overlap(cfg, stub):
+    events = []
+    manager = RecordingManager(None, None,
+                               lambda : events.append("idle"),
+                               lambda : events.append("busy"))
+    start = time.monotonic()
+    manager.plan(back_to_back(0.6, 0.6))
+    run_loop(2.6)
+    times = { (kind, name) : t - start for kind, name, t in stub }
+    # Pre-roll and padding
+    assert times[("start", "A")] == pytest.approx(0.1, abs=0.1)
+    assert times[("stop", "A")] == pytest.approx(1.7, abs=0.1)
+    assert times[("start", "B")] == pytest.approx(0.7, abs=0.1)
+    assert times[("stop", "B")] == pytest.approx(2.3, abs=0.1)
+    assert events == [ "busy", "idle" ]
+    assert not manager.playing
+
+def test_manual_until_stopped(cfg, stub):
+    manager = RecordingManager(None, None)
+    manager.start("M")
+    run_loop(0.3)
+    assert manager.names() == [ "M" ]
+    manager.stop()
+    assert not manager.playing
+
+def test_stopped_not_restarted(cfg, stub):
+    manager = RecordingManager(None, None)
+    plan = back_to_back(5, 0)
+    manager.plan(plan)
+    assert manager.names() == [ "A" ]
+    manager.stop("A")
+    # Replanned on the next event
+    manager.plan(plan)
+    assert not manager.playing
+    manager.clean()
+
+def frames(path):
+    """ Return frame numbers of recording """
+    with open(path, "rb") as f:
+        return localserver.mp3_frames(f.read())
+
+def test_no_frames_lost_at_boundary(cfg):
+    with localserver.serve(localserver.MP3Handler) as url:
+        source = StreamSource()
+        source.set_location(url + "/silver128.mp3")
+        errors = []
+        manager = RecordingManager(source, lambda *x : errors.append(x))
+        manager.plan(back_to_back(1, 0.5))
+        run_loop(3.5)
+        manager.clean()
+        source.clean()
+    assert not errors
+    a = frames(os.path.join(str(cfg), "A.mp3"))
+    b = frames(os.path.join(str(cfg), "B.mp3"))
+    for nums in (a, b):
+        assert nums == list(range(nums[0], nums[0] + len(nums)))
+    # Padded recordings overlap
+    assert a[-1] >= b[0]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import random
+
+import pytest
+
+import silver.ringfile as ringfile
+from silver.ringfile import RingFile
+
+class Clock():
+    """ Monotonic clock moved by hand """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ringfile, "time", clock)
+    return clock
+
+@pytest.fixture
+def ring(tmp_path, clock):
+    ring = RingFile(str(tmp_path / "ring"), 10)
+    yield ring
+    ring.close()
+
+def read_all(ring, pos):
+    """ Read from pos until live, return (first offset, data) """
+    first, data = ring.read(pos, 100)
+    pos = first + len(data)
+    while pos < ring.written:
+        pos, chunk = ring.read(pos, 100)
+        data += chunk
+        pos += len(chunk)
+    return first, data
+
+def test_wraparound(ring):
+    ring.write(b"abcdefg")
+    ring.write(b"hijklm")
+    assert ring.written == 13
+    assert ring.oldest == 3
+    # Read stops at the end of the file
+    assert ring.read(3, 100) == (3, b"defghij")
+    assert ring.read(10, 100) == (10, b"klm")
+    assert read_all(ring, 5) == (5, b"fghijklm")
+
+def test_write_larger_than_ring(ring):
+    ring.write(b"0123456789abcdefghijklmno")
+    assert ring.written == 25
+    assert read_all(ring, 0) == (15, b"fghijklmno")
+
+def test_clamping(ring):
+    ring.write(b"abcdefghijklm")
+    # Overwritten position is moved to the oldest byte
+    assert ring.read(0, 4) == (3, b"defg")
+    # Nothing past live
+    assert ring.read(20, 4) == (13, b"")
+    ring.close()
+    assert ring.read(5, 4) == (5, b"")
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_stream(tmp_path, clock, seed):
+    rnd = random.Random(seed)
+    ring = RingFile(str(tmp_path / "ring"), rnd.randrange(1, 64))
+    stream = b""
+    for i in range(50):
+        data = bytes(rnd.randrange(256) for x in range(rnd.randrange(40)))
+        ring.write(data)
+        stream += data
+        pos = rnd.randrange(len(stream) + 5)
+        first, data = read_all(ring, pos)
+        assert first == min(max(pos, len(stream) - ring.size), len(stream))
+        assert data == stream[first:]
+    ring.close()
+
+def test_time_offset_round_trip(tmp_path, clock):
+    ring = RingFile(str(tmp_path / "ring"), 1000)
+    start = clock.now
+    for i in range(30):
+        ring.write(bytes(100))
+        clock.now += 1
+    assert ring.written == 3000
+    # A single mark is kept before the oldest byte
+    assert ring._marks[1][1] > ring.oldest >= ring._marks[0][1]
+    first_mark, last_mark = ring._marks[0][1], ring._marks[-1][1]
+    for pos in range(first_mark, last_mark + 1, 7):
+        t = ring.time_at(pos)
+        assert ring.offset_at(t) == pytest.approx(pos, abs=1)
+    # Bytes arrive at 100 per second
+    assert ring.time_at(2550) - ring.time_at(2050) == pytest.approx(5)
+    assert ring.time_at(2000) == pytest.approx(start + 19)
+    # Outside of the marks
+    assert ring.time_at(0) == ring._marks[0][0]
+    assert ring.offset_at(start - 10) == ring.oldest
+    assert ring.offset_at(clock.now + 10) == ring.written
+    ring.close()
+
+def test_no_marks(ring, clock):
+    assert ring.time_at(0) == clock.now
+    assert ring.offset_at(clock.now) == 0
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+from datetime import datetime
+from datetime import timedelta
+import random
+
+import pytest
+
+from silver.msktz import MSK
+from silver.program import Program
+from silver.schedindex import ScheduleIndex
+from silver.schednorm import normalize_week
+
+# Monday
+MONDAY = datetime(2026, 10, 12, tzinfo=MSK())
+
+def random_week(rnd):
+    """ Return normalized week, programs may go past midnight """
+    week = []
+    for wd in range(7):
+        day = []
+        for i in range(rnd.randrange(1, 10)):
+            start = rnd.randrange(0, 86400, 900)
+            end = start + rnd.randrange(900, 4 * 3600, 900)
+            merged = end > 86400
+            day.append(Program(wd, "Title {0}".format(rnd.randrange(6)),
+                               "url", start=float(start),
+                               end=float(end - 86400 if merged else end),
+                               is_main=True, is_merged=merged))
+        week.append(day)
+    return normalize_week(week)
+
+def intervals(week, days=14):
+    """ Return [(start, end, program)] of main programs
+        aired from the Monday before MONDAY on """
+    result = []
+    for n in range(-7, days):
+        midnight = MONDAY + timedelta(days=n)
+        for item in week[midnight.weekday()]:
+            if not item.is_main:
+                continue
+            end = item.end + 86400 if item.is_merged else item.end
+            result.append((midnight + timedelta(seconds=item.start),
+                           midnight + timedelta(seconds=end), item))
+    return result
+
+def random_time(rnd):
+    return MONDAY + timedelta(seconds=rnd.randrange(7 * 86400) +
+                              rnd.choice([ 0, 0.5 ]))
+
+@pytest.mark.parametrize("seed", range(50))
+def test_event_at(seed):
+    rnd = random.Random(seed)
+    week = random_week(rnd)
+    index = ScheduleIndex(week)
+    aired = intervals(week)
+    for i in range(100):
+        dt = random_time(rnd)
+        expected = [ x[2] for x in aired if x[0] <= dt < x[1] ]
+        # Normalized week covers every second exactly once
+        assert len(expected) == 1
+        assert index.event_at(dt) is expected[0]
+
+@pytest.mark.parametrize("seed", range(50))
+def test_range(seed):
+    rnd = random.Random(seed)
+    week = random_week(rnd)
+    index = ScheduleIndex(week)
+    aired = intervals(week)
+    for i in range(30):
+        start = random_time(rnd)
+        end = start + timedelta(seconds=rnd.randrange(1, 3 * 86400))
+        expected = [ (x[0], x[2]) for x in aired
+                     if x[0] < end and x[1] > start ]
+        got = list(index.range(start, end))
+        assert [ x[0] for x in got ] == [ x[0] for x in expected ]
+        assert all(a[1] is b[1] for a, b in zip(got, expected))
+
+@pytest.mark.parametrize("seed", range(50))
+def test_next_occurrence(seed):
+    rnd = random.Random(seed)
+    week = random_week(rnd)
+    index = ScheduleIndex(week)
+    aired = intervals(week)
+    titles = { x.title for day in week for x in day }
+    for i in range(30):
+        dt = random_time(rnd)
+        title = rnd.choice(sorted(titles))
+        expected = min((x for x in aired if x[2].title == title and
+                        x[0] > dt), key=lambda x : x[0])
+        start, item = index.next_occurrence(title, dt)
+        assert start == expected[0]
+        assert item is expected[2]
+    assert index.next_occurrence("Nothing", MONDAY) is None
+
+def test_merged_into_monday():
+    # Sunday 23:00 - Monday 01:00
+    late = Program(6, "Late", "url", start=82800.0, end=3600.0,
+                   is_main=True, is_merged=True)
+    week = normalize_week([ [] ] * 6 + [ [ late ] ])
+    index = ScheduleIndex(week)
+    assert index.event_at(MONDAY + timedelta(minutes=30)) is week[6][1]
+    assert index.event_at(MONDAY + timedelta(hours=1)).title != "Late"
+    sunday = MONDAY - timedelta(days=1)
+    assert index.next_occurrence("Late", sunday)[0] == \
+           sunday + timedelta(hours=23)
+    found = list(index.range(MONDAY, MONDAY + timedelta(hours=2)))
+    assert found[0] == (sunday + timedelta(hours=23), week[6][1])
+    assert found[1][0] == MONDAY + timedelta(hours=1)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import random
+
+import pytest
+
+from silver.program import MUSIC
+from silver.program import Program
+from silver.schednorm import normalize_week
+
+DAY = 86400.0
+
+def random_week(rnd, programs):
+    """ Return week of randomly placed programs, some past midnight """
+    week = []
+    for wd in range(7):
+        day = []
+        for i in range(programs):
+            start = rnd.randrange(0, 86400, 900)
+            end = start + rnd.randrange(900, 4 * 3600, 900)
+            merged = end > DAY
+            day.append(Program(wd, "Title {0}".format(rnd.randrange(20)),
+                               "url", start=float(start),
+                               end=float(end - DAY if merged else end),
+                               is_main=True, is_merged=merged))
+        # Secondary programs are kept as they are
+        day.append(Program(wd, "Secondary", "url", start=3600.0,
+                           end=7200.0))
+        week.append(day)
+    return week
+
+def mains(day):
+    return [ x for x in day if x.is_main ]
+
+def key(week):
+    return [ [ (x.title, x.start, x.end, x.is_main, x.is_merged)
+               for x in day ] for day in week ]
+
+@pytest.mark.parametrize("seed", range(200))
+def test_covers_day_without_overlaps(seed):
+    rnd = random.Random(seed)
+    week = normalize_week(random_week(rnd, rnd.randrange(15)))
+    for wd in range(7):
+        prev = mains(week[wd - 1])
+        time = prev[-1].end if prev and prev[-1].is_merged else 0.0
+        for item in mains(week[wd]):
+            end = item.end + DAY if item.is_merged else item.end
+            assert item.start == time
+            assert end > item.start
+            time = end
+        # Last program reaches midnight or goes past it
+        assert time >= DAY
+        assert len(week[wd]) - len(mains(week[wd])) == 1
+
+@pytest.mark.parametrize("seed", range(200))
+def test_idempotent(seed):
+    rnd = random.Random(seed)
+    week = normalize_week(random_week(rnd, rnd.randrange(15)))
+    assert key(normalize_week(week)) == key(week)
+
+def test_empty_week_is_music():
+    week = normalize_week([ [] for wd in range(7) ])
+    assert key(week) == [ [ (MUSIC, 0.0, DAY, True, False) ] ] * 7
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import random
+
+import pytest
+
+from silver.program import Program
+from silver.schediff import apply_changes
+from silver.schediff import diff_week
+from silver.schedule import SilverSchedule
+from treestore import TreeStore
+
+TITLES = [ "A", "B", "C", "D", "E", "F" ]
+
+def random_week(rnd, leading_child=False):
+    """ Return week of main programs with a few children each.
+        With leading_child Sunday's last program goes past midnight
+        and Monday starts with a child row """
+    week = []
+    for wd in range(7):
+        day = []
+        time = 0
+        if wd == 0 and leading_child:
+            time = 3600
+            day.append(Program(wd, "Early", "early", start=0.0,
+                               end=600.0))
+        while time < 86400:
+            end = min(86400, time + rnd.choice([ 3600, 7200 ]))
+            day.append(Program(wd, rnd.choice(TITLES), rnd.choice("xy"),
+                               start=float(time), end=float(end),
+                               is_main=True))
+            for i in range(rnd.randrange(3)):
+                day.append(Program(wd, rnd.choice(TITLES) + " news", "n",
+                                   start=float(time),
+                                   end=float(time + 600)))
+            time = end
+        week.append(day)
+    if leading_child:
+        last = [ x for x in week[6] if x.is_main ][-1]
+        last.end = 3600.0
+        last.is_merged = True
+    return week
+
+def make_schedule(week):
+    sched = SilverSchedule.__new__(SilverSchedule)
+    sched._sched_week = week
+    sched._updated = set()
+    return sched
+
+def filled(sched):
+    store = TreeStore()
+    sched.fill_tree_store(store)
+    return store.dump()
+
+@pytest.mark.parametrize("seed", range(150))
+def test_update_matches_fill(seed):
+    rnd = random.Random(seed)
+    old = random_week(rnd, leading_child=seed % 2 == 0)
+    sched = make_schedule(old)
+    store = TreeStore()
+    sched.fill_tree_store(store)
+    if seed % 3:
+        new = random_week(rnd, leading_child=seed % 4 < 2)
+    else:
+        new = [ [ x.copy() for x in day ] for day in old ]
+        new[2][0].url = "changed"
+    changes = diff_week(old, new)
+    sched._sched_week = apply_changes(old, changes)
+    sched._updated = { x.target for x in changes if x.target }
+    sched.update_tree_store(store)
+    assert store.dump() == filled(sched)
+
+def test_leading_child_is_top_level():
+    week = random_week(random.Random(0), leading_child=True)
+    sched = make_schedule(week)
+    store = TreeStore()
+    sched.fill_tree_store(store)
+    sched.update_tree_store(store)
+    assert store.dump() == filled(sched)
+    assert store[store.get_iter_first()][3] == "Early"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import os
+import re
+import threading
+import time
+
+import pytest
+
+Gst = pytest.importorskip("gi.repository.Gst")
+from gi.repository import GLib
+
+import localserver
+import silver.config as config
+import silver.stream as stream
+from silver.globals import CONFIG_FILE
+from silver.player import SilverRecorder
+from silver.stream import RECONNECTING
+from silver.stream import STREAMING
+from silver.stream import StreamSource
+from silver.stream import make_branch
+
+Gst.init(None)
+
+class FlakyHandler(localserver.MP3Handler):
+    """ Every connection takes the next step of script:
+        ("frames", n) sends n frames and closes connection,
+        ("error", code) replies with error, None streams on """
+    lock = threading.Lock()
+    script = []
+    connections = 0
+
+    def do_GET(self):
+        with self.lock:
+            FlakyHandler.connections += 1
+            step = self.script.pop(0) if self.script else None
+        if step and step[0] == "error":
+            self.send_error(step[1])
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.end_headers()
+        self.stream(step[1] if step else None)
+
+@pytest.fixture
+def server():
+    FlakyHandler.connections = 0
+    with localserver.serve(FlakyHandler) as url:
+        yield url + "/silver128.mp3"
+
+@pytest.fixture
+def backoff(monkeypatch):
+    """ Delays are always the longest allowed, return their bounds """
+    bounds = []
+    class Random():
+        def uniform(self, lo, hi):
+            bounds.append(hi)
+            return hi
+    monkeypatch.setattr(stream, "random", Random())
+    monkeypatch.setattr(stream, "RECONNECT_BACKOFF", 0.1)
+    return bounds
+
+@pytest.fixture
+def cfg(tmp_path):
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    config.setup()
+    config.recs_dir = str(tmp_path)
+    config.recs_prefix = ""
+    return tmp_path
+
+def run_until(cond, timeout):
+    loop = GLib.MainLoop()
+    deadline = time.monotonic() + timeout
+    def check():
+        if cond() or time.monotonic() > deadline:
+            loop.quit()
+            return False
+        return True
+    GLib.timeout_add(20, check)
+    loop.run()
+
+def connect(url, states):
+    """ Return source with a fake sink attached """
+    source = StreamSource(lambda state, lost : states.append((state, lost)))
+    source.set_location(url)
+    bin, el = make_branch("Sink", [ ("queue",    "queue"),
+                                    ("fakesink", "sink") ])
+    assert Gst.Element.link(el["queue"], el["sink"])
+    assert source.attach(bin, lambda *x : pytest.fail(str(x)))
+    return source
+
+def test_reconnect_after_drop(cfg, server, backoff):
+    FlakyHandler.script = [ ("frames", 20) ]
+    states = []
+    source = connect(server, states)
+    run_until(lambda : len(states) >= 2, 10)
+    source.clean()
+    assert [ x[0] for x in states ] == [ RECONNECTING, STREAMING ]
+    assert states[0][1] == 0
+    # Delay plus the new connection
+    assert states[1][1] >= 0.1
+    assert backoff == [ 0.1 ]
+    assert FlakyHandler.connections == 2
+
+def test_backoff_doubles(cfg, server, backoff):
+    FlakyHandler.script = [ ("frames", 10) ] + [ ("error", 503) ] * 3
+    states = []
+    source = connect(server, states)
+    run_until(lambda : len(states) >= 2, 10)
+    source.clean()
+    assert backoff == [ 0.1, 0.2, 0.4, 0.8 ]
+    # Told once when lost and once when back
+    assert [ x[0] for x in states ] == [ RECONNECTING, STREAMING ]
+    assert states[1][1] >= sum(backoff)
+    assert FlakyHandler.connections == 5
+
+def test_gap_marked(cfg, server, backoff):
+    FlakyHandler.script = [ ("frames", 40) ]
+    states = []
+
+    def on_state(state, lost):
+        states.append(state)
+        if state == STREAMING:
+            recorder.mark_gap(lost)
+
+    source = StreamSource(on_state)
+    source.set_location(server)
+    recorder = SilverRecorder(source, lambda *x : pytest.fail(str(x)))
+    recorder.start("gap")
+    assert recorder.playing
+    run_until(lambda : STREAMING in states, 10)
+    # Recording goes on in the same file
+    run_until(lambda : False, 0.5)
+    recorder.stop()
+    source.clean()
+    with open(recorder.file + ".gaps", "r") as f:
+        gaps = f.read().splitlines()
+    assert len(gaps) == 1
+    assert re.match(r"^00:00:0\d\t\d+s lost$", gaps[0])
+    with open(recorder.file, "rb") as f:
+        frames = localserver.mp3_frames(f.read())
+    # Both connections are in the file, each numbered from 0
+    restarts = [ i for i in range(1, len(frames))
+                 if frames[i] < frames[i - 1] ]
+    assert len(restarts) == 1
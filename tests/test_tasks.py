@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+import pytest
+
+GLib = pytest.importorskip("gi.repository.GLib")
+
+from silver.tasks import TaskRunner
+
+def run_loop(runner, timeout=5):
+    """ Run main loop until runner has nothing left to handle """
+    loop = GLib.MainLoop()
+    def check():
+        if runner._scheduled or runner._tasks:
+            return True
+        loop.quit()
+        return False
+    GLib.timeout_add(10, check)
+    GLib.timeout_add_seconds(timeout, loop.quit)
+    loop.run()
+
+def test_failing_handler():
+    runner = TaskRunner()
+    results = []
+    def done(result):
+        raise RuntimeError(result)
+    runner.run("a", lambda task : 1, done)
+    run_loop(runner)
+    assert not runner._scheduled
+    # Runner keeps working
+    runner.run("b", lambda task : 2, results.append)
+    run_loop(runner)
+    assert results == [ 2 ]
+    assert not runner._scheduled
+
+def test_generator_handler():
+    runner = TaskRunner()
+    log = []
+    def done(result):
+        log.append((result, 0))
+        yield
+        log.append((result, 1))
+        yield
+        raise RuntimeError("last step")
+    runner.run("a", lambda task : "a", done)
+    run_loop(runner)
+    runner.run("b", lambda task : "b", done)
+    runner.run("c", lambda task : "c", log.append)
+    run_loop(runner)
+    assert log[:2] == [ ("a", 0), ("a", 1) ]
+    # Steps of one handler are never mixed with other results
+    i = log.index(("b", 0))
+    assert log[i + 1] == ("b", 1)
+    assert "c" in log
+    assert not runner._scheduled and not runner._steps
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2015 Petr Skovoroda <petrskovoroda@gmail.com>
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License as
+published by the Free Software Foundation; either version 2 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor,
+Boston, MA 02110-1301 USA
+"""
+
+# Gtk.TreeStore stand-in for schedule model tests and benchmarks
+
+class Node():
+    def __init__(self, row, parent):
+        self.row = list(row)
+        self.children = []
+        self.parent = parent
+
+class Iter():
+    def __init__(self, node):
+        self.node = node
+
+class TreeStore():
+    """ Gtk.TreeStore subset used by the schedule """
+    def __init__(self):
+        self.root = Node([], None)
+
+    def get_iter_first(self):
+        return self._iter(self.root.children, 0)
+
+    def iter_next(self, it):
+        siblings = it.node.parent.children
+        return self._iter(siblings, siblings.index(it.node) + 1)
+
+    def iter_children(self, it):
+        return self._iter(it.node.children, 0)
+
+    def remove(self, it):
+        siblings = it.node.parent.children
+        pos = siblings.index(it.node)
+        siblings.pop(pos)
+        if pos < len(siblings):
+            it.node = siblings[pos]
+            return True
+        return False
+
+    def append(self, parent, row):
+        return self.insert_before(parent, None, row)
+
+    def insert_before(self, parent, sibling, row):
+        node = parent.node if parent else self.root
+        new = Node(row, node)
+        if sibling is None:
+            node.children.append(new)
+        else:
+            node.children.insert(node.children.index(sibling.node), new)
+        return Iter(new)
+
+    def dump(self):
+        """ Return (program id, dark) tree """
+        return [ (id(x.row[11]), x.row[7],
+                  [ (id(y.row[11]), y.row[7]) for y in x.children ])
+                 for x in self.root.children ]
+
+    def __getitem__(self, it):
+        return it.node.row
+
+    def __setitem__(self, it, row):
+        it.node.row = list(row)
+
+    def _iter(self, nodes, pos):
+        return Iter(nodes[pos]) if pos < len(nodes) else None